@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量对比工具
+一次对比多个学员的阶段化文件与一个或多个标准模板，输出差异矩阵；默认不调用大模型
+
+用法:
+    python batch_compare_cli.py staged_templates/staged_*.json
+    python batch_compare_cli.py a.json b.json --templates staged_templates/击球动作模板.json other.json
+    python batch_compare_cli.py staged_templates/staged_*.json --summary squad.json --reports reports/
+    python batch_compare_cli.py staged_templates/staged_*.json --reports reports/ --with-llm
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.batch_comparison import BatchComparator
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "staged_templates", "击球动作模板.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量对比学员阶段化数据与标准模板")
+    parser.add_argument("users", nargs="+", help="学员staged文件路径")
+    parser.add_argument("--templates", nargs="+", default=[DEFAULT_TEMPLATE], help="模板文件路径")
+    parser.add_argument("--summary", help="将汇总表保存为JSON文件")
+    parser.add_argument("--reports", help="为每个组合生成报告并保存到该目录")
+    parser.add_argument("--with-llm", action="store_true", help="生成报告时调用大模型（需配合 --reports）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = BatchComparator().compare(args.users, args.templates)
+    elapsed = time.perf_counter() - start
+
+    rows = result.summary_rows()
+    print(f"{'学员文件':<40} {'模板':<24} {'角度差':>8} {'时长差(ms)':>10} {'严重问题':>6}  最大偏差")
+    for row in rows:
+        angle = f"{row['angle_diff']:.1f}" if row['angle_diff'] is not None else "-"
+        timing = f"{row['timing_diff_ms']:.0f}" if row['timing_diff_ms'] is not None else "-"
+        print(f"{row['user_file']:<40} {row['template_file']:<24} {angle:>8} {timing:>10} "
+              f"{row['critical_issues']:>6}  {row['worst_angle'] or '-'}")
+    print(f"{len(args.users)} 个学员 × {len(args.templates)} 个模板，对比耗时 {elapsed:.3f}s")
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"汇总已保存: {args.summary}")
+
+    if args.reports:
+        os.makedirs(args.reports, exist_ok=True)
+        reports = result.reports(with_llm=args.with_llm)
+        for i, user_file in enumerate(result.user_files):
+            for j, template_file in enumerate(result.template_files):
+                name = (f"{os.path.splitext(os.path.basename(user_file))[0]}__"
+                        f"{os.path.splitext(os.path.basename(template_file))[0]}.json")
+                result.advisor.save_advice_report(reports[i][j], os.path.join(args.reports, name))
+        print(f"报告已保存到: {args.reports}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共部分
+计时循环（预热后重复运行到最短时长，记录最小值/中位数）、结果保存与基线对比，
+以及由项目自带的标准动作时间线生成的放大版合成时间线
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(PROJECT_DIR)
+
+from modules.timeline_writer import load_timeline
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+TEMPLATE_TIMELINES = {
+    "分解": os.path.join(PROJECT_DIR, "templates", "击球动作分解.mp4.analysis_data.json"),
+    "连续": os.path.join(PROJECT_DIR, "templates", "击球动作连续.mp4.analysis_data.json"),
+}
+STAGED_TEMPLATE_PATH = os.path.join(PROJECT_DIR, "staged_templates", "击球动作模板.json")
+
+
+def scaled_timeline(frames: List[Dict[str, Any]], factor: int, jitter: float = 2.0,
+                    seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    把时间线首尾相接重复 factor 次，时间戳顺延，坐标加入固定种子的抖动（避免完全重复的数据）
+
+    Args:
+        frames: 原始时间线
+        factor: 放大倍数
+        jitter: 坐标抖动的标准差（像素）
+        seed: 随机种子
+
+    Returns:
+        新的时间线
+    """
+    if factor <= 1:
+        return frames
+    rng = np.random.default_rng(seed)
+    period = frames[-1].get('time_ms', 0) + (frames[1].get('time_ms', 33) - frames[0].get('time_ms', 0)
+                                            if len(frames) > 1 else 33)
+    result = []
+    for repeat in range(factor):
+        for frame in frames:
+            landmarks = {}
+            for key, point in frame.get('landmarks', {}).items():
+                dx, dy = rng.normal(0.0, jitter, 2) if repeat else (0.0, 0.0)
+                landmarks[key] = {'x': point['x'] + float(dx), 'y': point['y'] + float(dy),
+                                  'confidence': point.get('confidence', 1.0)}
+            result.append({'time_ms': frame.get('time_ms', 0) + repeat * period, 'landmarks': landmarks})
+    return result
+
+
+def load_template_timelines(scales: List[int]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    读取两个标准动作时间线并按倍数放大
+
+    Returns:
+        {'连续x1': 时间线, '分解x10': 时间线, ...}
+    """
+    timelines = {}
+    for name, path in TEMPLATE_TIMELINES.items():
+        frames = load_timeline(path)
+        for scale in scales:
+            timelines[f"{name}x{scale}"] = scaled_timeline(frames, scale)
+    return timelines
+
+
+def time_function(func: Callable[[], Any], min_time: float = 0.5, max_repeat: int = 50,
+                  min_repeat: int = 3) -> Dict[str, Any]:
+    """
+    计时：预热一次后重复运行，直到累计超过 min_time 秒（至少 min_repeat 次，最多 max_repeat 次）
+
+    Returns:
+        {'min_ms', 'median_ms', 'mean_ms', 'max_ms', 'repeat'}
+    """
+    func()
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "max_ms": max(samples),
+        "repeat": len(samples),
+    }
+
+
+def environment_info() -> Dict[str, Any]:
+    """运行环境信息（随结果保存，便于判断不同机器的结果是否可比）"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def save_results(results: Dict[str, Any], name: str, output_path: str = None) -> str:
+    """
+    保存结果（默认保存到 benchmarks/results/<名称>_<时间>.json）
+
+    Returns:
+        文件路径
+    """
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return output_path
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.2,
+                    key: str = "min_ms") -> List[Dict[str, Any]]:
+    """
+    与基线对比
+
+    Args:
+        current: 本次结果
+        baseline: 基线结果
+        threshold: 耗时比例超过该值视为性能回退
+        key: 比较的统计量
+
+    Returns:
+        [{'name', 'baseline', 'current', 'ratio', 'regression'}]（只包含两边都有的项）
+    """
+    rows = []
+    for name, result in current.get("benchmarks", {}).items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base or not base.get(key) or result.get(key) is None:
+            continue
+        ratio = result[key] / base[key]
+        rows.append({"name": name, "baseline": base[key], "current": result[key], "ratio": ratio,
+                     "regression": ratio > threshold})
+    return rows
+
+
+def load_baseline(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """读取基线文件（不存在时返回None）"""
+    path = path or BASELINE_PATH
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float) -> None:
+    """打印基线对比结果"""
+    print(f"\n{'基准':<44} {'基线(ms)':>10} {'本次(ms)':>10} {'比例':>7}")
+    for row in rows:
+        flag = "  ⚠️ 回退" if row["regression"] else ("  ✅ 提升" if row["ratio"] < 1 / threshold else "")
+        print(f"{row['name']:<44} {row['baseline']:>10.3f} {row['current']:>10.3f} {row['ratio']:>6.2f}x{flag}")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态检测吞吐量基准
+先用 synthetic_video.py 由标准动作时间线生成各分辨率的合成视频（已生成的直接复用），
+再对每种模型 × 分辨率在独立子进程中运行 PoseDetector.detect_pose，
+统计每秒帧数、单帧延迟 p50/p99、解码耗时、检出率和峰值内存（RSS）
+
+用法:
+    python benchmarks/bench_detector.py
+    python benchmarks/bench_detector.py --resolutions 720p,1080p --models mediapipe --seconds 10
+    python benchmarks/bench_detector.py --models openpose_coco,openpose_body_25 --update-baseline
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from bench_common import (BENCH_DIR, RESULTS_DIR, TEMPLATE_TIMELINES, environment_info, save_results,
+                          compare_results, load_baseline, print_comparison)
+from modules.metrics_exporter import process_memory
+from synthetic_video import RESOLUTIONS, parse_resolution, render_timeline_video, stroke_name_for
+
+DETECTOR_BASELINE_PATH = os.path.join(BENCH_DIR, "detector_baseline.json")
+DEFAULT_MODELS = "mediapipe,openpose_coco,openpose_body_25"
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值内存（MB，Windows 上需要 psutil）；无法获取时返回None"""
+    _, peak = process_memory()
+    return peak / (1024 * 1024) if peak is not None else None
+
+
+def run_detector_benchmark(video_path: str, model_type: str, device: str = "cpu", max_frames: int = None,
+                           warmup_frames: int = 5) -> Dict[str, Any]:
+    """
+    对单个视频运行检测并计时（在子进程中调用，峰值内存只包含本次检测）
+
+    Args:
+        video_path: 视频路径
+        model_type: 模型类型（mediapipe / openpose_coco / openpose_body_25）
+        device: 推理设备
+        max_frames: 最多处理的帧数
+        warmup_frames: 不计入统计的预热帧数
+
+    Returns:
+        统计结果；模型无法加载时返回 {'error'}
+    """
+    try:
+        from modules.pose_detector import PoseDetector
+        detector = PoseDetector(model_type=model_type, device=device)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if model_type == PoseDetector.MODEL_MEDIAPIPE:
+        backend = "mediapipe"
+    else:
+        backend = "openpose" if getattr(detector, "use_openpose", False) else "hog_fallback"
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    decode_ms, detect_ms, detected = [], [], 0
+    frame_index = 0
+    try:
+        while max_frames is None or frame_index < max_frames + warmup_frames:
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            t1 = time.perf_counter()
+            if not ret:
+                break
+            _, landmarks = detector.detect_pose(frame, int(frame_index * 1000 / fps))
+            t2 = time.perf_counter()
+            if frame_index >= warmup_frames:
+                decode_ms.append((t1 - t0) * 1000)
+                detect_ms.append((t2 - t1) * 1000)
+                detected += 1 if landmarks else 0
+            frame_index += 1
+    finally:
+        cap.release()
+
+    if not detect_ms:
+        return {"error": "视频帧数不足"}
+    latencies = np.array(detect_ms)
+    return {
+        "backend": backend,
+        "frames": len(detect_ms),
+        "fps": len(detect_ms) / (latencies.sum() / 1000),
+        "min_ms": float(latencies.min()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "decode_ms": float(np.mean(decode_ms)),
+        "detected_ratio": detected / len(detect_ms),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="姿态检测吞吐量基准（合成视频）")
+    parser.add_argument("--resolutions", default="720p,1080p,4k",
+                        help=f"分辨率（逗号分隔，可选 {'/'.join(RESOLUTIONS)} 或 宽x高）")
+    parser.add_argument("--models", default=DEFAULT_MODELS, help="模型类型（逗号分隔）")
+    parser.add_argument("--fps", type=float, default=30.0, help="合成视频帧率")
+    parser.add_argument("--seconds", type=float, default=5.0, help="合成视频时长（秒）")
+    parser.add_argument("--timeline", default=TEMPLATE_TIMELINES["连续"], help="生成视频使用的时间线")
+    parser.add_argument("--device", default="cpu", choices=["cpu", "gpu"], help="推理设备")
+    parser.add_argument("--max-frames", type=int, help="每个视频最多检测的帧数")
+    parser.add_argument("--video-dir", default=os.path.join(RESULTS_DIR, "videos"), help="合成视频目录")
+    parser.add_argument("--in-process", action="store_true", help="在当前进程中运行（峰值内存为累计值）")
+    parser.add_argument("--baseline", default=DETECTOR_BASELINE_PATH, help="基线文件")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p50延迟超过基线该倍数视为回退")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在回退时返回非零退出码")
+    parser.add_argument("--output", help="结果文件路径（默认保存到 benchmarks/results/）")
+    args = parser.parse_args()
+
+    resolutions = [(name, parse_resolution(name)) for name in args.resolutions.split(",") if name.strip()]
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    results = {"environment": environment_info(), "benchmarks": {},
+               "video": {"timeline": os.path.basename(args.timeline), "fps": args.fps, "seconds": args.seconds}}
+
+    print(f"{'模型':<18} {'分辨率':<8} {'后端':<13} {'FPS':>7} {'p50(ms)':>9} {'p99(ms)':>9} "
+          f"{'解码(ms)':>9} {'检出率':>7} {'峰值内存(MB)':>12}")
+    for res_name, (width, height) in resolutions:
+        video_path = os.path.join(args.video_dir, f"{stroke_name_for(args.timeline)}_{width}x{height}_"
+                                                  f"{args.fps:g}fps_{args.seconds:g}s.mp4")
+        if not os.path.exists(video_path):
+            render_timeline_video(args.timeline, video_path, (width, height), args.fps, args.seconds)
+        for model_type in models:
+            if args.in_process:
+                result = run_detector_benchmark(video_path, model_type, args.device, args.max_frames)
+            else:
+                # 每个组合使用新的子进程，峰值内存互不影响
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    result = pool.submit(run_detector_benchmark, video_path, model_type, args.device,
+                                         args.max_frames).result()
+            name = f"detect/{model_type}/{res_name}"
+            if "error" in result:
+                print(f"{model_type:<18} {res_name:<8} 跳过: {result['error']}")
+                continue
+            results["benchmarks"][name] = result
+            rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "-"
+            print(f"{model_type:<18} {res_name:<8} {result['backend']:<13} {result['fps']:>7.1f} "
+                  f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['decode_ms']:>9.2f} "
+                  f"{result['detected_ratio']:>7.0%} {rss:>12}")
+
+    output_path = save_results(results, "detector", args.output)
+    print(f"\n结果已保存: {output_path}")
+
+    regressions = []
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        rows = compare_results(results, baseline, args.threshold, key="p50_ms")
+        print_comparison(rows, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+    if args.update_baseline:
+        save_results(results, "detector", args.baseline)
+        print(f"基线已更新: {args.baseline}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析流水线基准测试
+使用项目自带的两个标准动作时间线（及放大10倍/100倍的合成时间线）测量：
+JSON读取、角度提取、analyze_json_difference 中的DTW、JsonConverter 默认阶段化和大模型阶段化、
+ActionAdvisor 阶段对比、AI建议（非流式/流式）和报告生成；结果保存到 benchmarks/results/，并与基线对比发现性能回退。
+大模型请求发往本地替身服务器（无延迟、不限速），测得的是提示词构建、请求和响应解析本身的开销，不访问网络
+
+用法:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scales 1,10 --filter compare
+    python benchmarks/run_benchmarks.py --update-baseline          # 把本次结果保存为基线
+    python benchmarks/run_benchmarks.py --fail-on-regression       # 比基线慢20%以上时返回非零
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+from bench_common import (BASELINE_PATH, STAGED_TEMPLATE_PATH, load_template_timelines,
+                          time_function, environment_info, save_results, compare_results, load_baseline,
+                          print_comparison)
+
+from modules.timeline_writer import TimelineWriter, load_timeline
+from modules.pose_features import compute_angles, timeline_to_arrays, compute_angle_arrays
+from modules.pose_analyzer import PoseAnalyzer
+from modules.json_converter import JsonConverter
+from modules.action_advisor import ActionAdvisor
+from modules.template_cache import load_compiled_template, clear_template_cache
+from llm_stub_server import StubLLMServer
+
+
+def build_benchmarks(scales, work_dir, stub_url):
+    """
+    构建基准列表
+
+    Returns:
+        [(名称, 无参函数)]
+    """
+    timelines = load_template_timelines(scales)
+    paths = {}
+    for name, frames in timelines.items():
+        json_path = os.path.join(work_dir, f"{name}.analysis_data.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(frames, f)
+        jsonl_path = os.path.join(work_dir, f"{name}.analysis_data.jsonl")
+        with TimelineWriter(jsonl_path) as writer:
+            writer.extend(frames)
+        paths[name] = (json_path, jsonl_path)
+
+    analyzer = PoseAnalyzer()
+    analyzer.api_url = stub_url
+    converter = JsonConverter(output_dir=work_dir, staged_dir=work_dir, template_path=STAGED_TEMPLATE_PATH,
+                              response_cache=False, api_url=stub_url)
+    converter.api_key = "benchmark"
+    advisor = ActionAdvisor(staged_dir=work_dir, response_cache=False, api_url=stub_url)
+    advisor.api_key = "benchmark"
+    template = load_compiled_template(STAGED_TEMPLATE_PATH)
+    reference_path = paths["连续x1"][0]
+    template_distributions = template.frame_distributions(reference_path)
+
+    user_stages = converter._create_default_stages(timelines["分解x1"])
+    comparison = advisor.compare_stages(user_stages, template)
+    llm_response = advisor._generate_fallback_advice(comparison)
+    report = advisor.build_report(comparison, llm_response, "user.json", STAGED_TEMPLATE_PATH)
+
+    # 请求失败时两个方法都会静默退回本地建议，先确认确实是替身服务器的响应
+    if "替身服务器" not in advisor._generate_llm_advice(comparison, user_stages, template.stages):
+        raise Exception("基准准备失败: 大模型替身服务器没有正常响应")
+    converter_template = converter.load_template()
+
+    benchmarks = []
+    for name, frames in timelines.items():
+        json_path, jsonl_path = paths[name]
+        staged = converter._create_default_stages(frames)
+        benchmarks += [
+            (f"json_load/{name}", lambda p=json_path: load_timeline(p)),
+            (f"jsonl_load/{name}", lambda p=jsonl_path: load_timeline(p)),
+            (f"angles_scalar/{name}", lambda f=frames: [compute_angles(x.get('landmarks', {})) for x in f]),
+            (f"angles_vectorized/{name}", lambda f=frames: compute_angle_arrays(timeline_to_arrays(f)[1])),
+            (f"default_stages/{name}", lambda f=frames: converter._create_default_stages(f)),
+            (f"compare_by_frames/{name}",
+             lambda f=frames, s=staged: advisor.compare_stages_by_frames(
+                 f, s, None, template.stages, template_distributions=template_distributions)),
+        ]
+        if name.startswith("分解"):
+            benchmarks.append((f"dtw_analyze_json_difference/连续x1-{name}",
+                               lambda p=json_path: analyzer.analyze_json_difference(reference_path, p)))
+
+    report_json = os.path.join(work_dir, "report.json")
+    report_txt = os.path.join(work_dir, "report.txt")
+    benchmarks += [
+        ("template/compile", lambda: (clear_template_cache(STAGED_TEMPLATE_PATH),
+                                      load_compiled_template(STAGED_TEMPLATE_PATH))),
+        ("template/cached", lambda: load_compiled_template(STAGED_TEMPLATE_PATH)),
+        ("compare_stages/default", lambda: advisor.compare_stages(user_stages, template)),
+        ("llm/segment/连续x1", lambda: converter._convert_with_llm(timelines["连续x1"], converter_template)),
+        ("llm/advice", lambda: advisor._generate_llm_advice(comparison, user_stages, template.stages)),
+        ("llm/advice_streaming",
+         lambda: advisor._generate_llm_advice_streaming(comparison, user_stages, template.stages)),
+        ("report/fallback_advice", lambda: advisor._generate_fallback_advice(comparison)),
+        ("report/build", lambda: advisor.build_report(comparison, llm_response, "user.json", STAGED_TEMPLATE_PATH)),
+        ("report/ui_text", lambda: advisor.generate_ui_friendly_report(report)),
+        ("report/save_json", lambda: advisor.save_advice_report(report, report_json, "json")),
+        ("report/save_txt", lambda: advisor.save_advice_report(report, report_txt, "txt")),
+    ]
+    return benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析流水线基准测试")
+    parser.add_argument("--scales", default="1,10,100", help="时间线放大倍数（逗号分隔）")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--min-time", type=float, default=0.5, help="每个基准至少运行的时间（秒）")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件")
+    parser.add_argument("--threshold", type=float, default=1.2, help="耗时超过基线该倍数视为回退")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在回退时返回非零退出码")
+    parser.add_argument("--output", help="结果文件路径（默认保存到 benchmarks/results/）")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    work_dir = tempfile.mkdtemp(prefix="badminton_bench_")
+    stub = StubLLMServer(port=0, latency_ms=0, tokens_per_sec=0).start()
+    results = {"environment": environment_info(), "scales": scales, "benchmarks": {}}
+    try:
+        print("准备基准数据...")
+        benchmarks = build_benchmarks(scales, work_dir, stub.url)
+        if args.filter:
+            benchmarks = [(name, func) for name, func in benchmarks if args.filter in name]
+        print(f"{'基准':<44} {'最小(ms)':>10} {'中位(ms)':>10} {'次数':>5}")
+        for name, func in benchmarks:
+            result = time_function(func, min_time=args.min_time)
+            results["benchmarks"][name] = result
+            print(f"{name:<44} {result['min_ms']:>10.3f} {result['median_ms']:>10.3f} {result['repeat']:>5}")
+    finally:
+        stub.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output_path = save_results(results, "pipeline", args.output)
+    print(f"\n结果已保存: {output_path}")
+
+    regressions = []
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        rows = compare_results(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+    if args.update_baseline:
+        save_results(results, "pipeline", args.baseline)
+        print(f"基线已更新: {args.baseline}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
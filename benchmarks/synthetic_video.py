@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成视频生成
+把分析数据时间线渲染成骨架人物视频（关键点按时间线性插值到目标帧率，人物缩放居中），
+用于在没有球员视频的环境中可重复地测量姿态检测速度；同时输出缩放后的真实关键点时间线
+
+用法:
+    python benchmarks/synthetic_video.py out_1080p.mp4
+    python benchmarks/synthetic_video.py out_4k.mp4 --timeline templates/击球动作分解.mp4.analysis_data.json --resolution 4k --fps 60 --seconds 10
+"""
+
+import os
+import argparse
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from bench_common import TEMPLATE_TIMELINES
+
+from modules.pose_features import (timeline_to_arrays, NOSE, NECK, RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST,
+                                   LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE,
+                                   LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)
+from modules.timeline_writer import TimelineWriter, load_timeline
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+SKELETON_EDGES = [
+    (NOSE, NECK), (NECK, RIGHT_SHOULDER), (NECK, LEFT_SHOULDER),
+    (RIGHT_SHOULDER, RIGHT_ELBOW), (RIGHT_ELBOW, RIGHT_WRIST),
+    (LEFT_SHOULDER, LEFT_ELBOW), (LEFT_ELBOW, LEFT_WRIST),
+    (RIGHT_SHOULDER, RIGHT_HIP), (LEFT_SHOULDER, LEFT_HIP), (RIGHT_HIP, LEFT_HIP),
+    (RIGHT_HIP, RIGHT_KNEE), (RIGHT_KNEE, RIGHT_ANKLE),
+    (LEFT_HIP, LEFT_KNEE), (LEFT_KNEE, LEFT_ANKLE),
+]
+TORSO = [RIGHT_SHOULDER, LEFT_SHOULDER, LEFT_HIP, RIGHT_HIP]
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """'1080p' / '4k' / '1280x720' → (宽, 高)"""
+    key = value.lower()
+    if key in RESOLUTIONS:
+        return RESOLUTIONS[key]
+    try:
+        width, height = (int(v) for v in key.split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法识别的分辨率: {value}")
+    return width, height
+
+
+def stroke_name_for(timeline_path: str) -> str:
+    """时间线文件名去掉 .analysis_data.json(l) 和视频扩展名，作为合成视频的名称"""
+    name = os.path.basename(timeline_path)
+    for suffix in (".analysis_data.jsonl", ".analysis_data.json"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def resample_points(frames: List[Dict], fps: float, seconds: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把时间线插值到固定帧率（时长超过原时间线时循环播放）
+
+    Args:
+        frames: 时间线
+        fps: 目标帧率
+        seconds: 输出时长（默认与时间线相同）
+
+    Returns:
+        (times, points)：times 为输出帧的毫秒时间戳，points 为 (帧数, 14, 2)，缺失为NaN
+    """
+    times, points = timeline_to_arrays(frames)
+    period = times[-1] - times[0] + (times[1] - times[0] if len(times) > 1 else 1000.0 / fps)
+    duration = seconds * 1000.0 if seconds else period
+    out_times = np.arange(0.0, duration, 1000.0 / fps)
+    source_times = times[0] + np.mod(out_times, period)
+
+    out = np.full((len(out_times), points.shape[1], 2), np.nan)
+    for landmark in range(points.shape[1]):
+        for axis in range(2):
+            values = points[:, landmark, axis]
+            valid = ~np.isnan(values)
+            if valid.sum() >= 2:
+                out[:, landmark, axis] = np.interp(source_times, times[valid], values[valid])
+    return out_times, out
+
+
+def fit_to_frame(points: np.ndarray, width: int, height: int, body_fraction: float = 0.75) -> np.ndarray:
+    """整段动作的外接框缩放到画面高度的 body_fraction 并居中"""
+    x_min, y_min = np.nanmin(points[..., 0]), np.nanmin(points[..., 1])
+    x_max, y_max = np.nanmax(points[..., 0]), np.nanmax(points[..., 1])
+    scale = min(height * body_fraction / max(y_max - y_min, 1.0), width * 0.9 / max(x_max - x_min, 1.0))
+    offset_x = (width - (x_max - x_min) * scale) / 2 - x_min * scale
+    offset_y = (height - (y_max - y_min) * scale) / 2 - y_min * scale
+    fitted = points.copy()
+    fitted[..., 0] = points[..., 0] * scale + offset_x
+    fitted[..., 1] = points[..., 1] * scale + offset_y
+    return fitted
+
+
+def draw_background(width: int, height: int) -> np.ndarray:
+    """球场背景（地板色 + 场地线 + 固定种子的噪声纹理）"""
+    rng = np.random.default_rng(0)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (60, 110, 70)
+    noise = rng.integers(-12, 12, size=(height, width, 1), dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    line = max(height // 200, 2)
+    floor_y = int(height * 0.9)
+    cv2.line(image, (0, floor_y), (width, floor_y), (235, 235, 235), line)
+    cv2.line(image, (width // 2, floor_y), (width // 2, height), (235, 235, 235), line)
+    cv2.line(image, (int(width * 0.1), int(height * 0.35)), (int(width * 0.9), int(height * 0.35)), (200, 200, 200), line)
+    return image
+
+
+def draw_figure(image: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """绘制实心人物：躯干多边形、粗肢体和头部"""
+    height = image.shape[0]
+    limb = max(height // 45, 3)
+
+    def point(index):
+        x, y = points[index]
+        return None if np.isnan(x) or np.isnan(y) else (int(x), int(y))
+
+    torso = [point(i) for i in TORSO]
+    if all(p is not None for p in torso):
+        cv2.fillConvexPoly(image, np.array(torso, dtype=np.int32), (40, 60, 200), cv2.LINE_AA)
+    for a, b in SKELETON_EDGES:
+        pa, pb = point(a), point(b)
+        if pa is not None and pb is not None:
+            cv2.line(image, pa, pb, (180, 200, 230), limb, cv2.LINE_AA)
+    for index in range(points.shape[0]):
+        p = point(index)
+        if p is not None:
+            cv2.circle(image, p, limb // 2 + 1, (150, 170, 210), -1, cv2.LINE_AA)
+    head, neck = point(NOSE), point(NECK)
+    if head is not None:
+        radius = int(np.hypot(head[0] - neck[0], head[1] - neck[1]) * 0.6) if neck is not None else limb * 2
+        cv2.circle(image, head, max(radius, limb), (170, 190, 225), -1, cv2.LINE_AA)
+    return image
+
+
+def render_timeline_video(timeline_path: str, output_path: str, resolution: Tuple[int, int] = (1920, 1080),
+                          fps: float = 30.0, seconds: float = None, truth_path: str = None) -> Dict:
+    """
+    渲染合成视频
+
+    Args:
+        timeline_path: 分析数据时间线
+        output_path: 输出视频路径（.mp4）
+        resolution: (宽, 高)
+        fps: 帧率
+        seconds: 时长（默认与时间线相同，更长时循环）
+        truth_path: 缩放后真实关键点的输出路径（.jsonl，可选）
+
+    Returns:
+        {'path', 'frames', 'width', 'height', 'fps'}
+    """
+    width, height = resolution
+    times, points = resample_points(load_timeline(timeline_path), fps, seconds)
+    points = fit_to_frame(points, width, height)
+    background = draw_background(width, height)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise Exception(f"创建视频失败: {output_path}")
+    truth = TimelineWriter(truth_path) if truth_path else None
+    try:
+        for time_ms, frame_points in zip(times, points):
+            writer.write(draw_figure(background.copy(), frame_points))
+            if truth:
+                truth.append({
+                    'time_ms': int(round(time_ms)),
+                    'landmarks': {str(i): {'x': int(p[0]), 'y': int(p[1]), 'confidence': 1.0}
+                                  for i, p in enumerate(frame_points) if not np.isnan(p).any()},
+                })
+    finally:
+        writer.release()
+        if truth:
+            truth.close()
+    return {"path": output_path, "frames": len(times), "width": width, "height": height, "fps": fps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由分析数据时间线生成骨架人物合成视频")
+    parser.add_argument("output", help="输出视频路径 (.mp4)")
+    parser.add_argument("--timeline", default=TEMPLATE_TIMELINES["连续"],
+                        help="分析数据时间线 (.analysis_data.json / .jsonl，默认为标准连续动作)")
+    parser.add_argument("--resolution", type=parse_resolution, default=RESOLUTIONS["1080p"],
+                        help="分辨率：480p/720p/1080p/1440p/4k 或 宽x高")
+    parser.add_argument("--fps", type=float, default=30.0, help="帧率")
+    parser.add_argument("--seconds", type=float, help="时长（秒，默认与时间线相同）")
+    parser.add_argument("--truth", help="同时输出缩放后的真实关键点时间线 (.jsonl)")
+    args = parser.parse_args()
+
+    info = render_timeline_video(args.timeline, args.output, args.resolution, args.fps, args.seconds, args.truth)
+    print(f"已生成 {info['path']}: {info['width']}x{info['height']} {info['fps']:.0f}FPS，共 {info['frames']} 帧")
+
+
+if __name__ == "__main__":
+    main()
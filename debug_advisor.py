@@ -27,14 +27,15 @@ def debug_action_advisor():
         # 加载数据
         print("\n📊 加载数据...")
         user_data = advisor.load_json_data(user_file)
-        template_data = advisor.load_json_data(template_file)
+        template = advisor.load_template(template_file)
+        template_data = template.stages
         
         print(f"用户数据阶段数: {len(user_data)}")
         print(f"模板数据阶段数: {len(template_data)}")
         
         # 进行对比分析
         print("\n🔄 进行对比分析...")
-        comparison_result = advisor.compare_stages(user_data, template_data)
+        comparison_result = advisor.compare_stages(user_data, template)
         
         print(f"关键问题数量: {len(comparison_result.get('critical_issues', []))}")
         print(f"阶段对比数量: {len(comparison_result.get('stage_comparisons', []))}")
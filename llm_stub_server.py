@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地大模型替身服务器
+实现与火山引擎豆包相同的OpenAI兼容 chat/completions 接口（含SSE流式响应），
+按可配置的首包延迟和token速率回放录制的响应，用于无网络环境下的压测和端到端调试
+
+用法:
+    python llm_stub_server.py --port 8765 --recordings cache/llm --latency-ms 300 --tokens-per-sec 40
+    然后在config.ini的[API]中设置 url = http://127.0.0.1:8765/api/v3/chat/completions
+    （或设置环境变量 BADMINTON_LLM_API_URL）
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.llm_cache import LLMResponseCache
+from modules.prompt_encoder import CompactPromptEncoder
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_ADVICE = """## 训练建议（离线替身服务器）
+
+### 1. 技术纠正
+- **后摆阶段**：肘部抬高至与肩同高，保持约90°夹角
+- **击球/前挥**：以肩带肘、以肘带腕，击球点在身体前上方
+
+### 2. 练习方法
+1. 徒手挥拍 3组 × 20次，重点体会鞭打发力
+2. 多球练习 3组 × 15球，注意击球后快速回位
+
+### 3. 注意事项
+- 避免只用手腕发力
+- 收势后立即恢复准备姿势
+"""
+
+
+class StubLLMServer:
+    """
+    OpenAI兼容的chat/completions替身服务器
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, recordings_dir: str = None,
+                 latency_ms: float = 200, tokens_per_sec: float = 50, fallback_path: str = None):
+        """
+        初始化替身服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            recordings_dir: 录制响应目录（与LLM响应缓存格式相同，按请求参数哈希查找）
+            latency_ms: 首个token前的延迟（毫秒）
+            tokens_per_sec: 生成速率（token/秒），<=0 表示不限速
+            fallback_path: 未命中录制时返回的文本文件（默认按请求类型返回内置响应）
+        """
+        self.recordings = LLMResponseCache(recordings_dir, ttl_seconds=0) if recordings_dir else None
+        self.latency_ms = latency_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.fallback_content = None
+        if fallback_path:
+            with open(fallback_path, 'r', encoding='utf-8') as f:
+                self.fallback_content = f.read()
+
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+        handler = self._make_handler()
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """替身服务器的chat/completions地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v3/chat/completions"
+
+    def start(self) -> "StubLLMServer":
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def resolve_response(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据请求参数查找录制的响应
+
+        Args:
+            request_data: chat/completions请求体
+
+        Returns:
+            包含 content 和 chunks 的字典
+        """
+        messages = request_data.get("messages", [])
+        prompt = messages[-1].get("content", "") if messages else ""
+
+        if self.recordings:
+            key = LLMResponseCache.make_key(
+                request_data.get("model"), prompt,
+                request_data.get("temperature"), request_data.get("max_tokens")
+            )
+            entry = self.recordings.get(key)
+            if entry:
+                return entry
+
+        if self.fallback_content is not None:
+            content = self.fallback_content
+        elif "JSON数组" in prompt:
+            # 阶段化请求：返回标准模板作为阶段化结果
+            with open(os.path.join(PROJECT_DIR, "staged_templates", "击球动作模板.json"), 'r', encoding='utf-8') as f:
+                content = f.read()
+        else:
+            content = DEFAULT_ADVICE
+        return {"content": content, "chunks": self._split_chunks(content)}
+
+    @staticmethod
+    def _split_chunks(content: str, size: int = 2) -> List[str]:
+        """将文本切分为近似单token大小的分片"""
+        return [content[i:i + size] for i in range(0, len(content), size)]
+
+    def _chunk_delay(self, chunk: str) -> float:
+        if self.tokens_per_sec <= 0:
+            return 0.0
+        return CompactPromptEncoder.estimate_tokens(chunk) / self.tokens_per_sec
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    request_data = json.loads(self.rfile.read(length).decode('utf-8'))
+                except Exception as e:
+                    self._send_json(400, {"error": {"message": f"无效的请求体: {e}"}})
+                    return
+
+                with server._count_lock:
+                    server.request_count += 1
+
+                entry = server.resolve_response(request_data)
+                time.sleep(server.latency_ms / 1000.0)
+
+                if request_data.get("stream"):
+                    self._stream(request_data, entry)
+                else:
+                    total_delay = sum(server._chunk_delay(c) for c in entry.get("chunks", []))
+                    time.sleep(total_delay)
+                    self._send_json(200, self._completion_body(request_data, entry["content"]))
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, request_data, entry):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for chunk in entry.get("chunks", []):
+                        event = {
+                            "id": "stub-chatcmpl",
+                            "object": "chat.completion.chunk",
+                            "model": request_data.get("model"),
+                            "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+                        }
+                        self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        delay = server._chunk_delay(chunk)
+                        if delay:
+                            time.sleep(delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端取消了流式请求
+                    pass
+                self.close_connection = True
+
+            @staticmethod
+            def _completion_body(request_data, content):
+                prompt_tokens = sum(
+                    CompactPromptEncoder.estimate_tokens(m.get("content", ""))
+                    for m in request_data.get("messages", [])
+                )
+                completion_tokens = CompactPromptEncoder.estimate_tokens(content)
+                return {
+                    "id": "stub-chatcmpl",
+                    "object": "chat.completion",
+                    "model": request_data.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                }
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地大模型替身服务器（OpenAI兼容chat/completions）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--recordings", default=os.path.join(PROJECT_DIR, "cache", "llm"),
+                        help="录制响应目录（默认复用LLM响应缓存目录）")
+    parser.add_argument("--latency-ms", type=float, default=200, help="首个token前的延迟（毫秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=50, help="生成速率（token/秒），0表示不限速")
+    parser.add_argument("--fallback", default=None, help="未命中录制时返回的文本文件")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.recordings, args.latency_ms,
+                           args.tokens_per_sec, args.fallback)
+    print(f"替身服务器已启动: {server.url}")
+    print("按 Ctrl+C 停止")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
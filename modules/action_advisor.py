@@ -9,7 +9,7 @@ import json
 import os
 import math
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Union
 import requests
 from pathlib import Path
 import matplotlib.pyplot as plt
@@ -17,7 +17,18 @@ import matplotlib.patches as patches
 from matplotlib.patches import Polygon
 import base64
 from io import BytesIO
-import configparser
+import asyncio
+import threading
+import concurrent.futures
+import aiohttp
+from modules.llm_cache import LLMResponseCache
+from modules.async_llm_client import AsyncLLMClient, get_shared_runner
+from modules.llm_settings import load_api_url, read_config
+from modules.perf_trace import get_tracer
+from modules.metrics_exporter import llm_call, record_llm_cache
+from modules.template_cache import load_compiled_template, CompiledTemplate
+from modules.pose_features import (timeline_to_arrays, compute_angle_arrays, stage_angle_distributions,
+                                   ANGLE_DISPLAY_NAMES)
 
 class ActionAdvisor:
     """
@@ -26,7 +37,8 @@ class ActionAdvisor:
     
     def __init__(self, templates_dir="d:\\羽毛球项目\\templates", 
                  staged_dir="d:\\羽毛球项目\\staged_templates",
-                 status_callback=None, streaming_callback=None):
+                 status_callback=None, streaming_callback=None, response_cache=None,
+                 api_url=None):
         """
         初始化动作建议智能体
         
@@ -35,13 +47,30 @@ class ActionAdvisor:
             staged_dir: 用户staged JSON文件目录
             status_callback: 状态回调函数，用于向UI发送连接状态信息
             streaming_callback: 流式内容回调函数（用于实时显示token生成）
+            response_cache: LLM响应缓存（默认使用项目目录下的磁盘缓存，传入False禁用）
+            api_url: chat/completions接口地址（默认读取config.ini或环境变量）
         """
         self.templates_dir = templates_dir
         self.staged_dir = staged_dir
-        self.api_url = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+        self.api_url = api_url or load_api_url()
         self.status_callback = status_callback
         self.streaming_callback = streaming_callback
         
+        # 相同请求参数的LLM响应直接从本地缓存回放
+        if response_cache is None:
+            response_cache = LLMResponseCache()
+        self.response_cache = response_cache or None
+        
+        # 流式请求在共享的后台事件循环中执行，UI回调按50ms合并
+        self._async_runner = get_shared_runner()
+        self.stream_coalesce_interval = 0.05
+        # 本对象提交的流式请求（取消时只取消这些，不影响其他对象的请求）
+        self._stream_futures = set()
+        self._stream_futures_lock = threading.Lock()
+        # 异步客户端（及其并发信号量）在本对象的所有请求间共享，接口地址或密钥变化时重建
+        self._async_client = None
+        self._async_client_lock = threading.Lock()
+        
         # 从config.ini文件读取API密钥
         self.api_key = self._load_api_key_from_config()
         
@@ -69,9 +98,7 @@ class ActionAdvisor:
             API密钥字符串
         """
         try:
-            config = configparser.ConfigParser()
-            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.ini')
-            config.read(config_path, encoding='utf-8')
+            config = read_config()
             
             if 'API' in config and 'key' in config['API']:
                 api_key = config['API']['key'].strip()
@@ -138,13 +165,26 @@ class ActionAdvisor:
         except Exception as e:
             raise Exception(f"加载JSON文件失败 {file_path}: {e}")
     
-    def compare_stages(self, user_data: List[Dict], template_data: List[Dict]) -> Dict[str, Any]:
+    def load_template(self, file_path: str) -> CompiledTemplate:
+        """
+        加载编译后的标准模板（进程内共享缓存，文件修改后自动重新加载）
+        
+        Args:
+            file_path: 模板文件路径
+            
+        Returns:
+            CompiledTemplate（其 stages 为只读的阶段列表）
+        """
+        return load_compiled_template(file_path)
+    
+    def compare_stages(self, user_data: List[Dict],
+                       template: Union[CompiledTemplate, List[Dict]]) -> Dict[str, Any]:
         """
         对比用户数据和模板数据的各个阶段
         
         Args:
             user_data: 用户的staged数据
-            template_data: 标准模板数据
+            template: 编译后的标准模板（load_template 的结果）；传入阶段列表时临时编译
             
         Returns:
             对比分析结果
@@ -152,18 +192,21 @@ class ActionAdvisor:
         comparison_result = {
             "stage_comparisons": [],
             "critical_issues": [],
-            "improvement_suggestions": []
+            "improvement_suggestions": [],
+            "comparison_mode": "scalar"
         }
+        if not isinstance(template, CompiledTemplate):
+            template = CompiledTemplate(None, template)
         
         # 确保两个数据都有5个阶段
-        if len(user_data) != 5 or len(template_data) != 5:
+        if len(user_data) != 5 or len(template.stages) != 5:
             comparison_result["critical_issues"].append(
-                f"阶段数量不匹配：用户数据{len(user_data)}个阶段，模板{len(template_data)}个阶段"
+                f"阶段数量不匹配：用户数据{len(user_data)}个阶段，模板{len(template.stages)}个阶段"
             )
             return comparison_result
         
-        for i, (user_stage, template_stage) in enumerate(zip(user_data, template_data)):
-            stage_comparison = self._compare_single_stage(user_stage, template_stage)
+        for i, user_stage in enumerate(user_data):
+            stage_comparison = self._compare_single_stage(user_stage, template, i)
             comparison_result["stage_comparisons"].append(stage_comparison)
             
             # 收集关键问题
@@ -177,13 +220,144 @@ class ActionAdvisor:
         
         return comparison_result
     
-    def _compare_single_stage(self, user_stage: Dict, template_stage: Dict) -> Dict[str, Any]:
+    def compare_stages_by_frames(self, user_timeline: List[Dict], user_data: List[Dict],
+                                 template_timeline: List[Dict], template_data: List[Dict],
+                                 template_distributions: List[Dict] = None) -> Dict[str, Any]:
+        """
+        逐帧对比：直接从时间线中各阶段窗口内的所有帧计算角度分布（均值、分位数、峰值及峰值时刻），
+        与模板时间线的分布对比，而不是只比较阶段化数据中的 ideal 数值
+        
+        Args:
+            user_timeline: 用户的原始时间线（逐帧landmarks）
+            user_data: 用户的staged数据（提供阶段时间窗口）
+            template_timeline: 标准动作的原始时间线
+            template_data: 标准模板数据
+            template_distributions: 已计算的模板各阶段角度分布（CompiledTemplate.frame_distributions，
+                提供时不再处理 template_timeline）
+            
+        Returns:
+            对比分析结果（结构与 compare_stages 相同，角度分析中附带分布数据）
+        """
+        comparison_result = {
+            "stage_comparisons": [],
+            "critical_issues": [],
+            "improvement_suggestions": [],
+            "comparison_mode": "frames"
+        }
+        
+        if len(user_data) != 5 or len(template_data) != 5:
+            comparison_result["critical_issues"].append(
+                f"阶段数量不匹配：用户数据{len(user_data)}个阶段，模板{len(template_data)}个阶段"
+            )
+            return comparison_result
+        
+        # 整段时间线一次性转换为数组并计算全部角度，再按阶段窗口统计
+        user_times, user_points = timeline_to_arrays(user_timeline)
+        user_distributions = stage_angle_distributions(
+            user_times, compute_angle_arrays(user_points), user_data)
+        if template_distributions is None:
+            template_times, template_points = timeline_to_arrays(template_timeline)
+            template_distributions = stage_angle_distributions(
+                template_times, compute_angle_arrays(template_points), template_data)
+        
+        for user_stage, template_stage, user_dist, template_dist in zip(
+                user_data, template_data, user_distributions, template_distributions):
+            stage_name = user_stage.get("stage", "未知阶段")
+            timing_analysis = self._analyze_timing(
+                user_stage.get("start_ms", 0), user_stage.get("end_ms", 0),
+                template_stage.get("start_ms", 0), template_stage.get("end_ms", 0)
+            )
+            angle_analysis = self._analyze_angle_distributions(user_dist["angles"], template_dist["angles"])
+            angle_analysis["user_frames"] = user_dist["frames"]
+            angle_analysis["template_frames"] = template_dist["frames"]
+            
+            stage_comparison = {
+                "stage_name": stage_name,
+                "timing_analysis": timing_analysis,
+                "angle_analysis": angle_analysis,
+                "issues": [],
+                "suggestions": self._generate_stage_suggestions(stage_name, timing_analysis, angle_analysis)
+            }
+            comparison_result["stage_comparisons"].append(stage_comparison)
+            
+            for issue in timing_analysis.get("issues", []) + angle_analysis.get("issues", []):
+                if "偏差过大" in issue or "偏差严重" in issue:
+                    comparison_result["critical_issues"].append(issue)
+        
+        return comparison_result
+    
+    def _analyze_angle_distributions(self, user_angles: Dict, template_angles: Dict) -> Dict[str, Any]:
+        """
+        对比角度分布
+        
+        Args:
+            user_angles: 用户阶段内各角度的分布统计
+            template_angles: 模板阶段内各角度的分布统计
+            
+        Returns:
+            角度分析结果（angle_details 中 user_ideal/template_ideal 为中位数，便于沿用建议生成逻辑）
+        """
+        issues = []
+        angle_details = {}
+        
+        for angle_name, template_dist in template_angles.items():
+            display_name = ANGLE_DISPLAY_NAMES.get(angle_name, angle_name)
+            user_dist = user_angles.get(angle_name)
+            if user_dist is None:
+                issues.append(f"缺少角度数据：{display_name}")
+                continue
+            
+            median_diff = abs(user_dist["p50"] - template_dist["p50"])
+            range_diff = (user_dist["p90"] - user_dist["p10"]) - (template_dist["p90"] - template_dist["p10"])
+            peak_diff = user_dist["peak"] - template_dist["peak"]
+            peak_time_diff = user_dist["peak_time_ms"] - template_dist["peak_time_ms"]
+            
+            angle_detail = {
+                "user_ideal": user_dist["p50"],
+                "template_ideal": template_dist["p50"],
+                "difference": median_diff,
+                "range_diff": range_diff,
+                "peak_diff": peak_diff,
+                "peak_time_diff": peak_time_diff,
+                "user_distribution": user_dist,
+                "template_distribution": template_dist,
+                "severity": "normal"
+            }
+            
+            if median_diff > self.angle_thresholds["major"]:
+                angle_detail["severity"] = "major"
+                issues.append(f"{display_name}偏差严重：中位数相差{median_diff:.1f}°")
+            elif median_diff > self.angle_thresholds["moderate"]:
+                angle_detail["severity"] = "moderate"
+                issues.append(f"{display_name}偏差较大：中位数相差{median_diff:.1f}°")
+            elif median_diff > self.angle_thresholds["minor"]:
+                angle_detail["severity"] = "minor"
+                issues.append(f"{display_name}略有偏差：中位数相差{median_diff:.1f}°")
+            
+            if abs(range_diff) > self.angle_thresholds["major"]:
+                issues.append(f"{display_name}活动幅度{'过大' if range_diff > 0 else '不足'}：相差{abs(range_diff):.1f}°")
+            if abs(peak_diff) > self.angle_thresholds["major"]:
+                issues.append(f"{display_name}峰值{'偏大' if peak_diff > 0 else '偏小'}：相差{abs(peak_diff):.1f}°")
+            if abs(peak_time_diff) > self.time_thresholds["moderate"]:
+                issues.append(f"{display_name}峰值出现{'偏晚' if peak_time_diff > 0 else '偏早'}："
+                              f"{self._format_time_diff(int(abs(peak_time_diff)))}")
+            
+            angle_details[angle_name] = angle_detail
+        
+        return {
+            "issues": issues,
+            "angle_details": angle_details
+        }
+    
+    def _compare_single_stage(self, user_stage: Dict, template: CompiledTemplate,
+                              stage_index: int) -> Dict[str, Any]:
         """
         对比单个阶段的数据
         
         Args:
             user_stage: 用户阶段数据
-            template_stage: 模板阶段数据
+            template: 编译后的标准模板
+            stage_index: 阶段序号
             
         Returns:
             单阶段对比结果
@@ -201,15 +375,16 @@ class ActionAdvisor:
         timing_analysis = self._analyze_timing(
             user_stage.get("start_ms", 0),
             user_stage.get("end_ms", 0),
-            template_stage.get("start_ms", 0),
-            template_stage.get("end_ms", 0)
+            int(template.start_ms[stage_index]),
+            int(template.end_ms[stage_index])
         )
         stage_result["timing_analysis"] = timing_analysis
         
         # 2. 角度分析
         angle_analysis = self._analyze_angles(
             user_stage.get("expected_values", {}),
-            template_stage.get("expected_values", {})
+            template,
+            stage_index
         )
         stage_result["angle_analysis"] = angle_analysis
         
@@ -280,13 +455,14 @@ class ActionAdvisor:
         else:
             return f"{time_ms}毫秒"
     
-    def _analyze_angles(self, user_angles: Dict, template_angles: Dict) -> Dict[str, Any]:
+    def _analyze_angles(self, user_angles: Dict, template: CompiledTemplate, stage_index: int) -> Dict[str, Any]:
         """
-        分析角度差异
+        分析角度差异（模板的 ideal/min/max 取自编译后的数组）
         
         Args:
             user_angles: 用户角度数据
-            template_angles: 模板角度数据
+            template: 编译后的标准模板
+            stage_index: 阶段序号
             
         Returns:
             角度分析结果
@@ -294,50 +470,44 @@ class ActionAdvisor:
         issues = []
         angle_details = {}
         
-        # 角度名称映射（英文到中文）
-        angle_name_mapping = {
-            "elbow_angle": "肘部角度",
-            "shoulder_angle": "肩部角度", 
-            "hip_angle": "髋部角度",
-            "wrist_angle": "腕部角度",
-            "knee_angle": "膝部角度"
-        }
-        
-        # 分析每个关键角度
-        for angle_name in template_angles.keys():
+        # 模板在该阶段给出了理想值的角度
+        ideal_row = template.ideal[stage_index]
+        columns = [col for col in range(len(template.angle_names)) if not np.isnan(ideal_row[col])]
+        for col in columns:
+            angle_name = template.angle_names[col]
             if angle_name not in user_angles:
                 issues.append(f"缺少角度数据：{angle_name}")
-                continue
-            
-            user_angle = user_angles[angle_name]
-            template_angle = template_angles[angle_name]
-            
-            # 获取理想值进行比较
-            user_ideal = user_angle.get("ideal", 0)
-            template_ideal = template_angle.get("ideal", 0)
-            
-            angle_diff = abs(user_ideal - template_ideal)
-            
+        columns = [col for col in columns if template.angle_names[col] in user_angles]
+        
+        # 获取理想值进行比较
+        user_ideals = np.array([user_angles[template.angle_names[col]].get("ideal", 0) for col in columns], dtype=float)
+        template_ideals = ideal_row[columns]
+        angle_diffs = np.abs(user_ideals - template_ideals)
+        
+        for col, user_ideal, template_ideal, angle_diff in zip(columns, user_ideals, template_ideals, angle_diffs):
+            angle_name = template.angle_names[col]
             # 获取中文名称用于显示
-            display_name = angle_name_mapping.get(angle_name, angle_name)
+            display_name = ANGLE_DISPLAY_NAMES.get(angle_name, angle_name)
+            low, high = template.min[stage_index, col], template.max[stage_index, col]
+            standard_range = f"（标准范围{low:.0f}°~{high:.0f}°）" if np.isfinite(low) and np.isfinite(high) else ""
             
             angle_detail = {
-                "user_ideal": user_ideal,
-                "template_ideal": template_ideal,
-                "difference": angle_diff,
+                "user_ideal": float(user_ideal),
+                "template_ideal": float(template_ideal),
+                "difference": float(angle_diff),
                 "severity": "normal"
             }
             
             # 根据角度差异评估严重程度
             if angle_diff > self.angle_thresholds["major"]:
                 angle_detail["severity"] = "major"
-                issues.append(f"{display_name}偏差严重：{angle_diff:.1f}°")
+                issues.append(f"{display_name}偏差严重：{angle_diff:.1f}°{standard_range}")
             elif angle_diff > self.angle_thresholds["moderate"]:
                 angle_detail["severity"] = "moderate"
-                issues.append(f"{display_name}偏差较大：{angle_diff:.1f}°")
+                issues.append(f"{display_name}偏差较大：{angle_diff:.1f}°{standard_range}")
             elif angle_diff > self.angle_thresholds["minor"]:
                 angle_detail["severity"] = "minor"
-                issues.append(f"{display_name}略有偏差：{angle_diff:.1f}°")
+                issues.append(f"{display_name}略有偏差：{angle_diff:.1f}°{standard_range}")
             
             angle_details[angle_name] = angle_detail
         
@@ -375,15 +545,7 @@ class ActionAdvisor:
                 user_val = angle_detail["user_ideal"]
                 template_val = angle_detail["template_ideal"]
                 
-                # 获取角度的中文显示名称
-                angle_name_mapping = {
-                    "elbow_angle": "肘部角度",
-                    "shoulder_angle": "肩部角度", 
-                    "hip_angle": "髋部角度",
-                    "wrist_angle": "腕部角度",
-                    "knee_angle": "膝部角度"
-                }
-                display_name = angle_name_mapping.get(angle_name, angle_name)
+                display_name = ANGLE_DISPLAY_NAMES.get(angle_name, angle_name)
                 
                 if "elbow" in angle_name:
                     if user_val > template_val:
@@ -428,33 +590,16 @@ class ActionAdvisor:
             
             # 加载数据
             user_data = self.load_json_data(user_file_path)
-            template_data = self.load_json_data(template_file_path)
+            template = self.load_template(template_file_path)
+            template_data = template.stages
             
             # 进行对比分析
-            comparison_result = self.compare_stages(user_data, template_data)
+            comparison_result = self.compare_stages(user_data, template)
             
             # 生成LLM增强建议（使用流式版本）
             llm_response = self._generate_llm_advice_streaming(comparison_result, user_data, template_data)
             
-            # 提取LLM返回的建议
-            if isinstance(llm_response, dict):
-                llm_advice = llm_response.get("advice", "AI建议生成失败")
-            else:
-                llm_advice = llm_response if isinstance(llm_response, str) else "AI建议生成失败"
-            
-            # 构建最终报告（移除评分相关内容）
-            final_report = {
-                "analysis_timestamp": self._get_timestamp(),
-                "user_file": os.path.basename(user_file_path),
-                "template_file": os.path.basename(template_file_path),
-                "stage_analysis": comparison_result["stage_comparisons"],
-                "critical_issues": comparison_result["critical_issues"],
-                "detailed_suggestions": self._collect_all_suggestions(comparison_result),
-                "llm_enhanced_advice": llm_advice,
-                "practice_plan": self._generate_practice_plan(comparison_result)
-            }
-            
-            return final_report
+            return self.build_report(comparison_result, llm_response, user_file_path, template_file_path)
             
         except Exception as e:
             return {
@@ -462,6 +607,42 @@ class ActionAdvisor:
                 "analysis_timestamp": self._get_timestamp()
             }
     
+    def build_report(self, comparison_result: Dict, llm_response: Any,
+                     user_file_path: str, template_file_path: str) -> Dict[str, Any]:
+        """
+        根据对比结果和LLM返回内容构建综合报告
+        
+        Args:
+            comparison_result: compare_stages 的对比结果
+            llm_response: LLM建议（字符串或包含advice字段的字典）
+            user_file_path: 用户staged文件路径
+            template_file_path: 模板文件路径
+            
+        Returns:
+            综合建议报告
+        """
+        # 提取LLM返回的建议
+        if isinstance(llm_response, dict):
+            llm_advice = llm_response.get("advice", "AI建议生成失败")
+        else:
+            llm_advice = llm_response if isinstance(llm_response, str) else "AI建议生成失败"
+        
+        # 构建最终报告（移除评分相关内容）
+        return {
+            "analysis_timestamp": self._get_timestamp(),
+            "user_file": os.path.basename(user_file_path),
+            "template_file": os.path.basename(template_file_path),
+            # frames: 角度为阶段内逐帧分布的中位数；scalar: 角度为阶段化数据的 ideal 值
+            "comparison_mode": comparison_result.get("comparison_mode", "scalar"),
+            # 动作类型识别结果（仅供参考，对比始终基于 template_file）
+            "stroke_classification": comparison_result.get("stroke_classification"),
+            "stage_analysis": comparison_result["stage_comparisons"],
+            "critical_issues": comparison_result["critical_issues"],
+            "detailed_suggestions": self._collect_all_suggestions(comparison_result),
+            "llm_enhanced_advice": llm_advice,
+            "practice_plan": self._generate_practice_plan(comparison_result)
+        }
+    
     def generate_advice(self, user_file_path: str = None, template_file_path: str = None, 
                        return_format: str = "dict") -> Any:
         """
@@ -547,22 +728,37 @@ class ActionAdvisor:
                     "top_p": 0.9
                 }
                 
+                cache_key = LLMResponseCache.make_key(
+                    data["model"], prompt, data["temperature"], data["max_tokens"]
+                )
+                cached = self.response_cache.get(cache_key) if self.response_cache else None
+                if self.response_cache:
+                    record_llm_cache("advice", cached is not None)
+                if cached:
+                    self._send_status("♻️ 命中本地缓存，跳过AI服务调用")
+                    return cached["content"].strip()
+                
                 current_timeout = timeout_values[attempt]
                 status_msg = f"🌐 正在调用AI服务 (尝试 {attempt + 1}/{max_retries})\n   超时设置: {current_timeout}秒"
                 self._send_status(status_msg)
                 
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    json=data,
-                    timeout=current_timeout,
-                    proxies={'http': None, 'https': None}
-                )
+                with get_tracer().span("llm_request", category="llm", caller="advice", stream=False), \
+                        llm_call("advice"):
+                    response = requests.post(
+                        self.api_url,
+                        headers=headers,
+                        json=data,
+                        timeout=current_timeout,
+                        proxies={'http': None, 'https': None}
+                    )
+                    response.raise_for_status()
                 
-                response.raise_for_status()
                 result = response.json()
                 content = result['choices'][0]['message']['content']
                 
+                if self.response_cache and content.strip():
+                    self.response_cache.put(cache_key, content)
+                
                 # 直接返回文本内容
                 return content.strip()
                 
@@ -628,77 +824,63 @@ class ActionAdvisor:
         print(f"调试信息: API密钥已加载 (长度: {len(self.api_key)})")
         print(f"调试信息: API URL: {self.api_url}")
         
+        data = {
+            "model": "doubao-seed-1-6-thinking-250715",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 4096,  # 增加token限制以获得完整回复
+            "top_p": 0.9,
+            "stream": True  # 启用流式响应
+        }
+        
+        # 命中缓存时按原始分片回放，不再访问网络
+        cache_key = LLMResponseCache.make_key(
+            data["model"], prompt, data["temperature"], data["max_tokens"]
+        )
+        cached = self.response_cache.get(cache_key) if self.response_cache else None
+        if self.response_cache:
+            record_llm_cache("advice", cached is not None)
+        if cached:
+            self._send_status("♻️ 命中本地缓存，回放AI建议...")
+            self._send_streaming_status("🤖 AI教练正在思考中...\n\n")
+            content = self.response_cache.replay(cached, self._send_streaming_status)
+            self._send_status("✅ 已从本地缓存加载AI建议")
+            return content.strip()
+        
         self._send_status("🔗 开始连接AI服务器...")
         self._send_streaming_status("🤖 AI教练正在思考中...\n\n")
         
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            data = {
-                "model": "doubao-seed-1-6-thinking-250715",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 4096,  # 增加token限制以获得完整回复
-                "top_p": 0.9,
-                "stream": True  # 启用流式响应
-            }
-            
             self._send_status("📡 发送流式请求数据...")
             print(f"调试信息: 发送流式POST请求到 {self.api_url}")
             
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=120,  # 减少超时时间到2分钟，提高响应速度
-                stream=True,  # 启用流式接收
-                proxies={'http': None, 'https': None}
+            # 在后台事件循环中接收SSE流，增量按时间间隔合并后再回调UI
+            future = self._submit_stream(
+                self._get_async_client().stream_chat(
+                    data, self._send_streaming_status, self.stream_coalesce_interval, caller="advice"
+                )
             )
-            
-            response.raise_for_status()
-            
-            self._send_status("📥 开始接收流式响应...")
-            
-            # 处理流式响应
-            full_content = ""
-            import json
-            
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        data_str = line_str[6:]  # 移除 'data: ' 前缀
-                        
-                        if data_str.strip() == '[DONE]':
-                            break
-                        
-                        try:
-                            chunk_data = json.loads(data_str)
-                            if 'choices' in chunk_data and len(chunk_data['choices']) > 0:
-                                delta = chunk_data['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    content_chunk = delta['content']
-                                    full_content += content_chunk
-                                    # 实时发送每个token到UI
-                                    self._send_streaming_status(content_chunk)
-                        except json.JSONDecodeError:
-                            continue
+            full_content, chunks = future.result()
             
             self._send_status("✅ AI服务流式调用成功！")
             print("LLM流式调用成功！")
             
+            if self.response_cache and full_content.strip():
+                self.response_cache.put(cache_key, full_content, chunks)
+            
             # 返回完整的建议文本
             return full_content.strip() if full_content.strip() else self._generate_fallback_advice(comparison_result)
             
-        except requests.exceptions.Timeout:
+        except concurrent.futures.CancelledError:
+            self._send_status("⏹️ AI建议生成已取消\n🔄 切换到本地分析模式")
+            print("LLM流式调用已被取消")
+            return self._generate_fallback_advice(comparison_result)
+        except asyncio.TimeoutError:
             error_msg = "⏰ 流式连接超时\n🔄 切换到本地分析模式"
             self._send_status(error_msg)
             print("LLM流式调用超时，使用本地分析结果")
             return self._generate_fallback_advice(comparison_result)
-        except requests.exceptions.ConnectionError as e:
+        except aiohttp.ClientConnectionError as e:
             error_msg = f"❌ 网络连接失败: {str(e)}\n🔄 切换到本地分析模式"
             self._send_status(error_msg)
             print(f"网络连接错误: {str(e)}")
@@ -709,6 +891,101 @@ class ActionAdvisor:
             print(f"LLM流式调用失败: {str(e)}")
             return self._generate_fallback_advice(comparison_result)
     
+    def generate_stage_advice_concurrently(self, comparison_result: Dict) -> Dict[str, str]:
+        """
+        为存在问题的阶段并发生成AI建议（各阶段请求同时进行，受客户端并发数限制）
+        
+        Args:
+            comparison_result: 对比分析结果
+            
+        Returns:
+            阶段名称 -> 建议文本；调用失败或被取消的阶段使用本地建议，没有问题的阶段不生成
+        """
+        stages = [stage for stage in comparison_result.get('stage_comparisons', [])
+                  if stage.get('suggestions') or stage.get('angle_analysis', {}).get('issues')]
+        if not stages:
+            return {}
+        fallback = {
+            stage['stage_name']: "\n".join(stage.get('suggestions', [])) or
+            "\n".join(stage.get('angle_analysis', {}).get('issues', []))
+            for stage in stages
+        }
+        if not self.api_key:
+            return fallback
+        
+        payloads = {}
+        for stage in stages:
+            details = stage.get('suggestions', []) + stage.get('angle_analysis', {}).get('issues', [])
+            prompt = f"""
+你是一位专业的羽毛球教练，请只针对【{stage['stage_name']}】阶段给出简洁、可操作的纠正建议。
+【该阶段分析】:
+{chr(10).join(details)}
+要求：不超过200字，具体到身体部位和角度，直接输出建议文本。
+"""
+            payloads[stage['stage_name']] = {
+                "model": "doubao-seed-1-6-thinking-250715",
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.7,
+                "max_tokens": 1024,
+                "top_p": 0.9
+            }
+        
+        def on_done(stage_name, result):
+            # 各阶段的token交错到达，逐阶段完成后整段写入流式显示区域，避免内容混在一起
+            text = result.strip() if isinstance(result, str) and result.strip() else fallback[stage_name]
+            self._send_streaming_status(f"\n\n【{stage_name}】\n{text}")
+        
+        self._send_status(f"🔗 并发生成 {len(payloads)} 个阶段的AI建议...")
+        self._send_streaming_status("\n\n📋 分阶段建议:")
+        future = self._submit_stream(
+            self._get_async_client().stream_many(payloads, coalesce_interval=self.stream_coalesce_interval,
+                                                 caller="stage_advice", on_done=on_done)
+        )
+        try:
+            results = future.result()
+        except concurrent.futures.CancelledError:
+            self._send_status("⏹️ 阶段建议生成已取消")
+            return fallback
+        
+        stage_advice = {}
+        for stage_name, result in results.items():
+            if isinstance(result, Exception) or not str(result).strip():
+                stage_advice[stage_name] = fallback[stage_name]
+            else:
+                stage_advice[stage_name] = result.strip()
+        self._send_status("✅ 阶段AI建议生成完成")
+        return stage_advice
+    
+    def _submit_stream(self, coro) -> concurrent.futures.Future:
+        """提交流式请求协程到共享事件循环，并记录到本对象的请求集合中"""
+        future = self._async_runner.submit(coro)
+        with self._stream_futures_lock:
+            self._stream_futures.add(future)
+        future.add_done_callback(self._discard_stream_future)
+        return future
+
+    def _discard_stream_future(self, future) -> None:
+        with self._stream_futures_lock:
+            self._stream_futures.discard(future)
+
+    def cancel_streaming(self) -> None:
+        """
+        取消本对象正在进行的流式建议生成（供UI的停止按钮和流水线的取消回调调用）
+        """
+        with self._stream_futures_lock:
+            pending = list(self._stream_futures)
+        cancelled = sum(1 for future in pending if future.cancel())
+        if cancelled:
+            self._send_status(f"⏹️ 已取消 {cancelled} 个AI请求")
+    
+    def _get_async_client(self) -> AsyncLLMClient:
+        """本对象共享的异步客户端（UI可能在构造后修改api_key，地址或密钥变化时重建）"""
+        with self._async_client_lock:
+            client = self._async_client
+            if client is None or client.api_url != self.api_url or client.api_key != self.api_key:
+                client = self._async_client = AsyncLLMClient(self.api_url, self.api_key, timeout=120)
+            return client
+    
     def _send_status(self, message: str) -> None:
         """
         发送状态信息到UI
@@ -1059,15 +1336,16 @@ class ActionAdvisor:
                 output_path = os.path.join(self.staged_dir, f"advice_report_{timestamp}.json")
         
         try:
-            if format_type == "txt":
-                # 保存可读性报告
-                readable_report = self.generate_ui_friendly_report(report)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(readable_report)
-            else:
-                # 保存JSON格式
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(report, f, ensure_ascii=False, indent=2)
+            with get_tracer().span("report_save", format=format_type):
+                if format_type == "txt":
+                    # 保存可读性报告
+                    readable_report = self.generate_ui_friendly_report(report)
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        f.write(readable_report)
+                else:
+                    # 保存JSON格式
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        json.dump(report, f, ensure_ascii=False, indent=2)
             return output_path
         except Exception as e:
             raise Exception(f"保存报告失败: {e}")
\ No newline at end of file
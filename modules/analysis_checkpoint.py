@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频分析检查点
+检测过程中定期把新增的时间线帧写成只追加的分块文件，检查点以 (视频路径, 文件哈希, 检测器配置) 为键；
+中途停止或程序关闭后重新分析同一视频时，从最后处理的帧继续
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List
+
+from modules.file_hash import hash_file
+
+
+class AnalysisCheckpoint:
+    """
+    单个视频的分析检查点
+    """
+
+    def __init__(self, video_path: str, detector_config: Dict[str, Any], checkpoint_dir: str = None,
+                 flush_every_frames: int = 300, flush_every_seconds: float = 10.0):
+        """
+        初始化检查点
+
+        Args:
+            video_path: 视频文件路径
+            detector_config: 检测器配置（模型类型、设备、阈值等），配置变化时不复用旧检查点
+            checkpoint_dir: 检查点根目录（默认为项目根目录下的 cache/checkpoints）
+            flush_every_frames: 每处理多少帧写一次分块
+            flush_every_seconds: 距上次写入超过该时间（秒）也写一次分块
+        """
+        if checkpoint_dir is None:
+            checkpoint_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "cache", "checkpoints")
+        self.video_path = os.path.abspath(video_path)
+        self.detector_config = detector_config
+        self.flush_every_frames = flush_every_frames
+        self.flush_every_seconds = flush_every_seconds
+        self.file_hash = hash_file(video_path)
+        self.key = self.make_key(self.video_path, self.file_hash, detector_config)
+        self.directory = os.path.join(checkpoint_dir, self.key)
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._last_frame = 0
+        self._flushed_frame = 0
+        self._last_flush_time = time.monotonic()
+        self._manifest = None
+
+    @staticmethod
+    def make_key(video_path: str, file_hash: str, detector_config: Dict[str, Any]) -> str:
+        """
+        计算检查点键
+
+        Args:
+            video_path: 视频绝对路径
+            file_hash: 视频文件内容哈希
+            detector_config: 检测器配置
+
+        Returns:
+            十六进制摘要
+        """
+        payload = json.dumps(
+            {"video_path": video_path, "file_hash": file_hash, "detector_config": detector_config},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _new_manifest(self) -> Dict[str, Any]:
+        return {
+            "video_path": self.video_path,
+            "file_hash": self.file_hash,
+            "detector_config": self.detector_config,
+            "chunks": [],
+            "last_frame": 0,
+        }
+
+    def _write_json_atomic(self, path: str, data) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self) -> int:
+        """
+        读取已有检查点的清单
+
+        Returns:
+            最后处理的帧序号；没有可用检查点时返回0
+        """
+        with self._lock:
+            self._manifest = self._new_manifest()
+            if not os.path.exists(self.manifest_path):
+                return 0
+
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                for chunk in manifest.get("chunks", []):
+                    if not os.path.exists(os.path.join(self.directory, chunk["file"])):
+                        raise FileNotFoundError(chunk["file"])
+            except Exception as e:
+                print(f"读取检查点失败，重新开始分析: {e}")
+                return 0
+
+            self._manifest = manifest
+            self._last_frame = self._flushed_frame = manifest.get("last_frame", 0)
+            return self._last_frame
+
+    def iter_entries(self) -> Iterator[Dict[str, Any]]:
+        """
+        逐个分块读取检查点中已保存的时间线条目（内存中同时只有一个分块）
+
+        Yields:
+            时间线条目
+        """
+        with self._lock:
+            chunks = list(self._manifest["chunks"]) if self._manifest else []
+        for chunk in chunks:
+            with open(os.path.join(self.directory, chunk["file"]), 'r', encoding='utf-8') as f:
+                for entry in json.load(f):
+                    yield entry
+
+    def record(self, frame_index: int, entry: Dict[str, Any] = None) -> None:
+        """
+        记录一帧的处理结果（未检测到姿态时entry为None），达到间隔后自动写入分块
+
+        Args:
+            frame_index: 帧序号（从1开始）
+            entry: 时间线条目 {'time_ms', 'landmarks'}
+        """
+        with self._lock:
+            if entry is not None:
+                self._pending.append(entry)
+            self._last_frame = frame_index
+            due = (frame_index - self._flushed_frame >= self.flush_every_frames
+                   or time.monotonic() - self._last_flush_time >= self.flush_every_seconds)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """把尚未写入的帧追加为新的分块文件，并更新清单"""
+        with self._lock:
+            if self._last_frame == self._flushed_frame:
+                return
+            if self._manifest is None:
+                self._manifest = self._new_manifest()
+            os.makedirs(self.directory, exist_ok=True)
+
+            chunk_name = f"chunk_{len(self._manifest['chunks']):05d}.json"
+            self._write_json_atomic(os.path.join(self.directory, chunk_name), self._pending)
+            self._manifest["chunks"].append({
+                "file": chunk_name,
+                "frames": len(self._pending),
+                "last_frame": self._last_frame,
+            })
+            self._manifest["last_frame"] = self._last_frame
+            # 清单最后写入：清单中未登记的分块在下次读取时会被忽略
+            self._write_json_atomic(self.manifest_path, self._manifest)
+
+            self._pending = []
+            self._flushed_frame = self._last_frame
+            self._last_flush_time = time.monotonic()
+
+    def discard(self) -> None:
+        """删除检查点（分析完成后调用）"""
+        with self._lock:
+            self._pending = []
+            self._manifest = None
+            shutil.rmtree(self.directory, ignore_errors=True)
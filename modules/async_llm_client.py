@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步流式大模型客户端
+基于asyncio + aiohttp 处理SSE流式响应，支持多个建议生成并发执行、随时取消，
+并将逐token的增量合并后再回调，避免UI被逐token的回调淹没
+"""
+
+import json
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import aiohttp
+
+from modules.perf_trace import get_tracer
+from modules.metrics_exporter import record_llm_call
+
+
+class TokenCoalescer:
+    """
+    token合并器：缓冲流式增量，按时间间隔或字符数批量回调
+    """
+
+    def __init__(self, callback: Optional[Callable[[str], None]], interval: float = 0.05,
+                 max_chars: int = 256):
+        """
+        初始化合并器
+
+        Args:
+            callback: 接收合并后文本的回调函数
+            interval: 两次回调之间的最小间隔（秒）
+            max_chars: 缓冲达到该字符数时立即回调
+        """
+        self.callback = callback
+        self.interval = interval
+        self.max_chars = max_chars
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    def feed(self, text: str) -> None:
+        """写入一个增量片段，必要时触发回调"""
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        now = time.monotonic()
+        if self._buffered_chars >= self.max_chars or now - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """立即回调缓冲区中的全部内容"""
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+        if self.callback:
+            try:
+                self.callback(text)
+            except Exception as e:
+                print(f"流式回调失败: {e}")
+
+
+class AsyncLLMClient:
+    """
+    OpenAI兼容chat/completions接口的异步流式客户端
+    """
+
+    def __init__(self, api_url: str, api_key: str, timeout: float = 120, max_concurrency: int = 4):
+        """
+        初始化客户端
+
+        Args:
+            api_url: chat/completions接口地址
+            api_key: API密钥
+            timeout: 连接和两次读取之间的超时时间（秒）
+            max_concurrency: 同时进行的最大请求数
+        """
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=timeout, sock_read=timeout)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量必须在事件循环内创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def stream_chat(self, payload: Dict[str, Any], on_text: Callable[[str], None] = None,
+                          coalesce_interval: float = 0.05,
+                          session: aiohttp.ClientSession = None,
+                          caller: str = "stream") -> Tuple[str, List[str]]:
+        """
+        发送流式请求并逐步回调生成的文本
+
+        Args:
+            payload: 请求体（会自动加上 stream=True）
+            on_text: 接收合并后文本片段的回调
+            coalesce_interval: 合并回调的时间间隔（秒），0表示逐token回调
+            session: 复用的aiohttp会话（可选）
+            caller: 调用方名称（运行指标的标签）
+
+        Returns:
+            (完整文本, 原始token分片列表)
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        body = dict(payload, stream=True)
+        coalescer = TokenCoalescer(on_text, interval=coalesce_interval)
+        chunks = []
+        tracer = get_tracer()
+        first_token_ns = None
+        completed = False
+
+        async with self._get_semaphore():
+            own_session = session is None
+            if own_session:
+                # trust_env=False 与原requests调用中禁用代理的行为一致
+                session = aiohttp.ClientSession(timeout=self.timeout, trust_env=False)
+            request_start = time.perf_counter_ns()
+            try:
+                async with session.post(self.api_url, headers=headers, json=body) as response:
+                    response.raise_for_status()
+                    async for raw_line in response.content:
+                        line = raw_line.decode('utf-8').strip()
+                        if not line.startswith('data: '):
+                            continue
+                        data_str = line[6:]
+                        if data_str == '[DONE]':
+                            break
+                        try:
+                            chunk_data = json.loads(data_str)
+                        except json.JSONDecodeError:
+                            continue
+                        choices = chunk_data.get('choices') or []
+                        if choices:
+                            content_chunk = choices[0].get('delta', {}).get('content')
+                            if content_chunk:
+                                if first_token_ns is None:
+                                    first_token_ns = time.perf_counter_ns()
+                                    tracer.record("llm_ttft", request_start, first_token_ns, category="llm")
+                                chunks.append(content_chunk)
+                                coalescer.feed(content_chunk)
+                completed = True
+            finally:
+                coalescer.flush()
+                if own_session:
+                    await session.close()
+                self._record_request(tracer, request_start, first_token_ns, len(chunks), caller, completed)
+
+        return "".join(chunks), chunks
+
+    @staticmethod
+    def _record_request(tracer, start_ns: int, first_token_ns: Optional[int], tokens: int,
+                        caller: str, completed: bool) -> None:
+        """记录一次流式请求：总耗时区间附带token数，首token之后的生成速度记为计数器（流式分片按token计）"""
+        end_ns = time.perf_counter_ns()
+        record_llm_call(caller, (end_ns - start_ns) / 1e9, stream=True, ok=completed,
+                        ttft_seconds=(first_token_ns - start_ns) / 1e9 if first_token_ns is not None else None)
+        args = {"stream": True, "tokens": tokens}
+        if first_token_ns is not None:
+            args["ttft_ms"] = (first_token_ns - start_ns) / 1e6
+            generation_s = (end_ns - first_token_ns) / 1e9
+            if tokens > 1 and generation_s > 0:
+                args["tokens_per_sec"] = (tokens - 1) / generation_s
+                tracer.counter("llm_tokens_per_sec", args["tokens_per_sec"], category="llm")
+        tracer.record("llm_request", start_ns, end_ns, category="llm", args=args)
+
+    async def stream_many(self, payloads: Dict[str, Dict[str, Any]],
+                          on_text: Callable[[str, str], None] = None,
+                          coalesce_interval: float = 0.05, caller: str = "stream",
+                          on_done: Callable[[str, Any], None] = None) -> Dict[str, Any]:
+        """
+        并发执行多个流式请求（共享同一个会话，并发数受本客户端的信号量限制）
+
+        Args:
+            payloads: 名称 -> 请求体
+            on_text: 回调函数 (名称, 合并后的文本片段)
+            coalesce_interval: 合并回调的时间间隔（秒）
+            caller: 调用方名称（运行指标的标签）
+            on_done: 单个请求结束时的回调 (名称, 完整文本或异常对象)
+
+        Returns:
+            名称 -> 完整文本；单个请求失败时对应值为异常对象
+        """
+        async with aiohttp.ClientSession(timeout=self.timeout, trust_env=False) as session:
+            async def run_one(name, payload):
+                callback = (lambda text: on_text(name, text)) if on_text else None
+                try:
+                    content, _ = await self.stream_chat(payload, callback, coalesce_interval, session, caller)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    content = e
+                if on_done:
+                    try:
+                        on_done(name, content)
+                    except Exception as e:
+                        print(f"完成回调失败: {e}")
+                if isinstance(content, Exception):
+                    raise content
+                return content
+
+            names = list(payloads.keys())
+            results = await asyncio.gather(
+                *(run_one(name, payloads[name]) for name in names), return_exceptions=True
+            )
+        return dict(zip(names, results))
+
+
+class AsyncTaskRunner:
+    """
+    在后台线程中运行一个常驻事件循环，供同步代码（工作线程、Tk回调）提交和取消协程
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """
+        提交协程到后台事件循环
+
+        Args:
+            coro: 协程对象
+
+        Returns:
+            可在任意线程中等待或取消的Future
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def cancel_all(self) -> int:
+        """
+        取消所有尚未完成的协程
+
+        Returns:
+            被取消的任务数
+        """
+        with self._lock:
+            pending = list(self._futures)
+        cancelled = 0
+        for future in pending:
+            if future.cancel():
+                cancelled += 1
+        return cancelled
+
+    def close(self) -> None:
+        """停止事件循环"""
+        self.cancel_all()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_shared_runner = None
+_shared_runner_lock = threading.Lock()
+
+
+def get_shared_runner() -> AsyncTaskRunner:
+    """获取进程内共享的后台事件循环"""
+    global _shared_runner
+    with _shared_runner_lock:
+        if _shared_runner is None:
+            _shared_runner = AsyncTaskRunner()
+        return _shared_runner
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务系统
+耗时的对比分析和网络请求在工作线程中排队执行，每个任务提供进度、取消和结果Future；
+回调通过调度函数（例如 Tk 的 root.after）转交给界面线程执行
+"""
+
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, List
+
+
+class TaskCancelledError(Exception):
+    """任务被取消时抛出"""
+    pass
+
+
+class BackgroundTask:
+    """
+    后台任务：记录状态、进度，并支持协作式取消
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, task_id: int, name: str):
+        """
+        初始化任务
+
+        Args:
+            task_id: 任务编号
+            name: 任务名称（用于显示）
+        """
+        self.task_id = task_id
+        self.name = name
+        self.status = self.PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.future = None  # concurrent.futures.Future，由BackgroundJobRunner设置
+        self._cancel_event = threading.Event()
+        self._cancel_callbacks = []
+        self._progress_listener = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def report_progress(self, value: float, message: str = None) -> None:
+        """
+        更新任务进度（在工作线程中调用）
+
+        Args:
+            value: 进度（0-100）
+            message: 进度说明
+        """
+        self.progress = max(0.0, min(100.0, float(value)))
+        if message is not None:
+            self.message = message
+        if self._progress_listener:
+            self._progress_listener(self)
+
+    def raise_if_cancelled(self) -> None:
+        """已请求取消时抛出TaskCancelledError，供任务函数在检查点调用"""
+        if self.cancelled:
+            raise TaskCancelledError(f"任务已取消: {self.name}")
+
+    def add_cancel_callback(self, callback: Callable[[], None]) -> None:
+        """
+        注册取消回调（例如中断正在进行的网络请求）
+
+        Args:
+            callback: 取消时调用的函数；任务已取消时立即调用
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> bool:
+        """
+        请求取消任务：排队中的任务直接取消，运行中的任务通过取消回调和检查点停止
+
+        Returns:
+            任务是否尚未结束（取消请求是否有效）
+        """
+        with self._lock:
+            if self.status in (self.DONE, self.FAILED, self.CANCELLED):
+                return False
+            self._cancel_event.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+
+        if self.future is not None and self.future.cancel():
+            self.status = self.CANCELLED
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"取消回调执行失败: {e}")
+        return True
+
+    def result(self, timeout: float = None) -> Any:
+        """等待并返回任务结果"""
+        return self.future.result(timeout=timeout)
+
+
+class BackgroundJobRunner:
+    """
+    后台任务执行器：任务按提交顺序排队，由固定数量的工作线程执行
+    """
+
+    def __init__(self, max_workers: int = 1, dispatcher: Callable[[Callable[[], None]], Any] = None):
+        """
+        初始化执行器
+
+        Args:
+            max_workers: 工作线程数（1表示任务严格排队执行）
+            dispatcher: 回调调度函数，接收一个无参函数并安排在界面线程执行；
+                        为None时回调直接在工作线程中执行
+        """
+        self.max_workers = max_workers
+        self.dispatcher = dispatcher
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="background_job"
+        )
+        self._tasks: Dict[int, BackgroundTask] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _dispatch(self, callback: Callable, *args) -> None:
+        if callback is None:
+            return
+        if self.dispatcher is None:
+            callback(*args)
+        else:
+            self.dispatcher(lambda: callback(*args))
+
+    def submit(self, name: str, fn: Callable[..., Any], *args,
+               on_progress: Callable[[BackgroundTask], None] = None,
+               on_done: Callable[[BackgroundTask, Any], None] = None,
+               on_error: Callable[[BackgroundTask, Exception], None] = None,
+               **kwargs) -> BackgroundTask:
+        """
+        提交后台任务
+
+        Args:
+            name: 任务名称
+            fn: 任务函数，调用方式为 fn(task, *args, **kwargs)
+            on_progress: 进度回调 (task)
+            on_done: 成功回调 (task, 结果)
+            on_error: 失败或取消回调 (task, 异常)
+
+        Returns:
+            BackgroundTask 对象
+        """
+        with self._lock:
+            task = BackgroundTask(self._next_id, name)
+            self._next_id += 1
+            self._tasks[task.task_id] = task
+
+        if on_progress:
+            task._progress_listener = lambda t: self._dispatch(on_progress, t)
+
+        def run():
+            if task.cancelled:
+                raise TaskCancelledError(f"任务已取消: {name}")
+            task.status = BackgroundTask.RUNNING
+            return fn(task, *args, **kwargs)
+
+        def finished(future):
+            with self._lock:
+                self._tasks.pop(task.task_id, None)
+            if future.cancelled():
+                task.status = BackgroundTask.CANCELLED
+                self._dispatch(on_error, task, TaskCancelledError(f"任务已取消: {name}"))
+                return
+            error = future.exception()
+            if error is None:
+                task.status = BackgroundTask.DONE
+                task.progress = 100.0
+                self._dispatch(on_done, task, future.result())
+            else:
+                task.status = BackgroundTask.CANCELLED if task.cancelled else BackgroundTask.FAILED
+                self._dispatch(on_error, task, error)
+
+        task.future = self._executor.submit(run)
+        task.future.add_done_callback(finished)
+        return task
+
+    def active_tasks(self) -> List[BackgroundTask]:
+        """返回排队中和运行中的任务（按提交顺序）"""
+        with self._lock:
+            return [self._tasks[task_id] for task_id in sorted(self._tasks)]
+
+    @property
+    def pending_count(self) -> int:
+        """尚未结束的任务数"""
+        with self._lock:
+            return len(self._tasks)
+
+    def cancel_all(self) -> int:
+        """
+        取消所有尚未结束的任务
+
+        Returns:
+            收到取消请求的任务数
+        """
+        return sum(1 for task in self.active_tasks() if task.cancel())
+
+    def shutdown(self, wait: bool = False) -> None:
+        """取消剩余任务并关闭工作线程"""
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)
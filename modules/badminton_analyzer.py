@@ -1,41 +1,66 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from modules.realtime_feedback import RealtimeFeedbackEngine
+
 class BadmintonAnalyzer:
     """羽毛球动作分析器"""
-    
-    def __init__(self):
-        """初始化分析器"""
-        pass
-    
-    def analyze_serve(self, landmarks):
-        """分析发球动作"""
+
+    # 按身体部位划分的角度
+    POSTURE_ANGLES = ("knee_angle", "hip_angle", "body_lean", "body_rotation")
+    ARM_ANGLES = ("elbow_angle", "shoulder_angle", "wrist_angle")
+
+    def __init__(self, template_path=None, side="right"):
+        """
+        初始化分析器
+
+        Args:
+            template_path: 阶段模板路径（默认为 staged_templates/击球动作模板.json）
+            side: 持拍手 ('right' 或 'left')
+        """
+        self.engine = RealtimeFeedbackEngine(template_path, side=side)
+        self.last_result = None
+
+    def analyze_serve(self, landmarks, time_ms=None):
+        """
+        分析发球动作（逐帧调用）
+
+        Args:
+            landmarks: 当前帧关键点
+            time_ms: 帧时间戳（毫秒），默认使用单调时钟
+        """
         if not landmarks:
             return "未检测到姿势数据"
-        
-        # 简单的分析逻辑
-        feedback = []
-        
+
+        self.last_result = self.engine.update(landmarks, time_ms)
+        feedback = [f"当前阶段: {self.last_result['stage']}"]
+
         # 检查基本姿势
         if self._check_basic_posture(landmarks):
             feedback.append("✓ 基本姿势正确")
         else:
             feedback.append("✗ 需要调整基本姿势")
-        
+
         # 检查手臂位置
         if self._check_arm_position(landmarks):
             feedback.append("✓ 手臂位置良好")
         else:
             feedback.append("✗ 建议调整手臂位置")
-        
+
+        if self.last_result["violations"]:
+            feedback.extend(self.last_result["messages"])
+
         return "\n".join(feedback)
-    
+
+    def _violations(self, angle_names):
+        if not self.last_result:
+            return []
+        return [v for v in self.last_result["violations"] if v["angle"] in angle_names]
+
     def _check_basic_posture(self, landmarks):
-        """检查基本姿势"""
-        # 简化的检查逻辑
-        return True
-    
+        """检查基本姿势：下肢与躯干角度是否在当前阶段的标准范围内"""
+        return not self._violations(self.POSTURE_ANGLES)
+
     def _check_arm_position(self, landmarks):
-        """检查手臂位置"""
-        # 简化的检查逻辑
-        return True
\ No newline at end of file
+        """检查手臂位置：肘、肩、腕角度是否在当前阶段的标准范围内"""
+        return not self._violations(self.ARM_ANGLES)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量对比
+N 个学员的阶段化文件 × M 个标准模板：每个文件只读取一次（并行读取，模板取自编译模板缓存），
+所有组合的角度/时间差异用numpy广播一次算出结果矩阵，逐对的 compare_stages 对比结果同时生成；
+AI建议不在批量对比中调用，需要时再按组合单独生成
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from modules.action_advisor import ActionAdvisor
+from modules.pose_features import ANGLE_DISPLAY_NAMES
+from modules.template_cache import CompiledTemplate
+
+
+def stage_feature_arrays(datasets: Sequence[List[Dict[str, Any]]], angle_names: Sequence[str],
+                         num_stages: int = 5):
+    """
+    把多个阶段化数据转换为数组
+
+    Args:
+        datasets: 阶段化数据列表
+        angle_names: 角度名顺序
+        num_stages: 阶段数（不足的阶段为NaN）
+
+    Returns:
+        (ideals, durations)：ideals 为 (文件数, 阶段数, 角度数)，durations 为 (文件数, 阶段数)，缺失为NaN
+    """
+    ideals = np.full((len(datasets), num_stages, len(angle_names)), np.nan)
+    durations = np.full((len(datasets), num_stages), np.nan)
+    column = {name: i for i, name in enumerate(angle_names)}
+    for row, stages in enumerate(datasets):
+        for stage_index, stage in enumerate(stages[:num_stages]):
+            durations[row, stage_index] = stage.get("end_ms", 0) - stage.get("start_ms", 0)
+            for angle_name, expected in stage.get("expected_values", {}).items():
+                if angle_name in column and isinstance(expected, dict) and "ideal" in expected:
+                    ideals[row, stage_index, column[angle_name]] = expected["ideal"]
+    return ideals, durations
+
+
+def template_feature_arrays(templates: Sequence[CompiledTemplate], angle_names: Sequence[str],
+                            num_stages: int = 5):
+    """
+    把多个编译模板的 ideal 数组和阶段时长对齐到同一角度顺序
+
+    Args:
+        templates: 编译后的模板列表
+        angle_names: 角度名顺序
+        num_stages: 阶段数（不足的阶段为NaN）
+
+    Returns:
+        (ideals, durations)，结构与 stage_feature_arrays 相同
+    """
+    ideals = np.full((len(templates), num_stages, len(angle_names)), np.nan)
+    durations = np.full((len(templates), num_stages), np.nan)
+    for row, template in enumerate(templates):
+        count = min(len(template.stages), num_stages)
+        durations[row, :count] = (template.end_ms - template.start_ms)[:count]
+        for col, angle_name in enumerate(angle_names):
+            if angle_name in template.angle_names:
+                ideals[row, :count, col] = template.ideal[:count, template.angle_names.index(angle_name)]
+    return ideals, durations
+
+
+def _nan_mean(values: np.ndarray, axis) -> np.ndarray:
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=axis)
+    total = np.where(valid, values, 0.0).sum(axis=axis)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+class BatchComparisonResult:
+    """
+    批量对比结果：矩阵的行为学员文件，列为模板文件
+    """
+
+    def __init__(self, advisor: ActionAdvisor, user_files: List[str], template_files: List[str],
+                 datasets: Dict[str, List[Dict[str, Any]]], angle_names: List[str],
+                 angle_matrix: np.ndarray, stage_angle_matrix: np.ndarray, timing_matrix: np.ndarray,
+                 comparisons: List[List[Dict[str, Any]]]):
+        self.advisor = advisor
+        self.user_files = user_files
+        self.template_files = template_files
+        self.datasets = datasets
+        self.angle_names = angle_names
+        # (N, M) 所有阶段、所有角度 ideal 值的平均绝对差（度）
+        self.angle_matrix = angle_matrix
+        # (N, M, 阶段数, 角度数) 每个阶段每个角度的差（学员 - 模板）
+        self.stage_angle_matrix = stage_angle_matrix
+        # (N, M) 各阶段持续时间的平均绝对差（毫秒）
+        self.timing_matrix = timing_matrix
+        # comparisons[i][j] 为 compare_stages 的完整结果
+        self.comparisons = comparisons
+        self.critical_matrix = np.array(
+            [[len(c["critical_issues"]) for c in row] for row in comparisons], dtype=int
+        ).reshape(len(user_files), len(template_files))
+
+    def best_template(self, user_index: int) -> int:
+        """学员最接近的模板（角度平均差最小）"""
+        row = self.angle_matrix[user_index]
+        return int(np.nanargmin(row)) if not np.isnan(row).all() else 0
+
+    def report(self, user_index: int, template_index: int, with_llm: bool = False,
+               llm_response: Any = None) -> Dict[str, Any]:
+        """
+        生成某个组合的综合报告（延迟生成，默认不调用大模型）
+
+        Args:
+            user_index: 学员文件序号
+            template_index: 模板文件序号
+            with_llm: 是否调用大模型生成建议（非流式）
+            llm_response: 已有的AI建议（提供时不再调用大模型）
+
+        Returns:
+            与 ActionAdvisor.build_report 相同结构的报告
+        """
+        user_file = self.user_files[user_index]
+        template_file = self.template_files[template_index]
+        comparison = self.comparisons[user_index][template_index]
+        if llm_response is None:
+            if with_llm:
+                llm_response = self.advisor._generate_llm_advice(
+                    comparison, self.datasets[user_file], self.datasets[template_file])
+            else:
+                llm_response = self.advisor._generate_fallback_advice(comparison)
+        return self.advisor.build_report(comparison, llm_response, user_file, template_file)
+
+    def reports(self, with_llm: bool = False, max_workers: int = 4) -> List[List[Dict[str, Any]]]:
+        """
+        生成全部组合的报告（调用大模型时并发请求）
+
+        Returns:
+            reports[i][j]
+        """
+        pairs = [(i, j) for i in range(len(self.user_files)) for j in range(len(self.template_files))]
+        if with_llm:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                flat = list(executor.map(lambda pair: self.report(*pair, with_llm=True), pairs))
+        else:
+            flat = [self.report(i, j) for i, j in pairs]
+        width = len(self.template_files)
+        return [flat[row * width:(row + 1) * width] for row in range(len(self.user_files))]
+
+    def summary_rows(self) -> List[Dict[str, Any]]:
+        """
+        每个组合一行的汇总（便于导出CSV/JSON）
+
+        Returns:
+            [{'user_file', 'template_file', 'angle_diff', 'timing_diff_ms', 'critical_issues', 'worst_angle'}]
+        """
+        rows = []
+        for i, user_file in enumerate(self.user_files):
+            for j, template_file in enumerate(self.template_files):
+                per_angle = _nan_mean(np.abs(self.stage_angle_matrix[i, j]), axis=0)
+                worst = None
+                if not np.isnan(per_angle).all():
+                    worst_name = self.angle_names[int(np.nanargmax(per_angle))]
+                    worst = ANGLE_DISPLAY_NAMES.get(worst_name, worst_name)
+                rows.append({
+                    "user_file": os.path.basename(user_file),
+                    "template_file": os.path.basename(template_file),
+                    "angle_diff": None if np.isnan(self.angle_matrix[i, j]) else float(self.angle_matrix[i, j]),
+                    "timing_diff_ms": None if np.isnan(self.timing_matrix[i, j]) else float(self.timing_matrix[i, j]),
+                    "critical_issues": int(self.critical_matrix[i, j]),
+                    "worst_angle": worst,
+                })
+        return rows
+
+
+class BatchComparator:
+    """
+    批量对比器
+    """
+
+    def __init__(self, advisor: ActionAdvisor = None, max_workers: int = 8):
+        """
+        初始化批量对比器
+
+        Args:
+            advisor: 用于逐对对比和生成报告的 ActionAdvisor（默认新建，不使用LLM缓存）
+            max_workers: 并行读取文件的线程数
+        """
+        self.advisor = advisor or ActionAdvisor(response_cache=False)
+        self.max_workers = max_workers
+
+    def load_files(self, paths: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        并行读取学员文件，每个路径只读取一次
+
+        Args:
+            paths: 文件路径（可重复）
+
+        Returns:
+            {路径: 阶段化数据}
+        """
+        unique = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(unique, executor.map(self.advisor.load_json_data, unique)))
+
+    def load_templates(self, paths: Sequence[str]) -> Dict[str, CompiledTemplate]:
+        """
+        并行读取模板（编译模板缓存，已加载且未修改的模板不再解析）
+
+        Args:
+            paths: 模板路径（可重复）
+
+        Returns:
+            {路径: CompiledTemplate}
+        """
+        unique = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(unique, executor.map(self.advisor.load_template, unique)))
+
+    def compare(self, user_files: Sequence[str], template_files: Sequence[str],
+                num_stages: int = 5) -> BatchComparisonResult:
+        """
+        对比 N 个学员文件与 M 个模板
+
+        Args:
+            user_files: 学员staged文件路径列表
+            template_files: 模板文件路径列表
+            num_stages: 阶段数
+
+        Returns:
+            BatchComparisonResult
+        """
+        user_files, template_files = list(user_files), list(template_files)
+        if not user_files or not template_files:
+            raise Exception("批量对比需要至少一个学员文件和一个模板文件")
+
+        datasets = self.load_files(user_files)
+        templates = self.load_templates(template_files)
+        angle_names = sorted({
+            angle_name
+            for data in datasets.values()
+            for stage in data[:num_stages]
+            for angle_name in stage.get("expected_values", {})
+        } | {angle_name for template in templates.values() for angle_name in template.angle_names})
+
+        user_ideals, user_durations = stage_feature_arrays([datasets[p] for p in user_files],
+                                                           angle_names, num_stages)
+        template_ideals, template_durations = template_feature_arrays([templates[p] for p in template_files],
+                                                                      angle_names, num_stages)
+
+        # 广播得到所有组合: (N, M, 阶段数, 角度数)
+        stage_angle_matrix = user_ideals[:, None] - template_ideals[None, :]
+        angle_matrix = _nan_mean(np.abs(stage_angle_matrix), axis=(2, 3))
+        timing_matrix = _nan_mean(np.abs(user_durations[:, None] - template_durations[None, :]), axis=2)
+
+        # 逐对的完整对比（纯字典运算，每对为微秒级）
+        comparisons = [
+            [self.advisor.compare_stages(datasets[user_file], templates[template_file])
+             for template_file in template_files]
+            for user_file in user_files
+        ]
+        # 报告和AI建议仍使用模板的阶段列表
+        datasets.update({path: template.stages for path, template in templates.items()})
+
+        return BatchComparisonResult(self.advisor, user_files, template_files, datasets, angle_names,
+                                     angle_matrix, stage_angle_matrix, timing_matrix, comparisons)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件内容哈希
+视频文件可能有数GB，按 (路径, 大小, 修改时间) 在进程内记住已计算的结果，避免重复读取
+"""
+
+import os
+import hashlib
+import threading
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def hash_file(path: str, chunk_size: int = 4 * 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA-256摘要
+
+    Args:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        十六进制摘要
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    result = digest.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[memo_key] = result
+    return result
@@ -3,6 +3,12 @@ import json
 import glob
 import requests
 from typing import List, Dict, Any
+from modules.llm_cache import LLMResponseCache
+from modules.prompt_encoder import CompactPromptEncoder
+from modules.llm_settings import load_api_url
+from modules.timeline_writer import load_timeline
+from modules.perf_trace import get_tracer
+from modules.metrics_exporter import llm_call, record_llm_cache
 
 class JsonConverter:
     """
@@ -11,7 +17,8 @@ class JsonConverter:
     
     def __init__(self, output_dir="d:\\羽毛球项目\\output", 
                  staged_dir="d:\\羽毛球项目\\staged_templates",
-                 template_path="d:\\羽毛球项目\\staged_templates\\击球动作模板.json"):
+                 template_path="d:\\羽毛球项目\\staged_templates\\击球动作模板.json",
+                 response_cache=None, max_prompt_tokens=6000, api_url=None):
         """
         初始化JSON转换器
         
@@ -19,12 +26,19 @@ class JsonConverter:
             output_dir: 原始JSON文件目录
             staged_dir: 输出staged JSON的目录
             template_path: 参考模板路径
+            response_cache: LLM响应缓存（默认使用项目目录下的磁盘缓存，传入False禁用）
+            max_prompt_tokens: 单个阶段化请求的提示词token预算
+            api_url: chat/completions接口地址（默认读取config.ini或环境变量）
         """
         self.output_dir = output_dir
         self.staged_dir = staged_dir
         self.template_path = template_path
-        self.api_url = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+        self.api_url = api_url or load_api_url()
         self.api_key = os.environ.get('VOLCENGINE_API_KEY', '')
+        if response_cache is None:
+            response_cache = LLMResponseCache()
+        self.response_cache = response_cache or None
+        self.prompt_encoder = CompactPromptEncoder(max_prompt_tokens=max_prompt_tokens)
         
     def get_latest_output_json(self) -> str:
         """
@@ -33,7 +47,7 @@ class JsonConverter:
         Returns:
             最新JSON文件的完整路径
         """
-        json_files = glob.glob(os.path.join(self.output_dir, "*.json"))
+        json_files = glob.glob(os.path.join(self.output_dir, "*.json")) + glob.glob(os.path.join(self.output_dir, "*.jsonl"))
         if not json_files:
             raise FileNotFoundError("output文件夹中没有找到JSON文件")
         
@@ -67,14 +81,15 @@ class JsonConverter:
         """
         try:
             # 加载原始数据和模板
-            with open(input_json_path, 'r', encoding='utf-8') as f:
-                raw_data = json.load(f)
+            raw_data = load_timeline(input_json_path)
             
             template_data = self.load_template()
             
             # 生成输出文件名
             if not output_filename:
                 base_name = os.path.basename(input_json_path)
+                if base_name.endswith(".jsonl"):
+                    base_name = base_name[:-1]
                 output_filename = f"staged_{base_name}"
             
             output_path = os.path.join(self.staged_dir, output_filename)
@@ -111,13 +126,13 @@ class JsonConverter:
         
         # 准备模板示例（只取前2个阶段作为示例）
         template_example = template_data[:2] if len(template_data) >= 2 else template_data
-        template_str = json.dumps(template_example, ensure_ascii=False, indent=2)
+        template_str = self.prompt_encoder.encode_template(template_example)
         
         for i in range(0, len(raw_data), batch_size):
             batch = raw_data[i:i+batch_size]
             
-            # 构建提示词
-            prompt = f"""
+            # 构建提示词（帧数据以紧凑表格形式填入，先用占位符估算其余部分的token数）
+            prompt_template = f"""
 你是一个专业的羽毛球动作分析专家。请将用户提供的原始JSON数据转换为阶段化的分析格式。
 
 任务要求：
@@ -137,11 +152,16 @@ class JsonConverter:
 6. 时间分配建议：准备(0-20%)、移动/接近(20-40%)、后摆(40-60%)、击球/前挥(60-80%)、收势(80-100%)
 7. 输出必须是完整的JSON数组格式，包含所有5个阶段
 
-原始数据批次：
-{json.dumps(batch[:50], ensure_ascii=False)}  
+原始数据批次（CSV表格：t为time_ms，"Nx,Ny"为第N号landmark的像素坐标，空值表示该帧未可靠检测到）：
+{{frames_table}}
 
 请直接输出包含5个阶段的完整JSON数组：
 """
+            reserved_tokens = self.prompt_encoder.estimate_tokens(prompt_template)
+            frames_table, stride, table_tokens = self.prompt_encoder.fit_frames(batch, reserved_tokens)
+            prompt = prompt_template.replace("{frames_table}", frames_table)
+            print(f"批次 {i // batch_size + 1}: {len(batch)}帧，采样步长{stride}，"
+                  f"提示词约 {reserved_tokens + table_tokens} tokens")
             
             try:
                 # 调用火山引擎豆包API
@@ -158,37 +178,56 @@ class JsonConverter:
                     "top_p": 0.9
                 }
                 
-                # 禁用代理
-                proxies = {
-                    'http': None,
-                    'https': None
-                }
-                
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    json=data,
-                    timeout=300,  # 5分钟超时
-                    proxies=proxies
+                cache_key = LLMResponseCache.make_key(
+                    data["model"], prompt, data["temperature"], data["max_tokens"]
                 )
-                response.raise_for_status()
+                cached = self.response_cache.get(cache_key) if self.response_cache else None
+                if self.response_cache:
+                    record_llm_cache("segment", cached is not None)
                 
-                result = response.json()
-                response_content = result['choices'][0]['message']['content']
+                if cached:
+                    response_content = cached["content"]
+                else:
+                    # 禁用代理
+                    proxies = {
+                        'http': None,
+                        'https': None
+                    }
+                    
+                    with get_tracer().span("llm_request", category="llm", caller="segment", stream=False), \
+                            llm_call("segment"):
+                        response = requests.post(
+                            self.api_url,
+                            headers=headers,
+                            json=data,
+                            timeout=300,  # 5分钟超时
+                            proxies=proxies
+                        )
+                        response.raise_for_status()
+                    
+                    result = response.json()
+                    response_content = result['choices'][0]['message']['content']
                 
                 # 清理响应内容，提取JSON部分
                 json_start = response_content.find('[')
                 json_end = response_content.rfind(']') + 1
+                validated_stages = []
+                if json_start != -1 and json_end > json_start:
+                    try:
+                        # 验证和修正数据
+                        validated_stages = self._validate_stages(json.loads(response_content[json_start:json_end]))
+                    except json.JSONDecodeError as e:
+                        print(f"LLM响应不是有效的JSON: {e}")
                 
-                if json_start != -1 and json_end != -1:
-                    json_content = response_content[json_start:json_end]
-                    batch_stages = json.loads(json_content)
-                    
-                    # 验证和修正数据
-                    validated_stages = self._validate_stages(batch_stages)
+                if validated_stages:
+                    # 只缓存能解析出有效阶段的响应，格式错误的响应下次重新请求
+                    if self.response_cache and not cached:
+                        self.response_cache.put(cache_key, response_content)
                     staged_result.extend(validated_stages)
                 else:
-                    # 如果无法提取JSON，使用默认结构
+                    if cached:
+                        self.response_cache.discard(cache_key)
+                    # 如果无法提取有效阶段，使用默认结构
                     default_stages = self._create_default_stages(batch)
                     staged_result.extend(default_stages)
                     
@@ -365,7 +404,7 @@ class JsonConverter:
         Returns:
             所有输出文件路径列表
         """
-        json_files = glob.glob(os.path.join(self.output_dir, "*.json"))
+        json_files = glob.glob(os.path.join(self.output_dir, "*.json")) + glob.glob(os.path.join(self.output_dir, "*.jsonl"))
         output_paths = []
         
         for json_file in json_files:
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态检测结果缓存
+以 (视频内容哈希, 模型类型, 模型文件哈希, 置信度阈值, 采样间隔) 为键保存检测得到的时间线，
+同一视频只修改模板或重新生成AI报告时直接复用，不再重新运行姿态检测
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+
+class LandmarkResultCache:
+    """
+    检测结果磁盘缓存：每个条目为一个 .jsonl 时间线文件和一个 .meta.json 元数据文件，
+    目录总大小超出上限时按最近使用时间淘汰
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（默认为项目根目录下的 cache/landmarks）
+            max_bytes: 缓存目录允许占用的最大字节数
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "cache", "landmarks")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(video_hash: str, detector_config: Dict[str, Any]) -> str:
+        """
+        计算缓存键
+
+        Args:
+            video_hash: 视频文件内容哈希
+            detector_config: 检测器配置（模型类型、模型文件哈希、置信度阈值、采样间隔）
+
+        Returns:
+            十六进制SHA-256摘要
+        """
+        payload = json.dumps({"video_hash": video_hash, "detector_config": detector_config},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        return (os.path.join(self.cache_dir, f"{key}.jsonl"),
+                os.path.join(self.cache_dir, f"{key}.meta.json"))
+
+    def get(self, key: str, output_path: str) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存，命中时把时间线复制到输出路径
+
+        Args:
+            key: 缓存键
+            output_path: 时间线输出路径
+
+        Returns:
+            检测元数据（fps、帧数等）；未命中时返回None
+        """
+        timeline_path, meta_path = self._paths(key)
+        with self._lock:
+            if not (os.path.exists(timeline_path) and os.path.exists(meta_path)):
+                return None
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                shutil.copyfile(timeline_path, output_path)
+                # 更新访问时间，供LRU淘汰使用
+                os.utime(timeline_path, None)
+                os.utime(meta_path, None)
+            except Exception as e:
+                print(f"读取检测结果缓存失败: {e}")
+                return None
+        return meta
+
+    def put(self, key: str, timeline_path: str, meta: Dict[str, Any]) -> None:
+        """
+        保存检测结果
+
+        Args:
+            key: 缓存键
+            timeline_path: 已完成的 .jsonl 时间线文件
+            meta: 检测元数据
+        """
+        cached_timeline, meta_path = self._paths(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                shutil.copyfile(timeline_path, cached_timeline + suffix)
+                with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(cached_timeline + suffix, cached_timeline)
+                # 元数据最后写入：只有元数据存在的条目才会被视为有效
+                os.replace(meta_path + suffix, meta_path)
+                self._evict()
+        except Exception as e:
+            print(f"写入检测结果缓存失败: {e}")
+
+    def _evict(self) -> None:
+        """目录总大小超出上限时，按最近使用时间删除最旧的条目"""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            key = name.split(".", 1)[0]
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            size, mtime = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时摄像头采集与推理
+采集线程只保留最新一帧（旧帧直接丢弃），推理线程总是处理最新帧，界面按自己的刷新节奏取最新结果；
+每个结果带采集时间戳，用于统计从采集到显示的端到端延迟
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import cv2
+
+from modules.pose_detector import PoseDetector
+
+
+class LatestFrameCapture:
+    """
+    摄像头采集线程：持续读取，只保留最新一帧
+    """
+
+    def __init__(self, camera_id: int = 0, width: int = None, height: int = None):
+        """
+        初始化采集器
+
+        Args:
+            camera_id: 摄像头编号（或视频流地址）
+            width: 期望的采集宽度（None表示使用摄像头默认值）
+            height: 期望的采集高度
+        """
+        self.camera_id = camera_id
+        self.width = width
+        self.height = height
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.error = None
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._capture_time = 0.0
+        self._consumed_id = 0
+
+    def start(self) -> None:
+        """打开摄像头并启动采集线程"""
+        self._cap = cv2.VideoCapture(self.camera_id)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            raise Exception(f"无法打开摄像头 {self.camera_id}")
+        # 尽量减小驱动层缓冲，避免读到积压的旧帧
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if self.width and self.height:
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="live-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        # 摄像头由采集线程自己释放：stop() 等待超时时线程可能仍阻塞在 read() 中，
+        # 此时从其他线程 release 会导致底层驱动崩溃
+        cap = self._cap
+        try:
+            while self._running:
+                ret, frame = cap.read()
+                capture_time = time.perf_counter()
+                if not ret:
+                    self.error = "摄像头读取失败"
+                    break
+                with self._condition:
+                    if self._frame_id > self._consumed_id:
+                        # 上一帧还没被推理线程取走，直接覆盖
+                        self.frames_dropped += 1
+                    self._frame = frame
+                    self._frame_id += 1
+                    self._capture_time = capture_time
+                    self.frames_captured += 1
+                    self._condition.notify_all()
+        finally:
+            cap.release()
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+    def get_latest(self, after_id: int = 0, timeout: float = 0.5):
+        """
+        获取比 after_id 更新的最新帧，必要时等待
+
+        Args:
+            after_id: 调用方已处理过的帧编号
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            (帧编号, 图像, 采集时间)；超时或采集已停止时返回None
+        """
+        with self._condition:
+            if self._frame_id <= after_id and self._running:
+                self._condition.wait(timeout)
+            if self._frame_id <= after_id:
+                return None
+            self._consumed_id = self._frame_id
+            return self._frame_id, self._frame, self._capture_time
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def stop(self) -> None:
+        """停止采集（摄像头在采集线程退出时释放；等待超时则由线程读完当前帧后自行释放）"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            if self._thread.is_alive():
+                print(f"摄像头 {self.camera_id} 采集线程未及时退出，将在当前读取结束后释放")
+            self._thread = None
+        self._cap = None
+
+
+class LiveSession:
+    """
+    实时分析会话：采集线程 + 推理线程，界面线程通过 latest_result() 轮询最新标注结果
+    """
+
+    def __init__(self, camera_id: int = 0, device: str = "cpu", min_detection_confidence: float = 0.2,
+                 on_result: Callable[[Dict[str, Any]], Any] = None, stats_window: int = 60):
+        """
+        初始化会话
+
+        Args:
+            camera_id: 摄像头编号
+            device: 推理设备 ('cpu' 或 'gpu')
+            min_detection_confidence: 最小检测置信度
+            on_result: 每得到一个推理结果时在推理线程中调用（如实时反馈规则），返回值保存在结果的 'feedback' 字段
+            stats_window: 延迟/帧率统计的滑动窗口大小（帧）
+        """
+        self.capture = LatestFrameCapture(camera_id)
+        self.device = device
+        self.min_detection_confidence = min_detection_confidence
+        self.on_result = on_result
+        self.error = None
+
+        self._thread = None
+        self._running = False
+        self._result_lock = threading.Lock()
+        self._result = None
+        self._displayed_id = 0
+        self._inference_ms = deque(maxlen=stats_window)
+        self._latency_ms = deque(maxlen=stats_window)
+        self._result_times = deque(maxlen=stats_window)
+
+    def start(self) -> None:
+        """打开摄像头并启动推理线程（检测器在推理线程中创建，MediaPipe实例只在该线程使用）"""
+        self.capture.start()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="live-inference", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            detector = PoseDetector(model_type="mediapipe",
+                                    min_detection_confidence=self.min_detection_confidence,
+                                    device=self.device)
+        except Exception as e:
+            self.error = f"初始化姿态检测模型失败: {e}"
+            self._running = False
+            return
+
+        start_time = time.perf_counter()
+        last_id = 0
+        last_timestamp_ms = -1
+        while self._running:
+            latest = self.capture.get_latest(last_id)
+            if latest is None:
+                if not self.capture.running:
+                    self.error = self.capture.error
+                    break
+                continue
+            last_id, frame, capture_time = latest
+
+            # MediaPipe视频模式要求时间戳严格递增，使用采集时刻的单调时钟
+            timestamp_ms = max(int((capture_time - start_time) * 1000), last_timestamp_ms + 1)
+            last_timestamp_ms = timestamp_ms
+
+            infer_start = time.perf_counter()
+            processed_frame, landmarks = detector.detect_pose(frame, timestamp_ms)
+            done_time = time.perf_counter()
+
+            result = {
+                "frame_id": last_id,
+                "time_ms": timestamp_ms,
+                "frame": processed_frame,
+                "landmarks": landmarks,
+                "capture_time": capture_time,
+                "done_time": done_time,
+                "feedback": None,
+            }
+            if self.on_result:
+                try:
+                    result["feedback"] = self.on_result(result)
+                except Exception as e:
+                    print(f"实时结果回调出错: {e}")
+
+            with self._result_lock:
+                self._result = result
+                self._inference_ms.append((done_time - infer_start) * 1000)
+                self._result_times.append(done_time)
+
+        self._running = False
+
+    def latest_result(self) -> Optional[Dict[str, Any]]:
+        """
+        取出尚未显示过的最新结果，并记录从采集到显示的延迟（在界面线程调用）
+
+        Returns:
+            结果字典 {'frame_id', 'time_ms', 'frame', 'landmarks', 'capture_time', 'done_time', 'feedback'}；
+            没有新结果时返回None
+        """
+        with self._result_lock:
+            result = self._result
+            if result is None or result["frame_id"] == self._displayed_id:
+                return None
+            self._displayed_id = result["frame_id"]
+            self._latency_ms.append((time.perf_counter() - result["capture_time"]) * 1000)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """
+        滑动窗口内的性能统计
+
+        Returns:
+            {'fps', 'inference_ms', 'latency_ms', 'latency_p95_ms', 'dropped'}
+        """
+        with self._result_lock:
+            times = list(self._result_times)
+            inference = list(self._inference_ms)
+            latency = sorted(self._latency_ms)
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        return {
+            "fps": fps,
+            "inference_ms": sum(inference) / len(inference) if inference else 0.0,
+            "latency_ms": sum(latency) / len(latency) if latency else 0.0,
+            "latency_p95_ms": latency[min(len(latency) - 1, int(len(latency) * 0.95))] if latency else 0.0,
+            "dropped": self.capture.frames_dropped,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def stop(self) -> None:
+        """停止推理与采集"""
+        self._running = False
+        self.capture.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存
+以 (model, prompt, temperature, max_tokens) 的哈希为键，将大模型响应保存到本地磁盘，
+重复查看同一份报告时直接回放缓存内容，不再产生网络请求和token消耗
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Callable, Optional
+
+
+class LLMResponseCache:
+    """
+    基于内容寻址的磁盘缓存：支持按总大小的LRU淘汰和过期时间(TTL)
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: int = 7 * 24 * 3600):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录（默认为项目根目录下的 cache/llm）
+            max_bytes: 缓存目录允许占用的最大字节数，超出后按最近最少使用淘汰
+            ttl_seconds: 缓存条目的有效期（秒），<=0 表示永不过期
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "llm")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """
+        根据请求参数计算缓存键
+
+        Args:
+            model: 模型名称
+            prompt: 提示词
+            temperature: 采样温度
+            max_tokens: 最大生成token数
+
+        Returns:
+            十六进制SHA-256摘要
+        """
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存条目
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            包含 content 和 chunks 的字典；未命中或已过期时返回 None
+        """
+        path = self._entry_path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except Exception as e:
+                print(f"读取LLM缓存失败，已忽略: {e}")
+                self._remove(path)
+                return None
+
+            if self._is_expired(entry):
+                self._remove(path)
+                return None
+
+            # 更新修改时间，作为LRU的"最近使用"标记
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return entry
+
+    def put(self, key: str, content: str, chunks: List[str] = None) -> None:
+        """
+        写入缓存条目
+
+        Args:
+            key: 缓存键
+            content: 完整响应文本
+            chunks: 流式响应的原始分片（用于按原始节奏回放）
+        """
+        entry = {
+            "created_at": time.time(),
+            "content": content,
+            "chunks": chunks if chunks is not None else [content]
+        }
+        path = self._entry_path(key)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"写入LLM缓存失败: {e}")
+                self._remove(tmp_path)
+                return
+            self._evict()
+
+    def replay(self, entry: Dict[str, Any], callback: Callable[[str], None]) -> str:
+        """
+        按原始分片回放缓存的流式响应
+
+        Args:
+            entry: get() 返回的缓存条目
+            callback: 接收每个分片的回调函数
+
+        Returns:
+            完整响应文本
+        """
+        for chunk in entry.get("chunks", []):
+            callback(chunk)
+        return entry.get("content", "")
+
+    def discard(self, key: str) -> None:
+        """删除单个缓存条目（例如内容无法使用时）"""
+        with self._lock:
+            self._remove(self._entry_path(key))
+
+    def clear(self) -> None:
+        """清空所有缓存条目"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    self._remove(os.path.join(self.cache_dir, name))
+
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        if self.ttl_seconds <= 0:
+            return False
+        return time.time() - entry.get("created_at", 0) > self.ttl_seconds
+
+    def _evict(self) -> None:
+        """删除过期条目，并按最近使用时间淘汰直到总大小不超过上限（调用方需持有锁）"""
+        entries = []
+        total_size = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # 文件修改时间早于TTL的条目必然已过期（创建后只会被刷新为更晚的时间）
+            if self.ttl_seconds > 0 and now - stat.st_mtime > self.ttl_seconds:
+                self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if total_size <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            self._remove(path)
+            total_size -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
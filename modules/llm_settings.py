@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型接口配置
+统一读取chat/completions接口地址，便于切换到本地替身服务器进行离线测试；
+config.ini 解析结果按文件修改时间缓存，多次创建 ActionAdvisor 等对象时不重复读取
+"""
+
+import os
+import threading
+import configparser
+
+DEFAULT_API_URL = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+
+# 环境变量优先级高于config.ini，便于在不修改配置文件的情况下临时切换
+API_URL_ENV_VAR = "BADMINTON_LLM_API_URL"
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+
+_config_cache = {}
+_config_lock = threading.Lock()
+
+
+def read_config(config_path: str = None) -> configparser.ConfigParser:
+    """
+    读取配置文件（按路径缓存，文件修改时间或大小变化时重新读取；文件不存在时返回空配置）
+
+    Args:
+        config_path: 配置文件路径（默认为项目根目录下的config.ini）
+
+    Returns:
+        ConfigParser（调用方不得修改）
+    """
+    path = os.path.abspath(config_path or CONFIG_PATH)
+    try:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        signature = None
+
+    with _config_lock:
+        cached = _config_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    config = configparser.ConfigParser()
+    if signature is not None:
+        config.read(path, encoding='utf-8')
+    with _config_lock:
+        _config_cache[path] = (signature, config)
+    return config
+
+
+def load_api_url(config_path: str = None) -> str:
+    """
+    读取大模型接口地址
+
+    优先级：环境变量 BADMINTON_LLM_API_URL > config.ini 中 [API] url > 默认火山引擎地址
+
+    Args:
+        config_path: 配置文件路径（默认为项目根目录下的config.ini）
+
+    Returns:
+        chat/completions 接口地址
+    """
+    env_url = os.environ.get(API_URL_ENV_VAR, '').strip()
+    if env_url:
+        return env_url
+
+    try:
+        url = read_config(config_path).get('API', 'url', fallback='').strip()
+        if url:
+            return url
+    except Exception as e:
+        print(f"读取接口地址配置失败，使用默认地址: {e}")
+
+    return DEFAULT_API_URL
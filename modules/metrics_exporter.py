@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标导出
+以 Prometheus 文本格式导出处理帧数、推理延迟直方图、流水线各阶段排队数、大模型调用次数/延迟/缓存命中和内存占用；
+指标由 PoseDetector、JsonConverter、ActionAdvisor 等调用处直接更新，
+通过本地HTTP端口（/metrics）提供，端口不可用时定期写入文本文件（node_exporter textfile 格式）
+
+配置（config.ini）:
+    [metrics]
+    port = 9464                          ; 0 或不填表示不开启HTTP端口
+    file = output/metrics.prom           ; 文本文件路径（可选）
+"""
+
+import os
+import sys
+import time
+import weakref
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from modules.llm_settings import read_config
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_METRICS_FILE = os.path.join(PROJECT_DIR, "output", "metrics.prom")
+
+INFERENCE_BUCKETS = (0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.2, 0.5, 1.0, 2.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类：按标签值保存数据"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    """按上界分桶的分布（渲染时输出累计桶、_sum 和 _count）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = INFERENCE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, value) -> List[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} "
+                         f"{cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    指标集合：直接更新的指标加上渲染时才计算的收集函数（排队数、内存等）
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[_Metric]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = INFERENCE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], List[_Metric]]) -> None:
+        """添加收集函数：每次渲染时调用，返回临时构建的指标列表"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（version 0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                metrics.extend(collector())
+            except Exception as e:
+                print(f"指标收集失败: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+FRAMES_PROCESSED = REGISTRY.counter(
+    "badminton_frames_processed_total", "Frames passed to the pose detector", ["model"])
+FRAMES_WITH_POSE = REGISTRY.counter(
+    "badminton_frames_with_pose_total", "Frames in which at least one pose was detected", ["model"])
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "badminton_inference_seconds", "Pose model inference latency", ["model"], INFERENCE_BUCKETS)
+LLM_REQUESTS = REGISTRY.counter(
+    "badminton_llm_requests_total", "LLM requests sent", ["caller", "stream", "outcome"])
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "badminton_llm_request_seconds", "LLM request latency until the full response", ["caller", "stream"],
+    LLM_BUCKETS)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "badminton_llm_ttft_seconds", "Streaming LLM time to first token", ["caller"], LLM_BUCKETS)
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "badminton_llm_cache_lookups_total", "Local LLM response cache lookups", ["caller", "result"])
+
+
+def record_frame(model: str, detected: bool) -> None:
+    """PoseDetector 每处理一帧调用一次"""
+    FRAMES_PROCESSED.inc(model=model)
+    if detected:
+        FRAMES_WITH_POSE.inc(model=model)
+
+
+def observe_inference(model: str, seconds: float) -> None:
+    """记录一次模型推理耗时"""
+    INFERENCE_SECONDS.observe(seconds, model=model)
+
+
+def record_llm_call(caller: str, seconds: float, stream: bool = False, ok: bool = True,
+                    ttft_seconds: float = None) -> None:
+    """
+    记录一次大模型请求
+
+    Args:
+        caller: 调用方（segment / advice / stage_advice ...）
+        seconds: 请求到完整响应的耗时
+        stream: 是否流式请求
+        ok: 是否成功
+        ttft_seconds: 流式请求的首token延迟
+    """
+    stream_label = "true" if stream else "false"
+    LLM_REQUESTS.inc(caller=caller, stream=stream_label, outcome="ok" if ok else "error")
+    LLM_REQUEST_SECONDS.observe(seconds, caller=caller, stream=stream_label)
+    if ttft_seconds is not None:
+        LLM_TTFT_SECONDS.observe(ttft_seconds, caller=caller)
+
+
+def record_llm_cache(caller: str, hit: bool) -> None:
+    """记录一次本地响应缓存查询"""
+    LLM_CACHE_LOOKUPS.inc(caller=caller, result="hit" if hit else "miss")
+
+
+@contextmanager
+def llm_call(caller: str):
+    """
+    非流式大模型请求的计时（with 语句中抛出异常时记为失败）
+
+    用法:
+        with llm_call("segment"):
+            response = requests.post(...)
+            response.raise_for_status()
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        record_llm_call(caller, time.perf_counter() - start, stream=False, ok=False)
+        raise
+    record_llm_call(caller, time.perf_counter() - start, stream=False, ok=True)
+
+
+def _collect_cache_ratio() -> List[_Metric]:
+    ratio = Gauge("badminton_llm_cache_hit_ratio", "Share of LLM cache lookups that hit", ["caller"])
+    with LLM_CACHE_LOOKUPS._lock:
+        lookups = dict(LLM_CACHE_LOOKUPS._values)
+    for caller in {key[0] for key in lookups}:
+        hits = lookups.get((caller, "hit"), 0.0)
+        total = hits + lookups.get((caller, "miss"), 0.0)
+        ratio.set(hits / total if total else 0.0, caller=caller)
+    return [ratio]
+
+
+def process_memory() -> Tuple[Optional[int], Optional[int]]:
+    """
+    当前进程的内存占用
+
+    Returns:
+        (常驻内存字节数, 峰值常驻内存字节数)；平台不支持时为None（Windows需要安装psutil）
+    """
+    rss = peak = None
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        rss = info.rss
+        peak = getattr(info, "peak_wset", None)
+    except ImportError:
+        try:
+            with open("/proc/self/statm", "r") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            pass
+    if peak is None:
+        try:
+            import resource
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux 单位为KB，macOS 为字节
+            peak = max_rss if sys.platform == "darwin" else max_rss * 1024
+        except ImportError:
+            pass
+    return rss, peak
+
+
+def _collect_memory() -> List[_Metric]:
+    rss, peak = process_memory()
+    metrics = []
+    if rss is not None:
+        gauge = Gauge("badminton_process_resident_memory_bytes", "Resident memory of the analyzer process")
+        gauge.set(rss)
+        metrics.append(gauge)
+    if peak is not None:
+        gauge = Gauge("badminton_process_peak_resident_memory_bytes", "Peak resident memory of the analyzer process")
+        gauge.set(peak)
+        metrics.append(gauge)
+    return metrics
+
+
+_schedulers = weakref.WeakSet()
+
+
+def track_scheduler(scheduler) -> None:
+    """导出该流水线调度器的各阶段排队数（调度器被回收后自动移除）"""
+    _schedulers.add(scheduler)
+
+
+def _collect_queue_depths() -> List[_Metric]:
+    depth = Gauge("badminton_pipeline_queue_depth",
+                  "Pipeline stage runs by state (waiting = inputs ready but not started)", ["stage", "state"])
+    active = Gauge("badminton_pipeline_active_runs", "Queued and running pipeline runs")
+    totals: Dict[Tuple[str, str], int] = {}
+    runs = 0
+    for scheduler in list(_schedulers):
+        runs += len(scheduler.active_runs())
+        for stage, states in scheduler.queue_depths().items():
+            for state, count in states.items():
+                totals[(stage, state)] = totals.get((stage, state), 0) + count
+    for (stage, state), count in totals.items():
+        depth.set(count, stage=stage, state=state)
+    active.set(runs)
+    return [depth, active]
+
+
+REGISTRY.add_collector(_collect_cache_ratio)
+REGISTRY.add_collector(_collect_queue_depths)
+REGISTRY.add_collector(_collect_memory)
+
+
+def write_metrics_file(path: str, registry: MetricsRegistry = REGISTRY) -> str:
+    """把当前指标写入文本文件（先写临时文件再替换，读取方不会读到写了一半的文件）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(temp_path, path)
+    return path
+
+
+class MetricsExporter:
+    """
+    指标导出：HTTP端口（GET /metrics）和/或定期写入的文本文件
+    """
+
+    def __init__(self, port: int = None, host: str = "127.0.0.1", file_path: str = None,
+                 interval: float = 15.0, registry: MetricsRegistry = REGISTRY):
+        """
+        初始化导出器
+
+        Args:
+            port: HTTP端口（None或0表示不开启）
+            host: 监听地址（默认只监听本机）
+            file_path: 文本文件路径；端口无法监听时使用默认路径 output/metrics.prom
+            interval: 写入文件的间隔（秒）
+            registry: 指标集合
+        """
+        self.port = port
+        self.host = host
+        self.file_path = file_path
+        self.interval = interval
+        self.registry = registry
+        self._server = None
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+
+    @property
+    def url(self) -> Optional[str]:
+        if self._server is None:
+            return None
+        return f"http://{self.host}:{self._server.server_address[1]}/metrics"
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MetricsExporter":
+        """开始导出（在后台线程中）"""
+        if self.port:
+            try:
+                self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+                self._server.daemon_threads = True
+                thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                print(f"指标导出: {self.url}")
+            except OSError as e:
+                self._server = None
+                self.file_path = self.file_path or DEFAULT_METRICS_FILE
+                print(f"指标端口 {self.port} 无法监听（{e}），改为写入文件 {self.file_path}")
+        if self.file_path:
+            thread = threading.Thread(target=self._write_loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            print(f"指标文件: {self.file_path}（每 {self.interval:g} 秒更新）")
+        return self
+
+    def _write_loop(self) -> None:
+        while True:
+            try:
+                write_metrics_file(self.file_path, self.registry)
+            except Exception as e:
+                print(f"写入指标文件失败: {e}")
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self) -> None:
+        """停止导出（文件模式下停止前再写入一次最终结果）"""
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.file_path:
+            try:
+                write_metrics_file(self.file_path, self.registry)
+            except Exception as e:
+                print(f"写入指标文件失败: {e}")
+
+
+def exporter_from_config(config_path: str = None) -> Optional[MetricsExporter]:
+    """
+    按 config.ini 的 [metrics] 配置启动导出器
+
+    Returns:
+        已启动的导出器；未配置时返回None
+    """
+    config = read_config(config_path)
+    port = config.getint('metrics', 'port', fallback=0)
+    file_path = config.get('metrics', 'file', fallback='').strip()
+    if not port and not file_path:
+        return None
+    if file_path and not os.path.isabs(file_path):
+        file_path = os.path.join(PROJECT_DIR, file_path)
+    return MetricsExporter(port=port or None, file_path=file_path or None,
+                           interval=config.getfloat('metrics', 'interval', fallback=15.0)).start()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线（流式）DTW对齐
+实时关键点逐帧到达时，只用上一列累计代价计算新的一列，给出当前帧在模板中的对齐位置（开放终点），
+以及对应的阶段和各角度偏差，不需要等整段视频录完再做对比
+
+步进模式：每来一帧，模板位置可以前进 0..max_step 步（前进0步有少量惩罚），
+因此一列的计算可以用numpy整体向量化，每帧开销为 O(模板帧数)
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from modules.pose_features import compute_angles, ANGLE_DISPLAY_NAMES
+from modules.timeline_writer import load_timeline
+from modules.template_cache import load_compiled_template
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REFERENCE_PATH = os.path.join(PROJECT_DIR, "templates", "击球动作连续.mp4.analysis_data.json")
+DEFAULT_STAGED_TEMPLATE_PATH = os.path.join(PROJECT_DIR, "staged_templates", "击球动作模板.json")
+
+# 参与对齐的角度特征
+DEFAULT_FEATURES = ("elbow_angle", "shoulder_angle", "knee_angle", "body_lean")
+
+
+class OnlineDTW:
+    """
+    开放起点/开放终点的子序列DTW：模板固定，输入流逐帧追加
+    """
+
+    def __init__(self, template: np.ndarray, max_step: int = 2, stall_penalty: float = 2.0):
+        """
+        初始化对齐器
+
+        Args:
+            template: 模板特征序列 (模板帧数, 特征维数)，缺失值为NaN
+            max_step: 每个输入帧模板位置最多前进的步数（限制输入比模板快的倍数）
+            stall_penalty: 模板位置不前进时附加的代价，避免路径长时间停在同一帧
+        """
+        self.template = np.asarray(template, dtype=float)
+        if self.template.ndim != 2 or len(self.template) == 0:
+            raise Exception("模板特征序列为空")
+        self.max_step = max_step
+        self.stall_penalty = stall_penalty
+        self.reset()
+
+    def reset(self) -> None:
+        """清空累计代价（重新开始对齐）"""
+        self._cost = None
+        self._length = None
+        self.frames = 0
+
+    def local_cost(self, features: np.ndarray) -> np.ndarray:
+        """
+        当前输入帧与每个模板帧的距离（对两者都有值的维度取平均绝对差）
+
+        Args:
+            features: 输入帧特征 (特征维数,)
+
+        Returns:
+            (模板帧数,) 距离数组；没有共同维度的模板帧为inf
+        """
+        diff = np.abs(self.template - features)
+        valid = ~np.isnan(diff)
+        count = valid.sum(axis=1)
+        total = np.where(valid, diff, 0.0).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, total / np.maximum(count, 1), np.inf)
+
+    def update(self, features: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        追加一帧并更新累计代价列
+
+        Args:
+            features: 输入帧特征 (特征维数,)，缺失值为NaN
+
+        Returns:
+            {'index': 对齐的模板帧, 'cost': 归一化累计代价, 'local_cost': 该帧距离}；特征全部缺失时返回None
+        """
+        features = np.asarray(features, dtype=float)
+        if np.all(np.isnan(features)):
+            return None
+        local = self.local_cost(features)
+
+        if self._cost is None:
+            # 第一帧：任意模板帧都可以作为路径起点
+            cost, length = local.copy(), np.ones_like(local)
+        else:
+            size = len(local)
+            best_cost = self._cost + self.stall_penalty
+            best_length = self._length.copy()
+            for step in range(1, self.max_step + 1):
+                if step >= size:
+                    break
+                shifted_cost = np.full(size, np.inf)
+                shifted_cost[step:] = self._cost[:-step]
+                shifted_length = np.ones(size)
+                shifted_length[step:] = self._length[:-step]
+                # 比较归一化代价，避免长路径总是吃亏
+                better = shifted_cost / shifted_length < best_cost / best_length
+                best_cost = np.where(better, shifted_cost, best_cost)
+                best_length = np.where(better, shifted_length, best_length)
+
+            # 开放起点：从模板第一帧重新开始的路径（动作重复时自动重新对齐）
+            if local[0] < best_cost[0] / best_length[0]:
+                best_cost[0], best_length[0] = 0.0, 0.0
+            cost = best_cost + local
+            length = best_length + 1
+
+        self._cost, self._length = cost, length
+        self.frames += 1
+        with np.errstate(invalid='ignore'):
+            normalized = cost / length
+        index = int(np.nanargmin(normalized)) if np.isfinite(normalized).any() else 0
+        return {"index": index, "cost": float(normalized[index]), "local_cost": float(local[index])}
+
+
+class LiveTemplateAligner:
+    """
+    实时模板对齐：把检测器输出的关键点转成角度特征，在线对齐到标准动作，并给出所处阶段和角度偏差
+    """
+
+    def __init__(self, reference_path: str = None, staged_template_path: str = None,
+                 features=DEFAULT_FEATURES, side: str = "right", max_step: int = 2,
+                 deviation_threshold: float = 10.0):
+        """
+        初始化对齐器
+
+        Args:
+            reference_path: 标准动作的逐帧分析数据（.json/.jsonl 时间线）
+            staged_template_path: 阶段模板（提供各阶段的时间范围）
+            features: 参与对齐的角度名
+            side: 持拍手 ('right' 或 'left')
+            max_step: 每帧模板位置最多前进的步数
+            deviation_threshold: 角度偏差超过该值（度）时给出提示
+        """
+        self.features = tuple(features)
+        self.side = side
+        self.deviation_threshold = deviation_threshold
+
+        try:
+            reference = load_timeline(reference_path or DEFAULT_REFERENCE_PATH)
+            self.stages: List[Dict[str, Any]] = load_compiled_template(
+                staged_template_path or DEFAULT_STAGED_TEMPLATE_PATH).stages
+        except Exception as e:
+            raise Exception(f"加载对齐模板失败: {e}")
+
+        self.template_times = [frame.get('time_ms', 0) for frame in reference]
+        self.template_features = np.array([self._features(frame.get('landmarks', {})) for frame in reference])
+        self.template_stages = [self._stage_at(t) for t in self.template_times]
+        self.dtw = OnlineDTW(self.template_features, max_step=max_step)
+
+    def _features(self, landmarks: Dict[Any, Dict[str, float]]) -> List[float]:
+        angles = compute_angles(landmarks, side=self.side)
+        return [angles.get(name, np.nan) for name in self.features]
+
+    def _stage_at(self, time_ms: float) -> Optional[str]:
+        for stage in self.stages:
+            if stage.get("start_ms", 0) <= time_ms <= stage.get("end_ms", 0):
+                return stage.get("stage")
+        # 落在阶段间隙时归到前一个阶段
+        previous = [s for s in self.stages if s.get("start_ms", 0) <= time_ms]
+        return previous[-1].get("stage") if previous else None
+
+    def reset(self) -> None:
+        """重新开始对齐"""
+        self.dtw.reset()
+
+    def update(self, landmarks: Dict[Any, Dict[str, float]]) -> Optional[Dict[str, Any]]:
+        """
+        输入一帧关键点，返回部分对齐结果
+
+        Args:
+            landmarks: 关键点字典 {index: {'x', 'y', 'confidence'}}
+
+        Returns:
+            {'template_index', 'template_time_ms', 'progress', 'stage', 'cost', 'deviations', 'message'}；
+            未检测到可用角度时返回None
+        """
+        features = np.array(self._features(landmarks), dtype=float)
+        aligned = self.dtw.update(features)
+        if aligned is None:
+            return None
+
+        index = aligned["index"]
+        reference = self.template_features[index]
+        deviations = {}
+        for name, user_value, template_value in zip(self.features, features, reference):
+            if not (np.isnan(user_value) or np.isnan(template_value)):
+                deviations[name] = float(user_value - template_value)
+
+        stage = self.template_stages[index]
+        worst = max(deviations.items(), key=lambda item: abs(item[1]), default=None)
+        if worst and abs(worst[1]) >= self.deviation_threshold:
+            name, value = worst
+            message = (f"处于{stage or '未知'}阶段，{ANGLE_DISPLAY_NAMES.get(name, name)}"
+                       f"{'偏小' if value < 0 else '偏大'} {abs(value):.0f}°")
+        else:
+            message = f"处于{stage or '未知'}阶段，动作与标准一致"
+
+        return {
+            "template_index": index,
+            "template_time_ms": self.template_times[index],
+            "progress": (index + 1) / len(self.template_times),
+            "stage": stage,
+            "cost": aligned["cost"],
+            "deviations": deviations,
+            "message": message,
+        }
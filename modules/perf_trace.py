@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能追踪
+在解码、颜色转换、推理、关键点提取、绘制、预览转换、时间线写入和大模型请求等位置记录命名区间，
+每个区间只记录两次 perf_counter_ns 并追加到环形缓冲区；
+按名称维护滑动窗口统计（供界面实时显示），并可导出为 Chrome 追踪格式（chrome://tracing / Perfetto）
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# 区间名称的界面显示名
+SPAN_LABELS = {
+    "decode": "视频解码",
+    "color_convert": "颜色转换",
+    "inference": "模型推理",
+    "landmark_extract": "关键点提取",
+    "draw": "骨架绘制",
+    "preview_convert": "预览转换",
+    "json_save": "时间线写入",
+    "report_save": "报告保存",
+    "llm_request": "大模型请求",
+    "llm_ttft": "首token延迟",
+    "llm_tokens_per_sec": "生成速度(token/s)",
+}
+
+
+class _Span:
+    """with 语句使用的区间，退出时记录"""
+
+    __slots__ = ("tracer", "name", "category", "args", "start_ns")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.name, self.start_ns, category=self.category, args=self.args)
+
+
+class _NullSpan:
+    """追踪关闭时使用的空区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class PerfTracer:
+    """
+    线程安全的区间追踪器
+    """
+
+    def __init__(self, max_events: int = 200000, stats_window: int = 300, enabled: bool = True):
+        """
+        初始化追踪器
+
+        Args:
+            max_events: 保留的追踪事件数（环形缓冲区，超出后丢弃最早的事件）
+            stats_window: 每个名称用于统计均值/分位数的最近样本数
+            enabled: 是否记录（关闭时 span 返回空区间）
+        """
+        self.enabled = enabled
+        self.stats_window = stats_window
+        self._origin_ns = time.perf_counter_ns()
+        self._events = deque(maxlen=max_events)
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, list] = {}
+        self._counters: Dict[str, deque] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, category: str = "pipeline", **args):
+        """
+        计时区间
+
+        用法:
+            with tracer.span("inference", model="mediapipe"):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args or None)
+
+    def record(self, name: str, start_ns: int, end_ns: int = None, category: str = "pipeline",
+               args: Dict[str, Any] = None) -> None:
+        """
+        记录一个已经结束的区间
+
+        Args:
+            name: 区间名称
+            start_ns: 开始时间（time.perf_counter_ns()）
+            end_ns: 结束时间（默认为当前时间）
+            category: 类别（追踪查看器中可按类别筛选）
+            args: 附加信息
+        """
+        if not self.enabled:
+            return
+        if end_ns is None:
+            end_ns = time.perf_counter_ns()
+        thread = threading.current_thread()
+        duration_ms = (end_ns - start_ns) / 1e6
+        with self._lock:
+            if thread.ident not in self._thread_names:
+                self._thread_names[thread.ident] = thread.name
+            self._events.append(("X", name, category, start_ns, end_ns - start_ns, thread.ident, args))
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.stats_window)
+                self._totals[name] = [0, 0.0]
+            samples.append(duration_ms)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += duration_ms
+
+    def counter(self, name: str, value: float, category: str = "pipeline") -> None:
+        """记录一个数值（如生成速度），在追踪查看器中显示为曲线"""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        thread = threading.current_thread()
+        with self._lock:
+            self._events.append(("C", name, category, now, 0, thread.ident, {name: value}))
+            values = self._counters.get(name)
+            if values is None:
+                values = self._counters[name] = deque(maxlen=self.stats_window)
+            values.append(float(value))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        各名称的统计
+
+        Returns:
+            {名称: {'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'last_ms'}}（均值和分位数按最近样本），
+            计数器为 {'count', 'mean', 'last'}
+        """
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            totals = {name: tuple(total) for name, total in self._totals.items()}
+            counters = {name: list(values) for name, values in self._counters.items()}
+        result = {}
+        for name, values in samples.items():
+            window = np.array(values)
+            result[name] = {
+                "count": totals[name][0],
+                "total_ms": totals[name][1],
+                "mean_ms": float(window.mean()),
+                "p50_ms": float(np.percentile(window, 50)),
+                "p95_ms": float(np.percentile(window, 95)),
+                "last_ms": values[-1],
+            }
+        for name, values in counters.items():
+            result[name] = {"count": len(values), "mean": float(np.mean(values)), "last": values[-1]}
+        return result
+
+    def reset(self) -> None:
+        """清空事件和统计"""
+        with self._lock:
+            self._events.clear()
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def export_chrome_trace(self, path: str) -> str:
+        """
+        导出为 Chrome 追踪格式 JSON
+
+        Args:
+            path: 输出文件路径
+
+        Returns:
+            文件路径
+        """
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        pid = os.getpid()
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                        for tid, name in thread_names.items()]
+        for phase, name, category, start_ns, duration_ns, tid, args in events:
+            event = {"name": name, "cat": category, "ph": phase, "pid": pid, "tid": tid,
+                     "ts": (start_ns - self._origin_ns) / 1000.0}
+            if phase == "X":
+                event["dur"] = duration_ns / 1000.0
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
+
+
+_tracer: Optional[PerfTracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> PerfTracer:
+    """进程内共享的追踪器（环境变量 BADMINTON_TRACE=0 时关闭记录）"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = PerfTracer(enabled=os.environ.get("BADMINTON_TRACE", "1") != "0")
+        return _tracer
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线任务调度器
+每个处理阶段声明输入/输出，调度器据此构建DAG；多个视频的流水线可同时排队，
+不同视频的不同阶段并发执行，并按各阶段实测耗时估算整体进度
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.background_jobs import BackgroundJobRunner, BackgroundTask, TaskCancelledError
+from modules.perf_trace import get_tracer
+from modules.metrics_exporter import track_scheduler
+
+
+class PipelineTask:
+    """
+    流水线阶段定义
+    """
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any], BackgroundTask], Dict[str, Any]],
+                 inputs: List[str] = None, outputs: List[str] = None,
+                 weight: float = 1.0, max_concurrency: int = None):
+        """
+        初始化阶段
+
+        Args:
+            name: 阶段名称
+            fn: 阶段函数 fn(上下文, BackgroundTask) -> {输出名: 值}
+            inputs: 依赖的上下文键
+            outputs: 产生的上下文键
+            weight: 初始耗时估计（秒），用于尚无实测数据时的进度估算
+            max_concurrency: 所有流水线中该阶段同时运行的最大数量（None表示不限制）
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+
+
+class PipelineRun:
+    """
+    一次流水线执行（通常对应一个视频）：记录各阶段状态、进度和耗时
+    """
+
+    def __init__(self, run_id: int, name: str, context: Dict[str, Any], estimates: Dict[str, float]):
+        self.run_id = run_id
+        self.name = name
+        self.context = context
+        self.status = BackgroundTask.PENDING
+        self.task_status = {task_name: BackgroundTask.PENDING for task_name in estimates}
+        self.task_progress = {task_name: 0.0 for task_name in estimates}
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[Exception] = None
+        self.started_at = None
+        self.finished_at = None
+        self._estimates = dict(estimates)
+        self._node_tasks: Dict[str, BackgroundTask] = {}
+        # 已在工作线程中开始执行的阶段（已提交但仍在线程池中排队的阶段不在其中）
+        self._executing = set()
+        self._cancel_requested = False
+        self._done_event = threading.Event()
+        self._scheduler = None
+
+    @property
+    def progress(self) -> float:
+        """按各阶段估计耗时加权的整体进度（0-100）"""
+        total = sum(self._estimates.values())
+        if total <= 0:
+            return 0.0
+        done = sum(self._estimates[name] * self.task_progress[name] / 100.0 for name in self._estimates)
+        return done / total * 100.0
+
+    @property
+    def finished(self) -> bool:
+        return self._done_event.is_set()
+
+    def cancel(self) -> None:
+        """取消该流水线（排队中的阶段不再执行，运行中的阶段收到取消请求）"""
+        if self._scheduler is not None:
+            self._scheduler.cancel_run(self)
+
+    def wait(self, timeout: float = None) -> Dict[str, Any]:
+        """
+        等待流水线结束
+
+        Args:
+            timeout: 超时时间（秒）
+
+        Returns:
+            执行完成后的上下文
+
+        Raises:
+            流水线失败或取消时抛出对应异常
+        """
+        if not self._done_event.wait(timeout):
+            raise TimeoutError(f"等待流水线超时: {self.name}")
+        if self.error is not None:
+            raise self.error
+        return self.context
+
+    def summary(self) -> str:
+        """各阶段耗时摘要"""
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+        return ", ".join(parts)
+
+
+class PipelineScheduler:
+    """
+    DAG流水线调度器
+    """
+
+    def __init__(self, tasks: List[PipelineTask], max_workers: int = 2,
+                 on_event: Callable[[PipelineRun, str, Optional[str]], None] = None,
+                 dispatcher: Callable[[Callable[[], None]], Any] = None):
+        """
+        初始化调度器
+
+        Args:
+            tasks: 阶段列表
+            max_workers: 工作线程数
+            on_event: 事件回调 (流水线, 事件名, 阶段名)；事件名包括 run_started、task_started、
+                      task_progress、task_done、run_done、run_failed、run_cancelled
+            dispatcher: 事件回调调度函数（例如 Tk 的 root.after），为None时直接在工作线程中回调
+        """
+        self.tasks = {task.name: task for task in tasks}
+        if len(self.tasks) != len(tasks):
+            raise ValueError("流水线阶段名称重复")
+        self.dependencies, self.external_inputs = self._resolve_dependencies(tasks)
+        self.order = self._topological_order(tasks)
+        self.on_event = on_event
+        self.dispatcher = dispatcher
+        self._runner = BackgroundJobRunner(max_workers=max_workers)
+        self._runs: List[PipelineRun] = []
+        self._running_count = {name: 0 for name in self.tasks}
+        # 各阶段实测耗时的指数滑动平均，用于后续流水线的进度估算
+        self._estimates = {task.name: task.weight for task in tasks}
+        self._next_id = 1
+        self._lock = threading.RLock()
+        track_scheduler(self)
+
+    def _resolve_dependencies(self, tasks: List[PipelineTask]):
+        """根据输入/输出声明求出每个阶段依赖的阶段，以及需要由调用方提供的外部输入"""
+        producers = {}
+        for task in tasks:
+            for output in task.outputs:
+                if output in producers:
+                    raise ValueError(f"输出 {output} 被多个阶段产生: {producers[output]}, {task.name}")
+                producers[output] = task.name
+
+        dependencies = {
+            task.name: sorted({producers[key] for key in task.inputs if key in producers})
+            for task in tasks
+        }
+        external_inputs = sorted({key for task in tasks for key in task.inputs if key not in producers})
+        return dependencies, external_inputs
+
+    def _topological_order(self, tasks: List[PipelineTask]) -> List[str]:
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"流水线存在循环依赖: {name}")
+            visiting.add(name)
+            for dependency in self.dependencies[name]:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for task in tasks:
+            visit(task.name)
+        return order
+
+    def _emit(self, run: PipelineRun, event: str, task_name: str = None) -> None:
+        if self.on_event is None:
+            return
+        if self.dispatcher is None:
+            self.on_event(run, event, task_name)
+        else:
+            self.dispatcher(lambda: self.on_event(run, event, task_name))
+
+    def submit(self, name: str, context: Dict[str, Any]) -> PipelineRun:
+        """
+        提交一次流水线执行
+
+        Args:
+            name: 流水线名称（例如视频文件名）
+            context: 初始上下文，需要包含所有外部输入
+
+        Returns:
+            PipelineRun 对象
+        """
+        missing = [key for key in self.external_inputs if key not in context]
+        if missing:
+            raise ValueError(f"流水线缺少输入: {', '.join(missing)}")
+
+        with self._lock:
+            run = PipelineRun(self._next_id, name, dict(context),
+                              {task_name: self._estimates[task_name] for task_name in self.order})
+            self._next_id += 1
+            run._scheduler = self
+            self._runs.append(run)
+            self._schedule()
+        return run
+
+    def _schedule(self) -> None:
+        """提交所有依赖已满足的阶段（按流水线提交顺序优先）"""
+        with self._lock:
+            for run in self._runs:
+                if run._cancel_requested:
+                    continue
+                for task_name in self.order:
+                    if run.task_status[task_name] != BackgroundTask.PENDING:
+                        continue
+                    if any(run.task_status[dep] != BackgroundTask.DONE for dep in self.dependencies[task_name]):
+                        continue
+                    task = self.tasks[task_name]
+                    if task.max_concurrency is not None and self._running_count[task_name] >= task.max_concurrency:
+                        continue
+                    self._start_task(run, task)
+
+    def _start_task(self, run: PipelineRun, task: PipelineTask) -> None:
+        run.task_status[task.name] = BackgroundTask.RUNNING
+        self._running_count[task.name] += 1
+        if run.status == BackgroundTask.PENDING:
+            run.status = BackgroundTask.RUNNING
+            run.started_at = time.time()
+            self._emit(run, "run_started")
+
+        def execute(node_task):
+            with self._lock:
+                run._executing.add(task.name)
+            self._emit(run, "task_started", task.name)
+            start = time.perf_counter()
+            # 阶段整体作为追踪中的外层区间，阶段内的解码/推理等区间嵌套在其中
+            with get_tracer().span(f"task:{task.name}", category="task", run=run.name):
+                outputs = task.fn(run.context, node_task) or {}
+            missing = [key for key in task.outputs if key not in outputs]
+            if missing:
+                raise Exception(f"阶段 {task.name} 未产生输出: {', '.join(missing)}")
+            return outputs, time.perf_counter() - start
+
+        def on_progress(node_task):
+            run.task_progress[task.name] = node_task.progress
+            self._emit(run, "task_progress", task.name)
+
+        run._node_tasks[task.name] = self._runner.submit(
+            f"{run.name}:{task.name}", execute,
+            on_progress=on_progress,
+            on_done=lambda node_task, result: self._on_task_done(run, task, result),
+            on_error=lambda node_task, error: self._on_task_error(run, task, error)
+        )
+
+    def _on_task_done(self, run: PipelineRun, task: PipelineTask, result) -> None:
+        outputs, elapsed = result
+        with self._lock:
+            self._running_count[task.name] -= 1
+            run._node_tasks.pop(task.name, None)
+            run._executing.discard(task.name)
+            run.context.update(outputs)
+            run.timings[task.name] = elapsed
+            run.task_progress[task.name] = 100.0
+            run.task_status[task.name] = BackgroundTask.DONE
+            previous = self._estimates[task.name]
+            self._estimates[task.name] = elapsed if previous <= 0 else 0.7 * previous + 0.3 * elapsed
+        self._emit(run, "task_done", task.name)
+
+        if run._cancel_requested:
+            self._finish(run, TaskCancelledError(f"流水线已取消: {run.name}"))
+        elif all(status == BackgroundTask.DONE for status in run.task_status.values()):
+            self._finish(run, None)
+        self._schedule()
+
+    def _on_task_error(self, run: PipelineRun, task: PipelineTask, error: Exception) -> None:
+        with self._lock:
+            self._running_count[task.name] -= 1
+            run._node_tasks.pop(task.name, None)
+            run._executing.discard(task.name)
+            cancelled = isinstance(error, TaskCancelledError) or run._cancel_requested
+            run.task_status[task.name] = BackgroundTask.CANCELLED if cancelled else BackgroundTask.FAILED
+            # 同一流水线中其他运行中的阶段也停止
+            run._cancel_requested = True
+            for node_task in list(run._node_tasks.values()):
+                node_task.cancel()
+        if not cancelled:
+            print(f"流水线 {run.name} 阶段 {task.name} 失败: {error}")
+        self._finish(run, error)
+        self._schedule()
+
+    def _finish(self, run: PipelineRun, error: Optional[Exception]) -> None:
+        with self._lock:
+            if run.finished or run._node_tasks:
+                # 仍有阶段在运行时，等待它们结束后再结束流水线
+                return
+            for task_name, status in run.task_status.items():
+                if status == BackgroundTask.PENDING:
+                    run.task_status[task_name] = BackgroundTask.CANCELLED
+            if error is None and run.error is None:
+                run.status = BackgroundTask.DONE
+            else:
+                run.error = run.error or error
+                run.status = BackgroundTask.CANCELLED if isinstance(run.error, TaskCancelledError) else BackgroundTask.FAILED
+            run.finished_at = time.time()
+            self._runs.remove(run)
+            run._done_event.set()
+
+        event = {
+            BackgroundTask.DONE: "run_done",
+            BackgroundTask.CANCELLED: "run_cancelled",
+        }.get(run.status, "run_failed")
+        self._emit(run, event)
+
+    def cancel_run(self, run: PipelineRun) -> None:
+        """取消一次流水线执行"""
+        with self._lock:
+            if run.finished:
+                return
+            run._cancel_requested = True
+            node_tasks = list(run._node_tasks.values())
+        for node_task in node_tasks:
+            node_task.cancel()
+        # 没有运行中的阶段时直接结束
+        self._finish(run, TaskCancelledError(f"流水线已取消: {run.name}"))
+
+    def cancel_all(self) -> int:
+        """
+        取消所有未结束的流水线
+
+        Returns:
+            被取消的流水线数
+        """
+        runs = self.active_runs()
+        for run in runs:
+            self.cancel_run(run)
+        return len(runs)
+
+    def queue_depths(self) -> Dict[str, Dict[str, int]]:
+        """
+        各阶段的排队情况
+
+        Returns:
+            {阶段名: {'waiting': 输入已就绪但尚未开始执行的流水线数（包括已提交、仍在线程池中排队的），
+                      'running': 正在工作线程中执行的数量}}
+        """
+        with self._lock:
+            depths = {name: {"waiting": 0, "running": 0} for name in self.order}
+            for run in self._runs:
+                for task_name in self.order:
+                    status = run.task_status[task_name]
+                    if task_name in run._executing:
+                        depths[task_name]["running"] += 1
+                    elif status == BackgroundTask.RUNNING or (
+                            status == BackgroundTask.PENDING and not run._cancel_requested and all(
+                                run.task_status[dep] == BackgroundTask.DONE for dep in self.dependencies[task_name])):
+                        depths[task_name]["waiting"] += 1
+        return depths
+
+    def active_runs(self) -> List[PipelineRun]:
+        """返回排队中和运行中的流水线"""
+        with self._lock:
+            return list(self._runs)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """取消所有流水线并关闭工作线程"""
+        self.cancel_all()
+        self._runner.shutdown(wait=wait)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多人姿态的球员ID跟踪
+每帧检测到的多个人按关键点外接框与已有轨迹做IoU匹配（匈牙利算法求最优分配），
+为每个球员保持稳定的编号，双打/多人训练视频中每个球员得到独立的时间线
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+Box = Tuple[float, float, float, float]
+
+
+def landmarks_box(landmarks: Dict[Any, Dict[str, float]], padding: float = 0.1) -> Optional[Box]:
+    """
+    关键点外接框
+
+    Args:
+        landmarks: 关键点字典 {index: {'x', 'y', 'confidence'}}
+        padding: 四周按框尺寸扩展的比例（关键点只覆盖关节，扩展后更接近人体轮廓）
+
+    Returns:
+        (x1, y1, x2, y2)；没有关键点时返回None
+    """
+    points = [(p['x'], p['y']) for key, p in landmarks.items() if key != 'box' and isinstance(p, dict)]
+    if not points:
+        return None
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+    pad_x, pad_y = (x2 - x1) * padding + 1, (y2 - y1) * padding + 1
+    return x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+
+
+def box_iou_matrix(boxes_a: List[Box], boxes_b: List[Box]) -> np.ndarray:
+    """
+    两组框两两之间的IoU
+
+    Returns:
+        (len(boxes_a), len(boxes_b)) 矩阵
+    """
+    if not boxes_a or not boxes_b:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = np.asarray(boxes_a, dtype=float)[:, None, :]
+    b = np.asarray(boxes_b, dtype=float)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class PlayerTracker:
+    """
+    基于外接框IoU + 匈牙利匹配的轻量级多人跟踪器
+    """
+
+    def __init__(self, iou_threshold: float = 0.2, max_missed_frames: int = 15):
+        """
+        初始化跟踪器
+
+        Args:
+            iou_threshold: 低于该IoU的匹配视为不同的人
+            max_missed_frames: 轨迹连续多少帧未匹配后删除（短暂遮挡期间保留编号）
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed_frames = max_missed_frames
+        self.primary_id = None
+        self._tracks: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 1
+
+    def seed(self, players: Dict[Any, Dict[Any, Dict[str, float]]]) -> None:
+        """
+        用已知的球员关键点恢复轨迹（从检查点继续分析时保持编号不变）
+
+        Args:
+            players: {球员编号: 关键点字典}
+        """
+        for player_id, landmarks in players.items():
+            box = landmarks_box(landmarks)
+            if box is not None:
+                player_id = int(player_id)
+                self._tracks[player_id] = {"box": box, "missed": 0}
+                self._next_id = max(self._next_id, player_id + 1)
+        if self._tracks and self.primary_id not in self._tracks:
+            self.primary_id = min(self._tracks)
+
+    def update(self, poses: List[Dict[Any, Dict[str, float]]]) -> Dict[int, Dict[Any, Dict[str, float]]]:
+        """
+        输入一帧检测到的全部姿态，返回带编号的结果
+
+        Args:
+            poses: 同一帧中检测到的关键点字典列表
+
+        Returns:
+            {球员编号: 关键点字典}（只包含本帧出现的球员）
+        """
+        detections = [(landmarks, landmarks_box(landmarks)) for landmarks in poses if landmarks]
+        detections = [(landmarks, box) for landmarks, box in detections if box is not None]
+
+        track_ids = list(self._tracks)
+        iou = box_iou_matrix([self._tracks[t]["box"] for t in track_ids], [box for _, box in detections])
+
+        assigned = {}
+        if iou.size:
+            rows, cols = linear_sum_assignment(1.0 - iou)
+            for row, col in zip(rows, cols):
+                if iou[row, col] >= self.iou_threshold:
+                    assigned[col] = track_ids[row]
+
+        players = {}
+        for col, (landmarks, box) in enumerate(detections):
+            track_id = assigned.get(col)
+            if track_id is None:
+                track_id = self._next_id
+                self._next_id += 1
+            self._tracks[track_id] = {"box": box, "missed": 0}
+            players[track_id] = landmarks
+
+        for track_id in track_ids:
+            if track_id not in players:
+                self._tracks[track_id]["missed"] += 1
+                if self._tracks[track_id]["missed"] > self.max_missed_frames:
+                    del self._tracks[track_id]
+
+        # 主球员（写入主时间线的 landmarks）：保持不变直到其轨迹过期（连续 max_missed_frames 帧未出现），
+        # 再换成画面中最大的人；短暂漏检的帧里主球员不在 players 中，主时间线不写入该帧
+        if players and self.primary_id not in self._tracks:
+            self.primary_id = max(players, key=lambda pid: self._box_area(self._tracks[pid]["box"]))
+        return players
+
+    @staticmethod
+    def _box_area(box: Box) -> float:
+        return (box[2] - box[0]) * (box[3] - box[1])
+
+    @property
+    def active_ids(self) -> List[int]:
+        return sorted(self._tracks)
+
+
+def draw_player_ids(image, players: Dict[int, Dict[Any, Dict[str, float]]], primary_id: int = None):
+    """
+    在图像上标注每个球员的编号和外接框
+
+    Args:
+        image: 已绘制骨架的图像
+        players: {球员编号: 关键点字典}
+        primary_id: 主球员编号（用不同颜色标注）
+
+    Returns:
+        标注后的图像
+    """
+    for player_id, landmarks in players.items():
+        box = landmarks_box(landmarks)
+        if box is None:
+            continue
+        x1, y1, x2, y2 = (int(v) for v in box)
+        color = (0, 0, 255) if player_id == primary_id else (255, 128, 0)
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 1)
+        cv2.putText(image, f"P{player_id}", (x1, max(y1 - 5, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return image
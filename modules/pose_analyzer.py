@@ -7,11 +7,16 @@ import os
 import requests
 from fastdtw import fastdtw
 from scipy.spatial.distance import euclidean
+from modules.llm_settings import load_api_url
+from modules.timeline_writer import load_timeline
+from modules.realtime_feedback import RealtimeFeedbackEngine
 
 class PoseAnalyzer:
     def __init__(self):
         """初始化姿势分析器"""
         self.feedback = []
+        self.api_url = load_api_url()
+        self.realtime_engine = None
         
         # MediaPipe关键点索引映射
         self.landmarks_info = {
@@ -50,12 +55,13 @@ class PoseAnalyzer:
             "RIGHT_FOOT_INDEX": 32
         }
 
-    def analyze_pose(self, landmarks):
+    def analyze_pose(self, landmarks, time_ms=None):
         """
-        分析单帧姿势并提供反馈。
+        分析单帧姿势并提供反馈（按阶段模板规则逐帧判断，首次调用时加载模板）。
 
         Args:
-            landmarks (list): 包含所有关键点的列表。
+            landmarks (dict): 检测器输出的关键点字典。
+            time_ms (float): 帧时间戳（毫秒），默认使用单调时钟。
 
         Returns:
             list: 包含分析建议的字符串列表。
@@ -63,20 +69,21 @@ class PoseAnalyzer:
         if not landmarks:
             return ["画面中未检测到目标。"]
 
-        self.feedback.clear()
+        if self.realtime_engine is None:
+            self.realtime_engine = RealtimeFeedbackEngine()
 
-        # 简化analyze_pose为：self.feedback.append("实时分析中...")
-        self.feedback.append("实时分析中...")
+        self.feedback.clear()
+        result = self.realtime_engine.update(landmarks, time_ms)
+        self.feedback.append(f"当前阶段: {result['stage']}")
+        self.feedback.extend(result["messages"])
         
         return self.feedback.copy()
 
     def analyze_json_difference(self, standard_json_path, learner_json_path):
         """比较JSON并用大模型生成建议（带DTW对齐）"""
         try:
-            with open(standard_json_path, 'r', encoding='utf-8') as f:
-                standard_data = json.load(f)
-            with open(learner_json_path, 'r', encoding='utf-8') as f:
-                learner_data = json.load(f)
+            standard_data = load_timeline(standard_json_path)
+            learner_data = load_timeline(learner_json_path)
         except Exception as e:
             return [f"加载JSON失败: {e}"]
 
@@ -146,7 +153,7 @@ class PoseAnalyzer:
                 'https': None
             }
             
-            response = requests.post("https://ark.cn-beijing.volces.com/api/v3/chat/completions", 
+            response = requests.post(self.api_url, 
                                    headers=headers, json=data, proxies=proxies)
             response.raise_for_status()
             
@@ -160,8 +167,7 @@ class PoseAnalyzer:
 
     def segment_actions_with_llm(self, json_path, template_path, num_stages=5):
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_timeline(json_path)
             with open(template_path, 'r', encoding='utf-8') as f:
                 template_data = json.load(f)
         except Exception as e:
@@ -194,7 +200,7 @@ class PoseAnalyzer:
                     'https': None
                 }
                 
-                response = requests.post("https://ark.cn-beijing.volces.com/api/v3/chat/completions", 
+                response = requests.post(self.api_url, 
                                        headers=headers, json=data, proxies=proxies)
                 response.raise_for_status()
                 
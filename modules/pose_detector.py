@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import os
+import time
 import urllib.request
 import sys
 
@@ -8,13 +9,27 @@ import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
+from modules.perf_trace import get_tracer
+from modules.metrics_exporter import record_frame, observe_inference
+
 class PoseDetector:
     # 支持的模型类型
     MODEL_OPENPOSE_BODY_25 = "openpose_body_25"
     MODEL_OPENPOSE_COCO = "openpose_coco"
     MODEL_MEDIAPIPE = "mediapipe"
 
-    def __init__(self, model_type="mediapipe", min_detection_confidence=0.2, device="cpu"):
+    # 模型文件（MediaPipe按优先级排列：heavy优先）
+    MEDIAPIPE_MODEL_FILES = [
+        ("pose_landmarker_heavy.task", "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/1/pose_landmarker_heavy.task"),
+        ("pose_landmarker_full.task", "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_full/float16/1/pose_landmarker_full.task")
+    ]
+    OPENPOSE_MODEL_FILES = {
+        MODEL_OPENPOSE_COCO: ("pose_deploy_linevec.prototxt", "pose_iter_440000.caffemodel", 18),
+        MODEL_OPENPOSE_BODY_25: ("pose_deploy.prototxt", "pose_iter_584000.caffemodel", 25)
+    }
+    MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+    def __init__(self, model_type="mediapipe", min_detection_confidence=0.2, device="cpu", num_poses=1):
         """
         初始化姿势检测器
         
@@ -22,12 +37,15 @@ class PoseDetector:
             model_type: 要使用的模型类型 ("openpose_coco", "openpose_body_25", "mediapipe")
             min_detection_confidence: 最小检测置信度 (已降低默认值以提高检出率)
             device: 计算设备 ('cpu' 或 'gpu')
+            num_poses: 单帧最多检测的人数 (仅MediaPipe支持多人，一次推理得到所有人)
         """
         self.model_type = model_type
         self.min_detection_confidence = min_detection_confidence
         self.device = device.lower()
+        self.num_poses = max(1, int(num_poses))
         self.initialization_error = None # 用于存储初始化过程中的错误信息
         self.frame_timestamp_ms = 0 # 为视频模式增加时间戳
+        self.tracer = get_tracer() # 记录颜色转换/推理/关键点提取/绘制的耗时
         
         # 通用关键点索引定义
         self.NOSE, self.NECK = 0, 1
@@ -58,6 +76,29 @@ class PoseDetector:
 
         self._initialize_model()
 
+    @classmethod
+    def resolve_model_path(cls, model_type="mediapipe"):
+        """
+        返回该模型类型在本地已存在的模型文件路径（不触发下载，也不加载模型）
+        
+        Args:
+            model_type: 模型类型
+            
+        Returns:
+            模型文件路径；本地没有模型文件时返回None
+        """
+        if model_type == cls.MODEL_MEDIAPIPE:
+            candidates = [name for name, _ in cls.MEDIAPIPE_MODEL_FILES]
+        elif model_type in cls.OPENPOSE_MODEL_FILES:
+            candidates = [cls.OPENPOSE_MODEL_FILES[model_type][1]]
+        else:
+            return None
+        for name in candidates:
+            path = os.path.join(cls.MODELS_DIR, name)
+            if os.path.exists(path):
+                return path
+        return None
+
     def get_landmarks_info(self):
         """
         返回当前模型使用的关键点名称->索引的映射字典。
@@ -82,12 +123,9 @@ class PoseDetector:
         """初始化MediaPipe Pose模型，优先使用heavy模型，如果模型不存在则自动下载。"""
         
         # 定义模型，优先使用heavy
-        model_options = [
-            ("pose_landmarker_heavy.task", "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/1/pose_landmarker_heavy.task"),
-            ("pose_landmarker_full.task", "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_full/float16/1/pose_landmarker_full.task")
-        ]
+        model_options = self.MEDIAPIPE_MODEL_FILES
         
-        models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+        models_dir = self.MODELS_DIR
         os.makedirs(models_dir, exist_ok=True)
         
         model_path = None
@@ -140,6 +178,7 @@ class PoseDetector:
                     options = vision.PoseLandmarkerOptions(
                         base_options=base_options,
                         running_mode=vision.RunningMode.VIDEO,
+                        num_poses=self.num_poses,
                         output_segmentation_masks=True,
                         min_pose_detection_confidence=self.min_detection_confidence,
                         min_pose_presence_confidence=self.min_detection_confidence)
@@ -163,6 +202,7 @@ class PoseDetector:
                 options = vision.PoseLandmarkerOptions(
                     base_options=base_options,
                     running_mode=vision.RunningMode.VIDEO, 
+                    num_poses=self.num_poses,
                     output_segmentation_masks=True,
                     min_pose_detection_confidence=self.min_detection_confidence,
                     min_pose_presence_confidence=self.min_detection_confidence)
@@ -177,15 +217,10 @@ class PoseDetector:
 
     def _init_openpose(self):
         """初始化OpenPose DNN模型"""
-        model_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+        model_folder = self.MODELS_DIR
         os.makedirs(model_folder, exist_ok=True)
 
-        model_files = {
-            self.MODEL_OPENPOSE_COCO: ("pose_deploy_linevec.prototxt", "pose_iter_440000.caffemodel", 18),
-            self.MODEL_OPENPOSE_BODY_25: ("pose_deploy.prototxt", "pose_iter_584000.caffemodel", 25)
-        }
-        
-        proto, weights, n_points = model_files.get(self.model_type)
+        proto, weights, n_points = self.OPENPOSE_MODEL_FILES.get(self.model_type)
         self.proto_file = os.path.join(model_folder, proto)
         self.weights_file = os.path.join(model_folder, weights)
         self.n_points = n_points
@@ -204,6 +239,13 @@ class PoseDetector:
             print(f"警告：{self.model_type} 模型文件不存在，将使用备用检测方法。")
             print(f"请下载模型文件 '{proto}' 和 '{weights}' 并放置在 '{model_folder}' 目录下。")
 
+    def _next_timestamp(self, timestamp_ms):
+        """视频模式需要一个单调递增的时间戳：外部提供了精确的时间戳则使用它，否则使用内部计数器"""
+        if timestamp_ms is None:
+            self.frame_timestamp_ms += 33  # 假设约30FPS的帧率
+            return self.frame_timestamp_ms
+        return timestamp_ms
+
     def detect_pose(self, image, timestamp_ms: int = None):
         """
         检测图像中的人体姿势, 返回处理后的图像和关键点数据
@@ -215,15 +257,8 @@ class PoseDetector:
         landmarks = {}
         if self.model_type == self.MODEL_MEDIAPIPE:
             if self.landmarker:
-                # 视频模式需要一个单调递增的时间戳
-                # 如果外部提供了精确的时间戳，则使用它，否则使用内部计数器
-                if timestamp_ms is None:
-                    self.frame_timestamp_ms += 33  # 假设约30FPS的帧率
-                    current_timestamp = self.frame_timestamp_ms
-                else:
-                    current_timestamp = timestamp_ms
-                
-                landmarks = self._detect_pose_mediapipe(image, current_timestamp)
+                poses = self._detect_poses_mediapipe(image, self._next_timestamp(timestamp_ms))
+                landmarks = poses[0] if poses else {}
         elif self.model_type.startswith("openpose"):
             if hasattr(self, 'use_openpose') and self.use_openpose:
                 landmarks = self._detect_pose_openpose(image)
@@ -236,70 +271,125 @@ class PoseDetector:
         #         if k not in landmarks:
         #             landmarks[k] = v
         
+        record_frame(self.model_type, bool(landmarks))
+        
         # 在图像上绘制所有检测结果
-        processed_image = self.draw_pose(image.copy(), landmarks)
+        with self.tracer.span("draw"):
+            processed_image = self.draw_pose(image.copy(), landmarks)
 
         return processed_image, landmarks
 
+    def detect_poses(self, image, timestamp_ms: int = None):
+        """
+        检测图像中的所有人（一次推理），返回处理后的图像和每个人的关键点数据列表
+        
+        Args:
+            image: 输入图像
+            timestamp_ms: (可选) 视频帧的时间戳 (毫秒)
+        """
+        poses = []
+        if self.model_type == self.MODEL_MEDIAPIPE:
+            if self.landmarker:
+                poses = self._detect_poses_mediapipe(image, self._next_timestamp(timestamp_ms))
+        elif self.model_type.startswith("openpose"):
+            # OpenPose单人热图只能得到一个人
+            if hasattr(self, 'use_openpose') and self.use_openpose:
+                landmarks = self._detect_pose_openpose(image)
+                poses = [landmarks] if landmarks else []
+        record_frame(self.model_type, bool(poses))
+        
+        with self.tracer.span("draw"):
+            processed_image = image.copy()
+            if poses:
+                for landmarks in poses:
+                    processed_image = self.draw_pose(processed_image, landmarks)
+            else:
+                processed_image = self.draw_pose(processed_image, {})
+        return processed_image, poses
+
+    def _record_inference(self, start_ns):
+        """推理耗时同时写入性能追踪和运行指标"""
+        end_ns = time.perf_counter_ns()
+        self.tracer.record("inference", start_ns, end_ns)
+        observe_inference(self.model_type, (end_ns - start_ns) / 1e9)
+
     def _detect_pose_mediapipe(self, image, timestamp_ms):
-        """使用MediaPipe检测姿势 (Tasks API - 视频模式)"""
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+        """使用MediaPipe检测姿势 (Tasks API - 视频模式)，只返回第一个人"""
+        poses = self._detect_poses_mediapipe(image, timestamp_ms)
+        return poses[0] if poses else {}
+
+    def _detect_poses_mediapipe(self, image, timestamp_ms):
+        """使用MediaPipe检测画面中的所有人 (最多num_poses个)，返回关键点字典列表"""
+        with self.tracer.span("color_convert"):
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
         
         try:
+            inference_start = time.perf_counter_ns()
             detection_result = self.landmarker.detect_for_video(mp_image, timestamp_ms)
+            self._record_inference(inference_start)
         except Exception as e:
             print(f"MediaPipe 检测出错: {e}")
-            return {}
+            return []
 
+        h, w, _ = image.shape
+        poses = []
+        with self.tracer.span("landmark_extract"):
+            for pose_landmarks_list in detection_result.pose_landmarks or []:
+                landmarks = self._convert_mediapipe_landmarks(pose_landmarks_list, w, h)
+                if landmarks:
+                    poses.append(landmarks)
+        return poses
+
+    def _convert_mediapipe_landmarks(self, pose_landmarks_list, w, h):
+        """把一个人的MediaPipe关键点转换为内部格式"""
         landmarks = {}
-        # Assuming one person in the image for simplicity
-        if detection_result.pose_landmarks:
-            pose_landmarks_list = detection_result.pose_landmarks[0]
-            h, w, _ = image.shape
-            
-            # Map mediapipe landmarks to our internal format
-            # The new 'tasks' API uses integer indices for landmarks, not enums.
-            mp_index_to_our_map = {
-                0: self.NOSE,
-                12: self.RIGHT_SHOULDER,
-                14: self.RIGHT_ELBOW,
-                16: self.RIGHT_WRIST,
-                11: self.LEFT_SHOULDER,
-                13: self.LEFT_ELBOW,
-                15: self.LEFT_WRIST,
-                24: self.RIGHT_HIP,
-                26: self.RIGHT_KNEE,
-                28: self.RIGHT_ANKLE,
-                23: self.LEFT_HIP,
-                25: self.LEFT_KNEE,
-                27: self.LEFT_ANKLE,
-            }
+        # Map mediapipe landmarks to our internal format
+        # The new 'tasks' API uses integer indices for landmarks, not enums.
+        mp_index_to_our_map = {
+            0: self.NOSE,
+            12: self.RIGHT_SHOULDER,
+            14: self.RIGHT_ELBOW,
+            16: self.RIGHT_WRIST,
+            11: self.LEFT_SHOULDER,
+            13: self.LEFT_ELBOW,
+            15: self.LEFT_WRIST,
+            24: self.RIGHT_HIP,
+            26: self.RIGHT_KNEE,
+            28: self.RIGHT_ANKLE,
+            23: self.LEFT_HIP,
+            25: self.LEFT_KNEE,
+            27: self.LEFT_ANKLE,
+        }
 
-            for mp_idx, our_idx in mp_index_to_our_map.items():
-                if mp_idx < len(pose_landmarks_list):
-                    landmark = pose_landmarks_list[mp_idx]
-                    # The new API provides landmark.visibility and landmark.presence
-                    # We can use visibility as confidence
-                    if landmark.visibility > self.min_detection_confidence:
-                        landmarks[our_idx] = {'x': int(landmark.x * w), 'y': int(landmark.y * h), 'confidence': landmark.visibility}
-
-            # Estimate neck position
-            if self.RIGHT_SHOULDER in landmarks and self.LEFT_SHOULDER in landmarks:
-                 landmarks[self.NECK] = {
-                    'x': (landmarks[self.RIGHT_SHOULDER]['x'] + landmarks[self.LEFT_SHOULDER]['x']) // 2,
-                    'y': (landmarks[self.RIGHT_SHOULDER]['y'] + landmarks[self.LEFT_SHOULDER]['y']) // 2,
-                    'confidence': (landmarks[self.RIGHT_SHOULDER]['confidence'] + landmarks[self.LEFT_SHOULDER]['confidence']) / 2
-                }
+        for mp_idx, our_idx in mp_index_to_our_map.items():
+            if mp_idx < len(pose_landmarks_list):
+                landmark = pose_landmarks_list[mp_idx]
+                # The new API provides landmark.visibility and landmark.presence
+                # We can use visibility as confidence
+                if landmark.visibility > self.min_detection_confidence:
+                    landmarks[our_idx] = {'x': int(landmark.x * w), 'y': int(landmark.y * h), 'confidence': landmark.visibility}
+
+        # Estimate neck position
+        if self.RIGHT_SHOULDER in landmarks and self.LEFT_SHOULDER in landmarks:
+             landmarks[self.NECK] = {
+                'x': (landmarks[self.RIGHT_SHOULDER]['x'] + landmarks[self.LEFT_SHOULDER]['x']) // 2,
+                'y': (landmarks[self.RIGHT_SHOULDER]['y'] + landmarks[self.LEFT_SHOULDER]['y']) // 2,
+                'confidence': (landmarks[self.RIGHT_SHOULDER]['confidence'] + landmarks[self.LEFT_SHOULDER]['confidence']) / 2
+            }
         return landmarks
 
     def _detect_pose_openpose(self, image):
         """使用OpenPose检测姿势"""
         h, w = image.shape[:2]
-        blob = cv2.dnn.blobFromImage(image, self.scale, (self.in_width, self.in_height), (0, 0, 0), swapRB=False, crop=False)
+        with self.tracer.span("color_convert"):
+            blob = cv2.dnn.blobFromImage(image, self.scale, (self.in_width, self.in_height), (0, 0, 0), swapRB=False, crop=False)
+        inference_start = time.perf_counter_ns()
         self.net.setInput(blob)
         output = self.net.forward()
+        self._record_inference(inference_start)
         
+        extract_start = time.perf_counter_ns()
         detected_keypoints = []
         for i in range(self.n_points):
             prob_map = output[0, i, :, :]
@@ -320,6 +410,7 @@ class PoseDetector:
             if data and data['id'] in openpose_map:
                 our_idx = openpose_map[data['id']]
                 landmarks[our_idx] = {'x': data['point'][0], 'y': data['point'][1], 'confidence': data['confidence']}
+        self.tracer.record("landmark_extract", extract_start)
         return landmarks
         
     def _detect_pose_fallback(self, image):
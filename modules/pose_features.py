@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单帧姿态角度特征
+从检测器输出的关键点（14点格式，键可以是int或str）计算阶段模板 expected_values 中使用的角度：
+    elbow_angle     肩-肘-腕 夹角（持拍手）
+    shoulder_angle  髋-肩-肘 夹角（上臂抬起程度）
+    hip_angle       肩-髋-膝 夹角
+    knee_angle      髋-膝-踝 夹角（两侧取平均）
+    body_lean       躯干（髋中点→颈）与水平方向的夹角，90°为直立
+    body_rotation   肩连线与髋连线的夹角
+compute_angles 每帧只做少量标量运算，适合实时调用；compute_angle_arrays 对整段时间线一次性向量化计算
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 关键点索引（与 PoseDetector 一致）
+NOSE, NECK = 0, 1
+RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST = 2, 3, 4
+LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST = 5, 6, 7
+RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE = 8, 9, 10
+LEFT_HIP, LEFT_KNEE, LEFT_ANKLE = 11, 12, 13
+
+# 角度名称对应的中文显示名
+ANGLE_DISPLAY_NAMES = {
+    "elbow_angle": "肘部角度",
+    "shoulder_angle": "肩部角度",
+    "hip_angle": "髋部角度",
+    "wrist_angle": "腕部角度",
+    "knee_angle": "膝部角度",
+    "body_lean": "身体前倾",
+    "body_rotation": "身体转动",
+}
+
+_ARM_POINTS = {
+    "right": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST, RIGHT_HIP),
+    "left": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, LEFT_HIP),
+}
+
+
+def _point(landmarks: Dict[Any, Dict[str, float]], index: int, min_confidence: float):
+    point = landmarks.get(index)
+    if point is None:
+        point = landmarks.get(str(index))
+    if point is None or point.get('confidence', 1.0) < min_confidence:
+        return None
+    return point['x'], point['y']
+
+
+def joint_angle(p1, p2, p3) -> Optional[float]:
+    """
+    计算以p2为顶点的夹角
+
+    Args:
+        p1, p2, p3: (x, y) 坐标元组
+
+    Returns:
+        角度（0-180度）；任一点缺失或两边长度为0时返回None
+    """
+    if p1 is None or p2 is None or p3 is None:
+        return None
+    v1x, v1y = p1[0] - p2[0], p1[1] - p2[1]
+    v2x, v2y = p3[0] - p2[0], p3[1] - p2[1]
+    norm = math.hypot(v1x, v1y) * math.hypot(v2x, v2y)
+    if norm == 0:
+        return None
+    cosine = max(-1.0, min(1.0, (v1x * v2x + v1y * v2y) / norm))
+    return math.degrees(math.acos(cosine))
+
+
+def _midpoint(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (a[0] + b[0]) / 2, (a[1] + b[1]) / 2
+
+
+def _line_angle(a, b) -> Optional[float]:
+    """线段a→b相对水平方向的角度（0-180度，与方向无关）"""
+    if a is None or b is None or a == b:
+        return None
+    return math.degrees(math.atan2(b[1] - a[1], b[0] - a[0])) % 180.0
+
+
+def compute_angles(landmarks: Dict[Any, Dict[str, float]], side: str = "right",
+                   min_confidence: float = 0.3) -> Dict[str, float]:
+    """
+    计算单帧的全部角度特征
+
+    Args:
+        landmarks: 关键点字典 {index: {'x', 'y', 'confidence'}}
+        side: 持拍手 ('right' 或 'left')
+        min_confidence: 低于该置信度的关键点视为缺失
+
+    Returns:
+        {角度名: 角度值}，缺少关键点的角度不出现在结果中
+    """
+    if not landmarks:
+        return {}
+
+    shoulder_i, elbow_i, wrist_i, hip_i = _ARM_POINTS.get(side, _ARM_POINTS["right"])
+    shoulder = _point(landmarks, shoulder_i, min_confidence)
+    elbow = _point(landmarks, elbow_i, min_confidence)
+    wrist = _point(landmarks, wrist_i, min_confidence)
+    hip = _point(landmarks, hip_i, min_confidence)
+
+    r_shoulder = _point(landmarks, RIGHT_SHOULDER, min_confidence)
+    l_shoulder = _point(landmarks, LEFT_SHOULDER, min_confidence)
+    r_hip = _point(landmarks, RIGHT_HIP, min_confidence)
+    l_hip = _point(landmarks, LEFT_HIP, min_confidence)
+    neck = _point(landmarks, NECK, min_confidence) or (
+        _midpoint(r_shoulder, l_shoulder) if r_shoulder and l_shoulder else None)
+
+    angles = {}
+    value = joint_angle(shoulder, elbow, wrist)
+    if value is not None:
+        angles["elbow_angle"] = value
+    value = joint_angle(hip, shoulder, elbow)
+    if value is not None:
+        angles["shoulder_angle"] = value
+
+    knee_side = RIGHT_KNEE if side != "left" else LEFT_KNEE
+    value = joint_angle(shoulder, hip, _point(landmarks, knee_side, min_confidence))
+    if value is not None:
+        angles["hip_angle"] = value
+
+    knees = [joint_angle(_point(landmarks, h, min_confidence), _point(landmarks, k, min_confidence),
+                         _point(landmarks, a, min_confidence))
+             for h, k, a in ((RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE), (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE))]
+    knees = [k for k in knees if k is not None]
+    if knees:
+        angles["knee_angle"] = sum(knees) / len(knees)
+
+    if r_hip is not None or l_hip is not None:
+        trunk = _line_angle(_midpoint(r_hip, l_hip), neck)
+        if trunk is not None:
+            angles["body_lean"] = 180.0 - trunk if trunk > 90.0 else trunk
+
+    shoulder_line = _line_angle(r_shoulder, l_shoulder)
+    hip_line = _line_angle(r_hip, l_hip)
+    if shoulder_line is not None and hip_line is not None:
+        diff = abs(shoulder_line - hip_line)
+        angles["body_rotation"] = min(diff, 180.0 - diff)
+
+    return angles
+
+
+# ---- 整段时间线的向量化计算 ----
+
+NUM_LANDMARKS = 14
+
+
+def timeline_to_arrays(frames: List[Dict[str, Any]], min_confidence: float = 0.3):
+    """
+    把时间线转换为数组
+
+    Args:
+        frames: 时间线条目列表 [{'time_ms', 'landmarks'}]
+        min_confidence: 低于该置信度的关键点记为NaN
+
+    Returns:
+        (times, points)：times 为 (帧数,) 毫秒时间戳，points 为 (帧数, 14, 2) 坐标，缺失为NaN
+    """
+    times = np.empty(len(frames))
+    points = np.full((len(frames), NUM_LANDMARKS, 2), np.nan)
+    for row, frame in enumerate(frames):
+        times[row] = frame.get('time_ms', 0)
+        for key, point in frame.get('landmarks', {}).items():
+            try:
+                index = int(key)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < NUM_LANDMARKS and point.get('confidence', 1.0) >= min_confidence:
+                points[row, index, 0] = point['x']
+                points[row, index, 1] = point['y']
+    return times, points
+
+
+def _joint_angles(points: np.ndarray, a: int, b: int, c: int) -> np.ndarray:
+    v1 = points[:, a] - points[:, b]
+    v2 = points[:, c] - points[:, b]
+    norm = np.linalg.norm(v1, axis=1) * np.linalg.norm(v2, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = np.einsum('ij,ij->i', v1, v2) / norm
+    cosine = np.where(norm > 0, cosine, np.nan)
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def _line_angles(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    delta = end - start
+    angles = np.degrees(np.arctan2(delta[:, 1], delta[:, 0])) % 180.0
+    return np.where(np.all(delta == 0, axis=1), np.nan, angles)
+
+
+def _nan_average(*arrays: np.ndarray) -> np.ndarray:
+    """逐元素平均，忽略NaN（全部为NaN时结果为NaN）"""
+    stacked = np.stack(arrays)
+    count = (~np.isnan(stacked)).sum(axis=0)
+    total = np.nansum(stacked, axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def compute_angle_arrays(points: np.ndarray, side: str = "right") -> Dict[str, np.ndarray]:
+    """
+    一次计算所有帧的角度特征（与 compute_angles 的定义一致）
+
+    Args:
+        points: (帧数, 14, 2) 关键点坐标数组，缺失为NaN
+        side: 持拍手 ('right' 或 'left')
+
+    Returns:
+        {角度名: (帧数,) 数组}，无法计算的帧为NaN
+    """
+    shoulder, elbow, wrist, hip = _ARM_POINTS.get(side, _ARM_POINTS["right"])
+    knee = RIGHT_KNEE if side != "left" else LEFT_KNEE
+
+    # 颈部缺失时用两肩中点代替（两肩都存在时）
+    shoulders_mid = (points[:, RIGHT_SHOULDER] + points[:, LEFT_SHOULDER]) / 2
+    neck = np.where(np.isnan(points[:, NECK]), shoulders_mid, points[:, NECK])
+    hips_mid = _nan_average(points[:, RIGHT_HIP], points[:, LEFT_HIP])
+    trunk = _line_angles(hips_mid, neck)
+
+    rotation = np.abs(_line_angles(points[:, RIGHT_SHOULDER], points[:, LEFT_SHOULDER])
+                      - _line_angles(points[:, RIGHT_HIP], points[:, LEFT_HIP]))
+
+    return {
+        "elbow_angle": _joint_angles(points, shoulder, elbow, wrist),
+        "shoulder_angle": _joint_angles(points, hip, shoulder, elbow),
+        "hip_angle": _joint_angles(points, shoulder, hip, knee),
+        "knee_angle": _nan_average(_joint_angles(points, RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+                                   _joint_angles(points, LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+        "body_lean": np.where(trunk > 90.0, 180.0 - trunk, trunk),
+        "body_rotation": np.minimum(rotation, 180.0 - rotation),
+    }
+
+
+def stage_angle_distributions(times: np.ndarray, angle_arrays: Dict[str, np.ndarray],
+                              stages: List[Dict[str, Any]], min_frames: int = 3) -> List[Dict[str, Any]]:
+    """
+    按阶段时间窗口统计每个角度的分布
+
+    Args:
+        times: (帧数,) 毫秒时间戳
+        angle_arrays: compute_angle_arrays 的结果
+        stages: 阶段列表（使用 stage/start_ms/end_ms）
+        min_frames: 有效帧少于该值的角度不统计
+
+    Returns:
+        [{'stage', 'start_ms', 'end_ms', 'frames', 'angles': {角度名: {'mean', 'std', 'p10', 'p50', 'p90',
+        'peak', 'peak_time_ms'}}}]，peak_time_ms 为峰值相对阶段开始的时间
+    """
+    results = []
+    for stage in stages:
+        start_ms, end_ms = stage.get("start_ms", 0), stage.get("end_ms", 0)
+        mask = (times >= start_ms) & (times <= end_ms)
+        stage_times = times[mask]
+        distributions = {}
+        for angle_name, values in angle_arrays.items():
+            stage_values = values[mask]
+            valid = ~np.isnan(stage_values)
+            if valid.sum() < min_frames:
+                continue
+            valid_values = stage_values[valid]
+            p10, p50, p90 = np.percentile(valid_values, [10, 50, 90])
+            peak_index = int(np.argmax(valid_values))
+            distributions[angle_name] = {
+                "mean": float(valid_values.mean()),
+                "std": float(valid_values.std()),
+                "p10": float(p10),
+                "p50": float(p50),
+                "p90": float(p90),
+                "peak": float(valid_values[peak_index]),
+                "peak_time_ms": float(stage_times[valid][peak_index] - start_ms),
+            }
+        results.append({
+            "stage": stage.get("stage"),
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "frames": int(mask.sum()),
+            "angles": distributions,
+        })
+    return results
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+球员进步跟踪
+按 (球员, 动作类型, 对比方式, 阶段, 指标) 维护累计统计：总体均值/方差、滑动窗口均值、指数加权均值、偏差直方图。
+每完成一次对比只更新对应的聚合行，进度面板直接读取聚合结果，不需要遍历全部历史记录
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from modules.report_store import DEFAULT_DB_PATH, ReportStore, extract_stage_metrics, comparison_mode_of
+
+# 偏差直方图（学员 - 模板）的分箱边界（按指标单位），两端各有一个溢出箱
+DEVIATION_BIN_EDGES = {
+    "deg": [-30.0, -20.0, -10.0, -5.0, 0.0, 5.0, 10.0, 20.0, 30.0],
+    "ms": [-400.0, -200.0, -100.0, -50.0, 0.0, 50.0, 100.0, 200.0, 400.0],
+}
+
+# 趋势判定阈值：近期平均偏差比历史平均偏差变化超过该值才算进步/退步
+TREND_THRESHOLDS = {"deg": 1.0, "ms": 20.0}
+
+
+def metric_unit(metric: str) -> str:
+    """指标单位：duration_ms 等以 _ms 结尾的为毫秒，其余为角度"""
+    return "ms" if metric.endswith("_ms") else "deg"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress_aggregates (
+    player TEXT NOT NULL,
+    stroke_type TEXT NOT NULL,
+    comparison_mode TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (player, stroke_type, comparison_mode, stage, metric)
+);
+"""
+
+
+class RunningStats:
+    """
+    单个指标的增量统计（每次更新 O(1)）
+    """
+
+    def __init__(self, window: int = 10, alpha: float = 0.3, state: Dict[str, Any] = None, unit: str = "deg"):
+        """
+        初始化统计
+
+        Args:
+            window: 滑动窗口长度（最近多少次）
+            alpha: 指数加权系数，越大越侧重最近几次
+            state: 已保存的状态（由 to_state 生成）
+            unit: 指标单位（'deg' 或 'ms'，决定直方图分箱和趋势阈值）
+        """
+        state = state or {}
+        self.unit = state.get("unit", unit)
+        self.window = state.get("window", window)
+        self.alpha = state.get("alpha", alpha)
+        self.count = state.get("count", 0)
+        self.mean = state.get("mean", 0.0)
+        self.m2 = state.get("m2", 0.0)
+        self.ewma = state.get("ewma")
+        self.abs_deviation_mean = state.get("abs_deviation_mean", 0.0)
+        self.abs_deviation_ewma = state.get("abs_deviation_ewma")
+        self.best_abs_deviation = state.get("best_abs_deviation")
+        self.recent = deque(state.get("recent", []), maxlen=self.window)
+        self.recent_sum = sum(self.recent)
+        self.histogram = state.get("histogram", [0] * (len(DEVIATION_BIN_EDGES[self.unit]) + 1))
+        self.first_at = state.get("first_at")
+        self.last_at = state.get("last_at")
+        self.last_value = state.get("last_value")
+
+    def update(self, value: float, deviation: Optional[float], created_at: str) -> None:
+        """
+        加入一次新的测量
+
+        Args:
+            value: 学员数值
+            deviation: 与模板的差（学员 - 模板），无模板值时为None
+            created_at: 分析时间
+        """
+        self.count += 1
+        # Welford 在线均值/方差
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_sum -= self.recent[0]
+        self.recent.append(value)
+        self.recent_sum += value
+
+        if deviation is not None:
+            abs_deviation = abs(deviation)
+            deviation_count = sum(self.histogram)
+            self.abs_deviation_mean += (abs_deviation - self.abs_deviation_mean) / (deviation_count + 1)
+            self.abs_deviation_ewma = (abs_deviation if self.abs_deviation_ewma is None else
+                                       self.alpha * abs_deviation + (1 - self.alpha) * self.abs_deviation_ewma)
+            if self.best_abs_deviation is None or abs_deviation < self.best_abs_deviation:
+                self.best_abs_deviation = abs_deviation
+            self.histogram[self._bin_index(deviation)] += 1
+
+        self.first_at = self.first_at or created_at
+        self.last_at = created_at
+        self.last_value = value
+
+    def _bin_index(self, deviation: float) -> int:
+        edges = DEVIATION_BIN_EDGES[self.unit]
+        for index, edge in enumerate(edges):
+            if deviation < edge:
+                return index
+        return len(edges)
+
+    @property
+    def std(self) -> float:
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    @property
+    def rolling_mean(self) -> Optional[float]:
+        return self.recent_sum / len(self.recent) if self.recent else None
+
+    @property
+    def trend(self) -> str:
+        """近期偏差（指数加权）相对历史平均偏差的变化：improving / declining / stable"""
+        if self.abs_deviation_ewma is None or sum(self.histogram) < 3:
+            return "stable"
+        change = self.abs_deviation_ewma - self.abs_deviation_mean
+        threshold = TREND_THRESHOLDS[self.unit]
+        if change < -threshold:
+            return "improving"
+        if change > threshold:
+            return "declining"
+        return "stable"
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "unit": self.unit, "window": self.window, "alpha": self.alpha, "count": self.count,
+            "mean": self.mean, "m2": self.m2,
+            "ewma": self.ewma, "abs_deviation_mean": self.abs_deviation_mean,
+            "abs_deviation_ewma": self.abs_deviation_ewma, "best_abs_deviation": self.best_abs_deviation,
+            "recent": list(self.recent), "histogram": self.histogram, "first_at": self.first_at,
+            "last_at": self.last_at, "last_value": self.last_value,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """面板展示用的统计结果"""
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "rolling_mean": self.rolling_mean,
+            "ewma": self.ewma,
+            "last_value": self.last_value,
+            "abs_deviation_mean": self.abs_deviation_mean,
+            "abs_deviation_ewma": self.abs_deviation_ewma,
+            "best_abs_deviation": self.best_abs_deviation,
+            "deviation_histogram": list(self.histogram),
+            "trend": self.trend,
+            "first_at": self.first_at,
+            "last_at": self.last_at,
+        }
+
+
+class ProgressTracker:
+    """
+    球员进步跟踪器（聚合结果保存在历史指标库的 progress_aggregates 表中）
+    """
+
+    def __init__(self, db_path: str = None, window: int = 10, alpha: float = 0.3):
+        """
+        初始化进步跟踪器
+
+        Args:
+            db_path: 数据库文件路径（默认与历史指标库相同，为 output/reports.db）
+            window: 滑动窗口长度
+            alpha: 指数加权系数
+        """
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.window = window
+        self.alpha = alpha
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(progress_aggregates)")]
+            if columns and "comparison_mode" not in columns:
+                # 旧版聚合没有区分对比方式；聚合可由历史指标库重新计算，直接重建表
+                self._conn.execute("DROP TABLE progress_aggregates")
+                print("进步统计表结构已更新，请运行 report_history_cli.py progress <球员> --rebuild 重新计算")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def update(self, report: Dict[str, Any], player: str, stroke_type: str,
+               created_at: datetime = None) -> List[Dict[str, Any]]:
+        """
+        用一次新的对比结果更新聚合（只读写本次涉及的聚合行）
+
+        Args:
+            report: 综合报告或对比结果
+            player: 球员名
+            stroke_type: 动作类型
+            created_at: 分析时间（默认为当前时间；按时间顺序调用时指数加权结果才准确）
+
+        Returns:
+            更新后的各指标统计 [{'comparison_mode', 'stage', 'metric', ...summary}]
+        """
+        created = (created_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        mode = comparison_mode_of(report)
+        metrics = [m for m in extract_stage_metrics(report) if m["user_value"] is not None]
+        updated = []
+        try:
+            with self._lock, self._conn:
+                for metric in metrics:
+                    key = (player, stroke_type, mode, metric["stage"], metric["metric"])
+                    row = self._conn.execute(
+                        "SELECT state FROM progress_aggregates WHERE player = ? AND stroke_type = ? "
+                        "AND comparison_mode = ? AND stage = ? AND metric = ?", key
+                    ).fetchone()
+                    stats = RunningStats(self.window, self.alpha, json.loads(row[0]) if row else None,
+                                         unit=metric_unit(metric["metric"]))
+                    stats.update(metric["user_value"], metric["difference"], created)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO progress_aggregates "
+                        "(player, stroke_type, comparison_mode, stage, metric, state, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        key + (json.dumps(stats.to_state()), created)
+                    )
+                    updated.append({"comparison_mode": mode, "stage": metric["stage"], "metric": metric["metric"],
+                                    **stats.summary()})
+        except sqlite3.Error as e:
+            raise Exception(f"更新进步统计失败: {e}")
+        return updated
+
+    def dashboard(self, player: str, stroke_type: str = None) -> List[Dict[str, Any]]:
+        """
+        读取球员的全部聚合统计（不访问历史记录）
+
+        Args:
+            player: 球员名
+            stroke_type: 动作类型（None表示全部）
+
+        Returns:
+            [{'stroke_type', 'comparison_mode', 'stage', 'metric', ...summary}]
+        """
+        query = ("SELECT stroke_type, comparison_mode, stage, metric, state FROM progress_aggregates "
+                 "WHERE player = ?")
+        params: List[Any] = [player]
+        if stroke_type is not None:
+            query += " AND stroke_type = ?"
+            params.append(stroke_type)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"stroke_type": row[0], "comparison_mode": row[1], "stage": row[2], "metric": row[3],
+             **RunningStats(state=json.loads(row[4]), unit=metric_unit(row[3])).summary()}
+            for row in rows
+        ]
+
+    def rebuild(self, store: ReportStore, player: str = None) -> int:
+        """
+        按时间顺序从历史指标库重新计算聚合（导入旧报告或修改窗口参数后使用）
+
+        Args:
+            store: 历史指标库
+            player: 只重建该球员（None表示全部）
+
+        Returns:
+            处理的指标记录数
+        """
+        aggregates: Dict[tuple, RunningStats] = {}
+        count = 0
+        for row in store.iter_metrics(player):
+            # 早期记录没有对比方式，单独归为 unknown，不与任一方式混合
+            key = (row["player"], row["stroke_type"], row["comparison_mode"] or "unknown", row["stage"], row["metric"])
+            if row["user_value"] is None:
+                continue
+            if key not in aggregates:
+                aggregates[key] = RunningStats(self.window, self.alpha, unit=metric_unit(row["metric"]))
+            aggregates[key].update(row["user_value"], row["difference"], row["created_at"])
+            count += 1
+        try:
+            with self._lock, self._conn:
+                if player is None:
+                    self._conn.execute("DELETE FROM progress_aggregates")
+                else:
+                    self._conn.execute("DELETE FROM progress_aggregates WHERE player = ?", (player,))
+                self._conn.executemany(
+                    "INSERT INTO progress_aggregates "
+                    "(player, stroke_type, comparison_mode, stage, metric, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [key + (json.dumps(stats.to_state()), stats.last_at) for key, stats in aggregates.items()]
+                )
+        except sqlite3.Error as e:
+            raise Exception(f"重建进步统计失败: {e}")
+        return count
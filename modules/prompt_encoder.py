@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词压缩编码器
+将原始landmarks时间线编码为紧凑的表格文本：坐标量化、丢弃低置信度关键点，
+并在发送前估算token数，保证每个请求不超过预算的同时覆盖整个时间线
+"""
+
+import json
+import math
+from typing import List, Dict, Any, Tuple
+
+
+class CompactPromptEncoder:
+    """
+    紧凑提示词编码器：把帧列表编码为 "time_ms,x,y,..." 形式的行表格
+    """
+
+    def __init__(self, coord_step: int = 4, min_confidence: float = 0.5,
+                 max_prompt_tokens: int = 6000):
+        """
+        初始化编码器
+
+        Args:
+            coord_step: 坐标量化步长（像素），坐标四舍五入到该步长的整数倍
+            min_confidence: 最低置信度，低于该值的关键点不写入表格
+            max_prompt_tokens: 单个请求允许的最大提示词token数
+        """
+        self.coord_step = max(1, int(coord_step))
+        self.min_confidence = min_confidence
+        self.max_prompt_tokens = max_prompt_tokens
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        估算文本的token数（无需分词器的保守估计）
+
+        中日韩字符按每字1个token计算，其余字符（数字、标点、英文）按每3个字符1个token计算。
+
+        Args:
+            text: 待估算的文本
+
+        Returns:
+            估算的token数
+        """
+        cjk_count = sum(1 for ch in text if ord(ch) > 0x2E7F)
+        other_count = len(text) - cjk_count
+        return cjk_count + math.ceil(other_count / 3)
+
+    def encode_template(self, template_data: Any) -> str:
+        """
+        以无缩进、无多余空格的形式序列化模板
+
+        Args:
+            template_data: 模板数据
+
+        Returns:
+            紧凑JSON字符串
+        """
+        return json.dumps(template_data, ensure_ascii=False, separators=(',', ':'))
+
+    def _quantize(self, value: float) -> int:
+        return int(round(value / self.coord_step) * self.coord_step)
+
+    def collect_landmark_ids(self, frames: List[Dict]) -> List[str]:
+        """
+        收集帧列表中出现过的关键点编号（按数值排序）
+
+        Args:
+            frames: 原始帧列表
+
+        Returns:
+            关键点编号字符串列表
+        """
+        ids = set()
+        for frame in frames:
+            ids.update(str(k) for k in frame.get('landmarks', {}).keys())
+        return sorted(ids, key=lambda k: int(k) if k.isdigit() else k)
+
+    def encode_header(self, landmark_ids: List[str]) -> str:
+        """
+        生成表头，如 "t,0x,0y,2x,2y"
+
+        Args:
+            landmark_ids: 关键点编号列表
+
+        Returns:
+            表头字符串
+        """
+        columns = ["t"]
+        for lid in landmark_ids:
+            columns.extend([f"{lid}x", f"{lid}y"])
+        return ",".join(columns)
+
+    def encode_row(self, frame: Dict, landmark_ids: List[str]) -> str:
+        """
+        将单帧编码为一行，缺失或低置信度的关键点留空
+
+        Args:
+            frame: 原始帧数据
+            landmark_ids: 列顺序对应的关键点编号
+
+        Returns:
+            逗号分隔的行文本（末尾的空列会被去掉）
+        """
+        landmarks = {str(k): v for k, v in frame.get('landmarks', {}).items()}
+        cells = [str(int(frame.get('time_ms', 0)))]
+        for lid in landmark_ids:
+            point = landmarks.get(lid)
+            if point and point.get('confidence', 1.0) >= self.min_confidence:
+                cells.append(str(self._quantize(point.get('x', 0))))
+                cells.append(str(self._quantize(point.get('y', 0))))
+            else:
+                cells.extend(["", ""])
+        return ",".join(cells).rstrip(",")
+
+    def encode_frames(self, frames: List[Dict], stride: int = 1) -> str:
+        """
+        按给定步长采样并编码帧列表（始终包含最后一帧）
+
+        Args:
+            frames: 原始帧列表
+            stride: 采样步长
+
+        Returns:
+            表头加数据行的多行文本
+        """
+        landmark_ids = self.collect_landmark_ids(frames)
+        rows = [self.encode_header(landmark_ids)]
+        rows.extend(self.encode_row(frames[i], landmark_ids) for i in self._sample_indices(len(frames), stride))
+        return "\n".join(rows)
+
+    def fit_frames(self, frames: List[Dict], reserved_tokens: int) -> Tuple[str, int, int]:
+        """
+        选择最小的采样步长，使帧表格与其余提示词合计不超过token预算
+
+        Args:
+            frames: 原始帧列表
+            reserved_tokens: 提示词中除帧表格以外部分的token数
+
+        Returns:
+            (帧表格文本, 采样步长, 表格token数)
+        """
+        if not frames:
+            return "", 1, 0
+
+        landmark_ids = self.collect_landmark_ids(frames)
+        header = self.encode_header(landmark_ids)
+        rows = [self.encode_row(frame, landmark_ids) for frame in frames]
+        row_tokens = [self.estimate_tokens(row) + 1 for row in rows]
+        header_tokens = self.estimate_tokens(header) + 1
+
+        available = self.max_prompt_tokens - reserved_tokens - header_tokens
+        # 预算不足时至少保留首尾两帧
+        stride = max(1, math.ceil(sum(row_tokens) / max(available, 1)))
+        while True:
+            indices = self._sample_indices(len(rows), stride)
+            table_tokens = header_tokens + sum(row_tokens[i] for i in indices)
+            if table_tokens + reserved_tokens <= self.max_prompt_tokens or len(indices) <= 2:
+                break
+            stride += 1
+
+        table = "\n".join([header] + [rows[i] for i in indices])
+        return table, stride, table_tokens
+
+    @staticmethod
+    def _sample_indices(length: int, stride: int) -> List[int]:
+        if length <= 0:
+            return []
+        indices = list(range(0, length, max(1, stride)))
+        if indices[-1] != length - 1:
+            indices.append(length - 1)
+        return indices
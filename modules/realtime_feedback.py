@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时逐帧动作反馈
+把阶段模板的 expected_values（各角度的 min/max/ideal）编译成规则，对实时关键点的滑动窗口均值逐帧判断；
+阶段识别是增量的：每帧只比较当前阶段和下一阶段，因此每帧开销为常数，30-60fps 的摄像头输入在CPU上也能跟上
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from modules.pose_features import compute_angles, ANGLE_DISPLAY_NAMES
+from modules.template_cache import load_compiled_template
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     "staged_templates", "击球动作模板.json")
+
+
+class RollingMean:
+    """
+    按时间窗口的滑动平均，维护累加和，每次更新均摊O(1)
+    """
+
+    def __init__(self, window_ms: float):
+        self.window_ms = window_ms
+        self._values = deque()
+        self._sum = 0.0
+
+    def push(self, time_ms: float, value: float) -> None:
+        self._values.append((time_ms, value))
+        self._sum += value
+        self.expire(time_ms)
+
+    def expire(self, now_ms: float) -> None:
+        while self._values and now_ms - self._values[0][0] > self.window_ms:
+            self._sum -= self._values.popleft()[1]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / len(self._values) if self._values else None
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._sum = 0.0
+
+
+class RealtimeFeedbackEngine:
+    """
+    实时反馈规则引擎
+    """
+
+    def __init__(self, template_path: str = None, stages: List[Dict[str, Any]] = None, side: str = "right",
+                 window_ms: float = 250, advance_frames: int = 3, persist_frames: int = 5,
+                 reset_ms: float = 2000):
+        """
+        初始化规则引擎
+
+        Args:
+            template_path: 阶段模板JSON路径（默认为 staged_templates/击球动作模板.json）
+            stages: 直接传入的阶段列表（优先于template_path）
+            side: 持拍手 ('right' 或 'left')
+            window_ms: 角度滑动平均窗口（毫秒），用于抑制关键点抖动
+            advance_frames: 下一阶段连续匹配更好多少帧后才切换阶段
+            persist_frames: 角度连续超出范围多少帧后才提示
+            reset_ms: 超过该时间未检测到姿态则回到第一阶段
+        """
+        if stages is None:
+            stages = self.load_template(template_path or DEFAULT_TEMPLATE_PATH)
+        self.side = side
+        self.window_ms = window_ms
+        self.advance_frames = advance_frames
+        self.persist_frames = persist_frames
+        self.reset_ms = reset_ms
+
+        # 规则编译: [(阶段名, [(角度名, min, max, ideal, 范围宽度), ...]), ...]
+        self.rules = []
+        for stage in stages:
+            checks = []
+            for angle_name, expected in stage.get("expected_values", {}).items():
+                if not isinstance(expected, dict) or "min" not in expected or "max" not in expected:
+                    continue
+                low, high = float(expected["min"]), float(expected["max"])
+                ideal = float(expected.get("ideal", (low + high) / 2))
+                checks.append((angle_name, low, high, ideal, max(high - low, 1.0)))
+            self.rules.append((stage.get("stage", f"阶段{len(self.rules) + 1}"), checks))
+        if not self.rules:
+            raise Exception("阶段模板中没有可用的 expected_values")
+
+        angle_names = {check[0] for _, checks in self.rules for check in checks}
+        self._windows = {name: RollingMean(window_ms) for name in angle_names}
+        self.reset()
+
+    @staticmethod
+    def load_template(template_path: str) -> List[Dict[str, Any]]:
+        """
+        读取阶段模板
+
+        Args:
+            template_path: 模板文件路径
+
+        Returns:
+            阶段列表
+        """
+        return load_compiled_template(template_path).stages
+
+    def reset(self) -> None:
+        """回到第一阶段并清空滑动窗口"""
+        for window in self._windows.values():
+            window.clear()
+        self.stage_index = 0
+        self._candidate = None
+        self._candidate_frames = 0
+        self._violation_frames = {}
+        self._last_seen_ms = None
+
+    def _stage_cost(self, stage_index: int, means: Dict[str, float]) -> Optional[float]:
+        """阶段与当前角度均值的匹配代价：超出范围的部分按范围宽度归一化，再加上与理想值的小权重距离"""
+        total, count = 0.0, 0
+        for angle_name, low, high, ideal, width in self.rules[stage_index][1]:
+            value = means.get(angle_name)
+            if value is None:
+                continue
+            outside = low - value if value < low else (value - high if value > high else 0.0)
+            total += outside / width + 0.1 * abs(value - ideal) / width
+            count += 1
+        return total / count if count else None
+
+    def _advance_stage(self, means: Dict[str, float]) -> None:
+        """增量阶段识别：只比较当前阶段与下一阶段（最后一个阶段之后回到第一阶段）"""
+        current_cost = self._stage_cost(self.stage_index, means)
+        next_index = (self.stage_index + 1) % len(self.rules)
+        next_cost = self._stage_cost(next_index, means)
+        if next_cost is None or (current_cost is not None and next_cost >= current_cost):
+            self._candidate, self._candidate_frames = None, 0
+            return
+
+        if self._candidate == next_index:
+            self._candidate_frames += 1
+        else:
+            self._candidate, self._candidate_frames = next_index, 1
+        if self._candidate_frames >= self.advance_frames:
+            self.stage_index = next_index
+            self._candidate, self._candidate_frames = None, 0
+            self._violation_frames = {}
+
+    def update(self, landmarks: Dict[Any, Dict[str, float]], time_ms: float = None) -> Dict[str, Any]:
+        """
+        输入一帧关键点，返回当前阶段和反馈
+
+        Args:
+            landmarks: 关键点字典 {index: {'x', 'y', 'confidence'}}
+            time_ms: 帧时间戳（毫秒），默认使用单调时钟
+
+        Returns:
+            {'stage', 'stage_index', 'angles', 'violations', 'messages', 'score'}
+        """
+        if time_ms is None:
+            time_ms = time.monotonic() * 1000
+
+        angles = compute_angles(landmarks, side=self.side)
+        if not angles:
+            if self._last_seen_ms is not None and time_ms - self._last_seen_ms > self.reset_ms:
+                self.reset()
+            return {"stage": self.rules[self.stage_index][0], "stage_index": self.stage_index,
+                    "angles": {}, "violations": [], "messages": ["画面中未检测到目标。"], "score": 0.0}
+        self._last_seen_ms = time_ms
+
+        means = {}
+        for angle_name, window in self._windows.items():
+            value = angles.get(angle_name)
+            if value is not None:
+                window.push(time_ms, value)
+            else:
+                window.expire(time_ms)
+            mean = window.mean
+            if mean is not None:
+                means[angle_name] = mean
+
+        self._advance_stage(means)
+        stage_name, checks = self.rules[self.stage_index]
+
+        violations = []
+        passed = evaluated = 0
+        for angle_name, low, high, ideal, _ in checks:
+            value = means.get(angle_name)
+            if value is None:
+                continue
+            evaluated += 1
+            if low <= value <= high:
+                passed += 1
+                self._violation_frames.pop(angle_name, None)
+                continue
+            frames = self._violation_frames.get(angle_name, 0) + 1
+            self._violation_frames[angle_name] = frames
+            if frames >= self.persist_frames:
+                violations.append({
+                    "angle": angle_name,
+                    "value": value,
+                    "min": low,
+                    "max": high,
+                    "ideal": ideal,
+                    "direction": "low" if value < low else "high",
+                })
+
+        if violations:
+            messages = [
+                f"✗ {ANGLE_DISPLAY_NAMES.get(v['angle'], v['angle'])}"
+                f"{'偏小' if v['direction'] == 'low' else '偏大'} {v['value']:.0f}°"
+                f"（{stage_name}标准 {v['min']:.0f}°-{v['max']:.0f}°）"
+                for v in violations
+            ]
+        else:
+            messages = [f"✓ {stage_name}：姿势符合标准"]
+
+        return {
+            "stage": stage_name,
+            "stage_index": self.stage_index,
+            "angles": means,
+            "violations": violations,
+            "messages": messages,
+            "score": passed / evaluated if evaluated else 0.0,
+        }
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史报告指标库
+每次对比完成后把逐阶段的角度/时长指标写入本地SQLite，按球员、日期、动作类型、阶段建立索引，
+趋势查询（如“近3个月击球/前挥阶段的肘部角度”）直接走索引，不需要重新打开大量报告JSON文件
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output", "reports.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player TEXT NOT NULL,
+    stroke_type TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    user_file TEXT,
+    template_file TEXT,
+    report_path TEXT,
+    critical_issues INTEGER NOT NULL DEFAULT 0,
+    comparison_mode TEXT,
+    classified_stroke_type TEXT,
+    classification_confidence REAL
+);
+CREATE TABLE IF NOT EXISTS stage_metrics (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    player TEXT NOT NULL,
+    stroke_type TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    user_value REAL,
+    template_value REAL,
+    difference REAL,
+    severity TEXT,
+    comparison_mode TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_player_date ON sessions(player, created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_stroke_date ON sessions(stroke_type, created_at);
+CREATE INDEX IF NOT EXISTS idx_metrics_trend ON stage_metrics(player, metric, stage, created_at);
+CREATE INDEX IF NOT EXISTS idx_metrics_squad ON stage_metrics(stroke_type, stage, metric, created_at);
+CREATE INDEX IF NOT EXISTS idx_metrics_session ON stage_metrics(session_id);
+"""
+
+# 对比方式的显示名：两种方式的角度含义不同（逐帧为阶段内的中位数，阶段值为 ideal），不能混在一起比较
+COMPARISON_MODE_LABELS = {"frames": "逐帧", "scalar": "阶段值"}
+
+
+def comparison_mode_of(report: Dict[str, Any]) -> str:
+    """
+    报告的对比方式
+
+    Args:
+        report: 综合报告或对比结果
+
+    Returns:
+        'frames' 或 'scalar'（早期报告没有该字段时，按角度详情中是否带有分布数据判断）
+    """
+    if report.get("comparison_mode"):
+        return report["comparison_mode"]
+    stages = report.get("stage_analysis") or report.get("stage_comparisons") or []
+    for stage in stages:
+        for detail in stage.get("angle_analysis", {}).get("angle_details", {}).values():
+            return "frames" if "user_distribution" in detail else "scalar"
+    return "scalar"
+
+
+def extract_stage_metrics(report: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    从综合报告（或 compare_stages 结果）中提取逐阶段指标
+
+    Args:
+        report: build_report 生成的报告（stage_analysis）或对比结果（stage_comparisons）
+
+    Returns:
+        [{'stage', 'metric', 'user_value', 'template_value', 'difference', 'severity'}]
+    """
+    stages = report.get("stage_analysis") or report.get("stage_comparisons") or []
+    metrics = []
+    for stage in stages:
+        stage_name = stage.get("stage_name", "未知阶段")
+        timing = stage.get("timing_analysis", {})
+        if "user_duration" in timing:
+            metrics.append({
+                "stage": stage_name,
+                "metric": "duration_ms",
+                "user_value": timing.get("user_duration"),
+                "template_value": timing.get("template_duration"),
+                "difference": timing.get("user_duration", 0) - timing.get("template_duration", 0),
+                "severity": None,
+            })
+        for angle_name, detail in stage.get("angle_analysis", {}).get("angle_details", {}).items():
+            user_value, template_value = detail.get("user_ideal"), detail.get("template_ideal")
+            metrics.append({
+                "stage": stage_name,
+                "metric": angle_name,
+                "user_value": user_value,
+                "template_value": template_value,
+                "difference": (user_value - template_value
+                               if user_value is not None and template_value is not None else None),
+                "severity": detail.get("severity"),
+            })
+    return metrics
+
+
+class ReportStore:
+    """
+    报告指标库（SQLite，单文件）
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        打开（或创建）指标库
+
+        Args:
+            db_path: 数据库文件路径（默认为 output/reports.db）
+        """
+        self.db_path = db_path or DEFAULT_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # 流水线在工作线程中写入，界面线程查询，连接加锁共享
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+            # 旧版指标库缺少的列补上后，已有记录为NULL（无法确定当时的对比方式和识别结果）
+            for table, column, column_type in (("sessions", "comparison_mode", "TEXT"),
+                                               ("stage_metrics", "comparison_mode", "TEXT"),
+                                               ("sessions", "classified_stroke_type", "TEXT"),
+                                               ("sessions", "classification_confidence", "REAL")):
+                columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def record_report(self, report: Dict[str, Any], player: str, stroke_type: str,
+                      created_at: datetime = None, report_path: str = None) -> int:
+        """
+        写入一次对比的全部阶段指标
+
+        Args:
+            report: 综合报告或对比结果
+            player: 球员名
+            stroke_type: 动作类型（对比所用的模板名；报告中的动作类型识别结果单独保存在会话中）
+            created_at: 分析时间（默认为当前时间）
+            report_path: 报告文件路径
+
+        Returns:
+            会话ID
+        """
+        created = (created_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        metrics = extract_stage_metrics(report)
+        mode = comparison_mode_of(report)
+        classification = report.get("stroke_classification") or {}
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO sessions (player, stroke_type, created_at, user_file, template_file, "
+                    "report_path, critical_issues, comparison_mode, classified_stroke_type, "
+                    "classification_confidence) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (player, stroke_type, created, report.get("user_file"), report.get("template_file"),
+                     report_path, len(report.get("critical_issues", [])), mode,
+                     classification.get("stroke_type"), classification.get("confidence"))
+                )
+                session_id = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT INTO stage_metrics (session_id, player, stroke_type, created_at, stage, metric, "
+                    "user_value, template_value, difference, severity, comparison_mode) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(session_id, player, stroke_type, created, m["stage"], m["metric"], m["user_value"],
+                      m["template_value"], m["difference"], m["severity"], mode) for m in metrics]
+                )
+        except sqlite3.Error as e:
+            raise Exception(f"写入报告指标失败: {e}")
+        return session_id
+
+    def import_report_files(self, paths: List[str], player: str, stroke_type: str) -> int:
+        """
+        导入已有的 advice_report_*.json 报告（分析时间取报告中的 analysis_timestamp）
+
+        Args:
+            paths: 报告JSON文件路径
+            player: 球员名
+            stroke_type: 动作类型
+
+        Returns:
+            成功导入的报告数
+        """
+        imported = 0
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    report = json.load(f)
+                created_at = datetime.strptime(report["analysis_timestamp"], "%Y-%m-%d %H:%M:%S") \
+                    if report.get("analysis_timestamp") else None
+            except Exception as e:
+                print(f"跳过无法读取的报告 {path}: {e}")
+                continue
+            self.record_report(report, player, stroke_type, created_at=created_at, report_path=path)
+            imported += 1
+        return imported
+
+    def trend(self, player: str, metric: str, stage: str = None, since: datetime = None,
+              until: datetime = None, stroke_type: str = None,
+              comparison_mode: str = None) -> List[Dict[str, Any]]:
+        """
+        查询某个球员某项指标随时间的变化
+
+        Args:
+            player: 球员名
+            metric: 指标名（角度名或 duration_ms）
+            stage: 阶段名（None表示所有阶段）
+            since: 起始时间
+            until: 截止时间
+            stroke_type: 动作类型
+            comparison_mode: 对比方式（'frames' 或 'scalar'；None表示全部，结果中带有各条记录的对比方式）
+
+        Returns:
+            按时间排序的 [{'created_at', 'stage', 'user_value', 'template_value', 'difference', 'severity',
+            'session_id', 'comparison_mode'}]
+        """
+        query = ("SELECT created_at, stage, user_value, template_value, difference, severity, session_id, "
+                 "comparison_mode FROM stage_metrics WHERE player = ? AND metric = ?")
+        params: List[Any] = [player, metric]
+        if stage is not None:
+            query += " AND stage = ?"
+            params.append(stage)
+        if comparison_mode is not None:
+            query += " AND comparison_mode = ?"
+            params.append(comparison_mode)
+        if stroke_type is not None:
+            query += " AND stroke_type = ?"
+            params.append(stroke_type)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since.strftime("%Y-%m-%d %H:%M:%S"))
+        if until is not None:
+            query += " AND created_at <= ?"
+            params.append(until.strftime("%Y-%m-%d %H:%M:%S"))
+        query += " ORDER BY created_at"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def recent_trend(self, player: str, metric: str, stage: str = None, days: int = 90,
+                     comparison_mode: str = None) -> List[Dict[str, Any]]:
+        """最近若干天的指标变化（trend 的便捷形式）"""
+        return self.trend(player, metric, stage, since=datetime.now() - timedelta(days=days),
+                          comparison_mode=comparison_mode)
+
+    def squad_summary(self, metric: str, stage: str, since: datetime = None,
+                      stroke_type: str = None, comparison_mode: str = None) -> List[Dict[str, Any]]:
+        """
+        全队某项指标的汇总（每个球员、每种对比方式的次数、平均值、平均偏差）
+
+        Returns:
+            [{'player', 'comparison_mode', 'sessions', 'avg_value', 'avg_difference', 'avg_abs_difference', 'last_at'}]
+        """
+        query = ("SELECT player, comparison_mode, COUNT(*) AS sessions, AVG(user_value) AS avg_value, "
+                 "AVG(difference) AS avg_difference, AVG(ABS(difference)) AS avg_abs_difference, "
+                 "MAX(created_at) AS last_at FROM stage_metrics WHERE metric = ? AND stage = ?")
+        params: List[Any] = [metric, stage]
+        if stroke_type is not None:
+            query += " AND stroke_type = ?"
+            params.append(stroke_type)
+        if comparison_mode is not None:
+            query += " AND comparison_mode = ?"
+            params.append(comparison_mode)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since.strftime("%Y-%m-%d %H:%M:%S"))
+        # 两种对比方式的角度含义不同，分别汇总
+        query += " GROUP BY player, comparison_mode ORDER BY avg_abs_difference DESC"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def iter_metrics(self, player: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间顺序遍历指标记录
+
+        Args:
+            player: 只遍历该球员（None表示全部）
+
+        Returns:
+            指标记录的迭代器
+        """
+        query = ("SELECT player, stroke_type, created_at, stage, metric, user_value, template_value, "
+                 "difference, severity, comparison_mode FROM stage_metrics")
+        params: List[Any] = []
+        if player is not None:
+            query += " WHERE player = ?"
+            params.append(player)
+        query += " ORDER BY created_at, session_id"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            yield dict(row)
+
+    def players(self) -> List[str]:
+        """所有球员名"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT player FROM sessions ORDER BY player")]
+
+    def session(self, session_id: int) -> Optional[Dict[str, Any]]:
+        """读取一次会话的基本信息"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动作类型识别
+学员时间线与 staged_templates/ 中的阶段模板、templates/ 中的标准动作时间线逐一比较：
+角度序列按时间重采样为固定长度（阶段模板按各阶段的起止时间展开到同一时间网格），去掉各角度的均值后
+做DTW（反对角线向量化），多个模板在进程池中并行打分，在详细对比之前给出最匹配的动作类型和置信度
+"""
+
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from modules.pose_features import timeline_to_arrays, compute_angle_arrays
+from modules.template_cache import load_compiled_template
+from modules.timeline_writer import load_timeline
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGED_TEMPLATE_DIR = os.path.join(PROJECT_DIR, "staged_templates")
+REFERENCE_TEMPLATE_DIR = os.path.join(PROJECT_DIR, "templates")
+
+CLASSIFY_FEATURES = ("elbow_angle", "shoulder_angle", "hip_angle", "knee_angle", "body_lean", "body_rotation")
+# 各角度的归一化尺度（度），所有候选模板共用；手臂关节活动范围大，尺度也更大
+FEATURE_SCALES = {"elbow_angle": 20.0, "shoulder_angle": 20.0, "hip_angle": 10.0, "knee_angle": 10.0,
+                  "body_lean": 10.0, "body_rotation": 10.0}
+DEFAULT_FEATURE_SCALE = 15.0
+
+# 工作进程内的标准动作特征缓存: {路径|角度|区间数: (文件签名, 特征矩阵)}
+_reference_cache: Dict[str, Tuple[Tuple[int, int], np.ndarray]] = {}
+
+
+def find_templates(staged_dir: str = None, reference_dir: str = None) -> List[str]:
+    """
+    查找全部候选模板
+
+    Args:
+        staged_dir: 阶段模板目录（跳过学员生成的 staged_* 和 advice_report_* 文件）
+        reference_dir: 标准动作时间线目录（*.analysis_data.json / *.analysis_data.jsonl）
+
+    Returns:
+        模板文件路径列表
+    """
+    paths = []
+    for path in sorted(glob.glob(os.path.join(staged_dir or STAGED_TEMPLATE_DIR, "*.json"))):
+        name = os.path.basename(path)
+        if not name.startswith(("staged_", "advice_report_")):
+            paths.append(path)
+    for pattern in ("*.analysis_data.json", "*.analysis_data.jsonl"):
+        paths.extend(sorted(glob.glob(os.path.join(reference_dir or REFERENCE_TEMPLATE_DIR, pattern))))
+    return paths
+
+
+def stroke_type_for(template_path: str) -> str:
+    """模板对应的动作类型名（文件名去掉扩展名和 .analysis_data 后缀）"""
+    name = os.path.basename(template_path)
+    for suffix in (".analysis_data.jsonl", ".analysis_data.json", ".json"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return os.path.splitext(name)[0]
+
+
+def resample_features(times: np.ndarray, angle_arrays: Dict[str, np.ndarray],
+                      features: Sequence[str], num_bins: int) -> np.ndarray:
+    """
+    按时间等分为固定数量的区间，每个区间取各角度的均值
+
+    Args:
+        times: (帧数,) 时间戳
+        angle_arrays: compute_angle_arrays 的结果
+        features: 角度名顺序
+        num_bins: 区间数
+
+    Returns:
+        (num_bins, 角度数) 矩阵，没有有效帧的区间为NaN
+    """
+    values = np.column_stack([angle_arrays.get(name, np.full(len(times), np.nan)) for name in features])
+    if len(times) == 0:
+        return np.full((num_bins, len(features)), np.nan)
+    span = max(times[-1] - times[0], 1e-9)
+    bins = np.minimum(((times - times[0]) / span * num_bins).astype(int), num_bins - 1)
+    valid = ~np.isnan(values)
+    total = np.zeros((num_bins, len(features)))
+    count = np.zeros((num_bins, len(features)))
+    np.add.at(total, bins, np.where(valid, values, 0.0))
+    np.add.at(count, bins, valid)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def timeline_features(frames: List[Dict[str, Any]], features: Sequence[str] = CLASSIFY_FEATURES,
+                      num_bins: int = 64, side: str = "right") -> np.ndarray:
+    """时间线 → 重采样后的角度特征矩阵"""
+    times, points = timeline_to_arrays(frames)
+    return resample_features(times, compute_angle_arrays(points, side), features, num_bins)
+
+
+def bin_offsets(times: np.ndarray, num_bins: int) -> np.ndarray:
+    """resample_features 各区间中心相对第一帧的时间（毫秒）"""
+    span = times[-1] - times[0] if len(times) else 0.0
+    return (np.arange(num_bins) + 0.5) / num_bins * span
+
+
+def feature_scale(features: Sequence[str]) -> np.ndarray:
+    """各角度的归一化尺度"""
+    return np.array([FEATURE_SCALES.get(name, DEFAULT_FEATURE_SCALE) for name in features])
+
+
+def center_features(matrix: np.ndarray) -> np.ndarray:
+    """每个角度减去自身的均值，只比较动作形态（机位和体型带来的整体偏移不计入代价）"""
+    valid = np.isfinite(matrix).any(axis=0)
+    offset = np.zeros(matrix.shape[1])
+    offset[valid] = np.nanmean(matrix[:, valid], axis=0)
+    return matrix - offset
+
+
+def expand_stages(template, features: Sequence[str], offsets_ms: np.ndarray) -> np.ndarray:
+    """
+    阶段模板展开到学员的时间网格：每个时间点取所在阶段（阶段之间的空隙取前一阶段）的 ideal 值
+
+    Args:
+        template: CompiledTemplate
+        features: 角度名顺序
+        offsets_ms: 时间点相对动作开始的毫秒数（bin_offsets 的结果）
+
+    Returns:
+        (时间点数, 角度数) 矩阵
+    """
+    if not template.stages:
+        return np.full((len(offsets_ms), len(features)), np.nan)
+    columns = [template.angle_names.index(name) if name in template.angle_names else None for name in features]
+    ideal = np.column_stack([template.ideal[:, c] if c is not None else np.full(len(template.stages), np.nan)
+                             for c in columns])
+    times = template.start_ms.min() + offsets_ms
+    index = np.clip(np.searchsorted(template.start_ms, times, side='right') - 1, 0, len(template.stages) - 1)
+    return ideal[index]
+
+
+def dtw_cost(query: np.ndarray, reference: np.ndarray, scale: np.ndarray) -> float:
+    """
+    两个特征序列的DTW平均代价
+
+    Args:
+        query: (N, 角度数)
+        reference: (M, 角度数)
+        scale: (角度数,) 归一化尺度
+
+    Returns:
+        累计代价除以 N + M；逐元素差按尺度归一化，缺失的角度不参与平均，完全缺失的位置代价为1
+    """
+    diff = np.abs(query[:, None, :] - reference[None, :, :]) / scale
+    valid = ~np.isnan(diff)
+    count = valid.sum(axis=2)
+    local = np.where(count > 0, np.where(valid, diff, 0.0).sum(axis=2) / np.maximum(count, 1), 1.0)
+
+    n, m = local.shape
+    acc = np.full((n + 1, m + 1), np.inf)
+    acc[0, 0] = 0.0
+    # 同一反对角线上的格子互不依赖，整条对角线一次计算
+    for diagonal in range(2, n + m + 1):
+        i = np.arange(max(1, diagonal - m), min(n, diagonal - 1) + 1)
+        j = diagonal - i
+        acc[i, j] = local[i - 1, j - 1] + np.minimum(np.minimum(acc[i - 1, j - 1], acc[i - 1, j]), acc[i, j - 1])
+    return float(acc[n, m] / (n + m))
+
+
+def _reference_features(template_path: str, features: Sequence[str], offsets_ms: np.ndarray) -> np.ndarray:
+    """模板 → 特征矩阵；阶段模板按阶段窗口展开到学员的时间网格，标准时间线按时间重采样为同样长度"""
+    if not template_path.endswith((".analysis_data.json", ".analysis_data.jsonl")):
+        # 编译结果由 template_cache 按文件签名缓存，展开依赖学员的时间网格，每次重新计算
+        return expand_stages(load_compiled_template(template_path), features, offsets_ms)
+
+    stat = os.stat(template_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cache_key = f"{template_path}|{','.join(features)}|{len(offsets_ms)}"
+    cached = _reference_cache.get(cache_key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    matrix = timeline_features(load_timeline(template_path), features, len(offsets_ms))
+    _reference_cache[cache_key] = (signature, matrix)
+    return matrix
+
+
+def score_template(template_path: str, query: np.ndarray, scale: np.ndarray, features: Sequence[str],
+                   offsets_ms: np.ndarray) -> Dict[str, Any]:
+    """
+    学员特征与单个模板的匹配代价（进程池中执行）
+
+    Args:
+        template_path: 模板文件路径
+        query: 学员特征矩阵（已经过 center_features）
+        scale: 各角度的归一化尺度（所有模板相同）
+        features: 角度名顺序
+        offsets_ms: 学员特征各区间中心相对动作开始的毫秒数
+
+    Returns:
+        {'template_path', 'stroke_type', 'cost'}；模板无法读取时 cost 为None并附带 error
+    """
+    try:
+        reference = _reference_features(template_path, features, offsets_ms)
+        cost = dtw_cost(query, center_features(reference), scale)
+        return {"template_path": template_path, "stroke_type": stroke_type_for(template_path), "cost": cost}
+    except Exception as e:
+        return {"template_path": template_path, "stroke_type": stroke_type_for(template_path),
+                "cost": None, "error": str(e)}
+
+
+class StrokeClassifier:
+    """
+    多模板动作类型识别器（进程池在多次识别之间复用，工作进程内缓存模板特征）
+    """
+
+    def __init__(self, template_paths: Sequence[str] = None, features: Sequence[str] = CLASSIFY_FEATURES,
+                 num_bins: int = 64, side: str = "right", max_workers: int = None, temperature: float = 0.1):
+        """
+        初始化识别器
+
+        Args:
+            template_paths: 候选模板（默认为 find_templates() 的结果）
+            features: 参与匹配的角度名
+            num_bins: 时间线重采样长度
+            side: 持拍手 ('right' 或 'left')
+            max_workers: 进程数（0 表示在当前进程中依次打分）
+            temperature: 置信度 softmax 的温度，越小越偏向代价最低的模板
+        """
+        self.template_paths = list(template_paths) if template_paths is not None else find_templates()
+        self.features = tuple(features)
+        self.num_bins = num_bins
+        self.side = side
+        self.max_workers = max_workers
+        self.temperature = temperature
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            workers = self.max_workers or min(len(self.template_paths), os.cpu_count() or 1)
+            self._executor = ProcessPoolExecutor(max_workers=max(workers, 1))
+        return self._executor
+
+    def classify(self, timeline: Union[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        识别学员动作最匹配的模板
+
+        Args:
+            timeline: 学员时间线或其文件路径
+
+        Returns:
+            {'stroke_type', 'template_path', 'confidence', 'scores': [{'template_path', 'stroke_type', 'cost', 'confidence'}]}，
+            scores 按代价从低到高排列
+        """
+        if not self.template_paths:
+            raise Exception("动作类型识别失败: 没有可用的模板")
+        frames = load_timeline(timeline) if isinstance(timeline, str) else timeline
+        times, points = timeline_to_arrays(frames)
+        query = center_features(resample_features(times, compute_angle_arrays(points, self.side),
+                                                  self.features, self.num_bins))
+        scale = feature_scale(self.features)
+        offsets_ms = bin_offsets(times, self.num_bins)
+
+        count = len(self.template_paths)
+        if self.max_workers == 0:
+            scores = [score_template(path, query, scale, self.features, offsets_ms) for path in self.template_paths]
+        else:
+            scores = list(self._get_executor().map(score_template, self.template_paths, [query] * count,
+                                                   [scale] * count, [self.features] * count,
+                                                   [offsets_ms] * count))
+
+        for score in scores:
+            if score.get("error"):
+                print(f"模板打分失败 {score['template_path']}: {score['error']}")
+        valid = sorted([s for s in scores if s["cost"] is not None], key=lambda s: s["cost"])
+        if not valid:
+            raise Exception("动作类型识别失败: 所有模板均无法打分")
+        costs = np.array([s["cost"] for s in valid])
+        weights = np.exp(-(costs - costs[0]) / self.temperature)
+        for score, weight in zip(valid, weights / weights.sum()):
+            score["confidence"] = float(weight)
+
+        best = valid[0]
+        return {
+            "stroke_type": best["stroke_type"],
+            "template_path": best["template_path"],
+            "confidence": best["confidence"],
+            "scores": valid,
+        }
+
+    def close(self) -> None:
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段模板缓存
+模板文件解析后编译为固定结构（阶段边界、各角度 min/max/ideal 数组），按文件路径在进程内共享，
+文件修改时间或大小变化时自动重新加载；逐帧对比用到的标准动作角度分布也随模板一起缓存
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.pose_features import timeline_to_arrays, compute_angle_arrays, stage_angle_distributions
+from modules.timeline_writer import load_timeline
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CompiledTemplate:
+    """
+    编译后的阶段模板（只读，多个 ActionAdvisor / 实时引擎共享同一个实例）
+    """
+
+    def __init__(self, path: str, stages: List[Dict[str, Any]], signature: Tuple[int, int] = None):
+        """
+        编译阶段模板
+
+        Args:
+            path: 模板文件路径（临时编译的阶段列表为None）
+            stages: 阶段列表（原始JSON结构，调用方不得修改）
+            signature: 文件签名 (修改时间, 大小)
+        """
+        self.path = path
+        self.signature = signature
+        self.stages = stages
+        self.stage_names = [stage.get("stage", "未知阶段") for stage in stages]
+        self.start_ms = np.array([stage.get("start_ms", 0) for stage in stages], dtype=float)
+        self.end_ms = np.array([stage.get("end_ms", 0) for stage in stages], dtype=float)
+
+        # 按首次出现的顺序排列，逐阶段对比时问题列表与模板文件中的顺序一致
+        self.angle_names = list(dict.fromkeys(
+            angle_name
+            for stage in stages
+            for angle_name, expected in stage.get("expected_values", {}).items()
+            if isinstance(expected, dict)
+        ))
+        # (阶段数, 角度数)，缺失为NaN
+        shape = (len(stages), len(self.angle_names))
+        self.ideal, self.min, self.max = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+        for row, stage in enumerate(stages):
+            for col, angle_name in enumerate(self.angle_names):
+                expected = stage.get("expected_values", {}).get(angle_name)
+                if isinstance(expected, dict):
+                    self.ideal[row, col] = expected.get("ideal", np.nan)
+                    self.min[row, col] = expected.get("min", np.nan)
+                    self.max[row, col] = expected.get("max", np.nan)
+
+        self._lock = threading.Lock()
+        self._distributions: Dict[str, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = {}
+
+    def frame_distributions(self, reference_path: str) -> List[Dict[str, Any]]:
+        """
+        标准动作时间线在本模板各阶段窗口内的角度分布（按时间线文件签名缓存）
+
+        Args:
+            reference_path: 标准动作的逐帧时间线
+
+        Returns:
+            stage_angle_distributions 的结果
+        """
+        reference_path = os.path.abspath(reference_path)
+        signature = _file_signature(reference_path)
+        with self._lock:
+            cached = self._distributions.get(reference_path)
+            if cached and cached[0] == signature:
+                return cached[1]
+        times, points = timeline_to_arrays(load_timeline(reference_path))
+        distributions = stage_angle_distributions(times, compute_angle_arrays(points), self.stages)
+        with self._lock:
+            self._distributions[reference_path] = (signature, distributions)
+        return distributions
+
+
+_cache: Dict[str, CompiledTemplate] = {}
+_cache_lock = threading.Lock()
+
+
+def load_compiled_template(template_path: str) -> CompiledTemplate:
+    """
+    读取编译后的阶段模板（进程内缓存，文件变化时重新加载）
+
+    Args:
+        template_path: 模板文件路径（阶段列表，或带 stages 字段的对象）
+
+    Returns:
+        CompiledTemplate
+    """
+    path = os.path.abspath(template_path)
+    try:
+        signature = _file_signature(path)
+    except OSError as e:
+        raise Exception(f"加载阶段模板失败 {template_path}: {e}")
+
+    with _cache_lock:
+        template = _cache.get(path)
+    if template is not None and template.signature == signature:
+        return template
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        raise Exception(f"加载阶段模板失败 {template_path}: {e}")
+    stages = data.get("stages", []) if isinstance(data, dict) else data
+    template = CompiledTemplate(path, stages, signature)
+    with _cache_lock:
+        _cache[path] = template
+    return template
+
+
+def clear_template_cache(template_path: Optional[str] = None) -> None:
+    """清空模板缓存（指定路径时只移除该模板）"""
+    with _cache_lock:
+        if template_path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(template_path), None)
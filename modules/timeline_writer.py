@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式时间线读写
+检测结果按帧以JSON Lines追加写入磁盘，每攒满一个分块刷新一次，结束时追加一行索引；
+内存中只保留当前分块，分析进行中其他程序也能读取已写入的部分
+
+文件格式（.analysis_data.jsonl）:
+    {"time_ms": 33, "landmarks": {...}}        每帧一行
+    ...
+    {"__index__": {"frames": N, "chunks": [[首帧time_ms, 字节偏移, 帧数], ...]}}   结束时写入
+"""
+
+import os
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+from modules.perf_trace import get_tracer
+
+INDEX_KEY = "__index__"
+FORMAT_VERSION = 1
+
+
+class TimelineWriter:
+    """
+    时间线追加写入器
+    """
+
+    def __init__(self, path: str, chunk_frames: int = 100):
+        """
+        初始化写入器（覆盖已有文件）
+
+        Args:
+            path: 输出文件路径（.jsonl）
+            chunk_frames: 每个分块的帧数，攒满后写入并刷新到磁盘
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+        self._chunks: List[List[int]] = []
+        self._buffer: List[Dict[str, Any]] = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """
+        追加一帧
+
+        Args:
+            entry: 时间线条目 {'time_ms', 'landmarks'}
+        """
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.chunk_frames:
+            self.flush()
+
+    def extend(self, entries) -> None:
+        """追加多帧"""
+        for entry in entries:
+            self.append(entry)
+
+    def flush(self) -> None:
+        """把当前分块写入磁盘"""
+        if not self._buffer or self._file is None:
+            return
+        with get_tracer().span("json_save", frames=len(self._buffer)):
+            offset = self._file.tell()
+            data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self._buffer)
+            self._file.write(data.encode('utf-8'))
+            self._file.flush()
+        self._chunks.append([self._buffer[0].get('time_ms', 0), offset, len(self._buffer)])
+        self.frames += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        """写入剩余帧和索引行并关闭文件"""
+        if self._file is None:
+            return
+        self.flush()
+        index = {INDEX_KEY: {"version": FORMAT_VERSION, "frames": self.frames, "chunks": self._chunks}}
+        self._file.write((json.dumps(index) + "\n").encode('utf-8'))
+        self._file.close()
+        self._file = None
+
+    def abort(self) -> None:
+        """写入已缓冲的帧后关闭文件，不写索引（文件保持可读的部分结果）"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+def read_index(path: str) -> Optional[Dict[str, Any]]:
+    """
+    读取文件末尾的索引行
+
+    Args:
+        path: .jsonl 时间线文件
+
+    Returns:
+        索引字典；文件仍在写入或被中断时返回None
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return None
+        # 从末尾向前找到最后一行
+        block = 4096
+        position = size
+        tail = b""
+        while position > 0:
+            step = min(block, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            if tail.rstrip(b"\n").count(b"\n") >= 1:
+                break
+    last_line = tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+    try:
+        data = json.loads(last_line.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data.get(INDEX_KEY) if isinstance(data, dict) else None
+
+
+def iter_timeline(path: str, start_ms: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐帧读取时间线（跳过索引行，以及正在写入的不完整末行）
+
+    Args:
+        path: .jsonl 时间线文件
+        start_ms: 只返回 time_ms >= start_ms 的帧；有索引时直接定位到对应分块
+
+    Yields:
+        时间线条目
+    """
+    offset = 0
+    if start_ms is not None:
+        index = read_index(path)
+        if index:
+            for first_ms, chunk_offset, _ in index.get("chunks", []):
+                if first_ms > start_ms:
+                    break
+                offset = chunk_offset
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                # 写入中的最后一行
+                break
+            try:
+                entry = json.loads(raw_line.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                continue
+            if INDEX_KEY in entry:
+                continue
+            if start_ms is not None and entry.get('time_ms', 0) < start_ms:
+                continue
+            yield entry
+
+
+def load_timeline(path: str) -> List[Dict[str, Any]]:
+    """
+    读取完整时间线，兼容 .jsonl 流式格式和旧的 .json 数组格式
+
+    Args:
+        path: 时间线文件路径
+
+    Returns:
+        时间线条目列表
+    """
+    if path.endswith(".jsonl"):
+        return list(iter_timeline(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频分析流水线阶段
+视频解码+姿态检测（时间线流式写入磁盘）→ 阶段化 → 对比 → AI建议 → 生成报告，
+每个阶段是可独立调度的函数，Tk界面和命令行共用同一套实现
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+
+import cv2
+
+from modules.pose_detector import PoseDetector
+from modules.analysis_checkpoint import AnalysisCheckpoint
+from modules.timeline_writer import TimelineWriter, iter_timeline, load_timeline
+from modules.player_tracker import PlayerTracker, draw_player_ids
+from modules.landmark_cache import LandmarkResultCache
+from modules.file_hash import hash_file
+from modules.json_converter import JsonConverter
+from modules.action_advisor import ActionAdvisor
+from modules.report_store import ReportStore
+from modules.progress_tracker import ProgressTracker
+from modules.stroke_classifier import StrokeClassifier
+from modules.pipeline_scheduler import PipelineTask
+from modules.perf_trace import get_tracer
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_DIR, "output")
+DEFAULT_STAGED_DIR = os.path.join(PROJECT_DIR, "staged_templates")
+DEFAULT_TEMPLATE_PATH = os.path.join(DEFAULT_STAGED_DIR, "击球动作模板.json")
+# 默认阶段模板对应的标准动作逐帧数据，用于逐帧分布对比
+DEFAULT_REFERENCE_TIMELINE_PATH = os.path.join(PROJECT_DIR, "templates", "击球动作连续.mp4.analysis_data.json")
+
+
+def build_context(video_path: str, device: str = "cpu", api_key: str = "",
+                  output_dir: str = None, staged_dir: str = None,
+                  template_path: str = None, num_poses: int = 1,
+                  reference_timeline_path: str = None, player: str = "默认球员",
+                  stroke_type: str = None, report_store_path: str = None, **callbacks) -> Dict[str, Any]:
+    """
+    构建流水线初始上下文
+
+    Args:
+        video_path: 视频文件路径
+        device: 推理设备（cpu/gpu）
+        api_key: 大模型API密钥
+        output_dir: 原始分析数据和报告的输出目录
+        staged_dir: 阶段化数据输出目录
+        template_path: 标准模板路径
+        num_poses: 单帧最多检测的人数，大于1时跟踪每个球员并额外输出每人一个时间线
+        reference_timeline_path: 标准动作的逐帧时间线；提供（或使用默认模板）时按逐帧角度分布对比，
+            否则只对比阶段化数据中的 ideal 数值
+        player: 球员名（写入历史指标库）
+        stroke_type: 动作类型（默认取对比所用的模板文件名；动作类型识别的结果另行记录）
+        report_store_path: 历史指标库路径（默认为 output/reports.db）
+        **callbacks: 可选回调 frame_callback(处理后的帧, 帧序号)、status_callback、streaming_callback
+
+    Returns:
+        上下文字典
+    """
+    context = {
+        "video_path": video_path,
+        "detector_config": {
+            "model_type": "mediapipe",
+            "device": device,
+            "min_detection_confidence": 0.2,
+            "frame_stride": 1,  # 每隔多少帧检测一次
+        },
+        "api_key": api_key,
+        "output_dir": output_dir or DEFAULT_OUTPUT_DIR,
+        "staged_dir": staged_dir or DEFAULT_STAGED_DIR,
+        "template_path": template_path or DEFAULT_TEMPLATE_PATH,
+        "reference_timeline_path": reference_timeline_path or (
+            DEFAULT_REFERENCE_TIMELINE_PATH if template_path is None else None),
+        "player": player,
+        "stroke_type": stroke_type or os.path.splitext(os.path.basename(template_path or DEFAULT_TEMPLATE_PATH))[0],
+        "report_store_path": report_store_path,
+    }
+    if num_poses > 1:
+        # 单人时不写入该项，保持已有检查点和检测缓存的键不变
+        context["detector_config"]["num_poses"] = num_poses
+    context.update(callbacks)
+    return context
+
+
+def timeline_path_for(output_dir: str, video_path: str) -> str:
+    """原始landmarks时间线的输出路径"""
+    return os.path.join(output_dir, f"{os.path.basename(video_path)}.analysis_data.jsonl")
+
+
+def player_timeline_path_for(output_dir: str, video_path: str, player_id) -> str:
+    """多人模式下单个球员的时间线输出路径"""
+    return os.path.join(output_dir, f"{os.path.basename(video_path)}.player{player_id}.analysis_data.jsonl")
+
+
+def split_player_timelines(timeline_path: str, output_dir: str, video_path: str,
+                           min_frames: int = 10) -> Dict[str, str]:
+    """
+    把主时间线中每帧的 players 字段拆分为每个球员一个时间线文件（流式读写，一次遍历）
+
+    Args:
+        timeline_path: 多人模式的主时间线
+        output_dir: 输出目录
+        video_path: 视频路径（用于命名）
+        min_frames: 出现帧数少于该值的轨迹视为误检，不输出
+
+    Returns:
+        {球员编号: 时间线路径}
+    """
+    writers = {}
+    try:
+        for entry in iter_timeline(timeline_path):
+            for player_id, landmarks in entry.get("players", {}).items():
+                writer = writers.get(player_id)
+                if writer is None:
+                    writer = writers[player_id] = TimelineWriter(
+                        player_timeline_path_for(output_dir, video_path, player_id))
+                writer.append({"time_ms": entry["time_ms"], "landmarks": landmarks})
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    paths = {}
+    for player_id, writer in sorted(writers.items(), key=lambda item: int(item[0])):
+        if writer.frames >= min_frames:
+            paths[player_id] = writer.path
+        else:
+            os.remove(writer.path)
+    return paths
+
+
+def detector_fingerprint(detector_config: Dict[str, Any]) -> Dict[str, Any]:
+    """检测器配置加上本地模型文件的哈希，模型文件更新后旧的检测结果不再复用"""
+    model_path = PoseDetector.resolve_model_path(detector_config.get("model_type", "mediapipe"))
+    return dict(detector_config, model_hash=hash_file(model_path) if model_path else None)
+
+
+def detect_landmarks(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """
+    阶段：视频解码 + 姿态检测
+
+    每帧结果直接追加到 output 目录下的 .analysis_data.jsonl 时间线文件，内存中只保留当前分块；
+    同时定期写入检查点，同一视频（内容和检测器配置相同）再次分析时从最后处理的帧继续；
+    完整检测过的视频直接从检测结果缓存复制时间线，不再运行检测。
+    多人模式（num_poses > 1）下同一次推理得到所有人，按外接框跟踪球员编号：
+    主时间线的 landmarks 为主球员，players 字段保存全部球员，结束后再拆分为每人一个时间线。
+    取消或出错时已写入的部分时间线路径保存在 context["partial_timeline_path"] 中
+    """
+    config = context["detector_config"]
+    num_poses = int(config.get("num_poses", 1))
+    fingerprint = detector_fingerprint(config)
+    analysis_json_path = timeline_path_for(context["output_dir"], context["video_path"])
+
+    result_cache = LandmarkResultCache()
+    cache_key = LandmarkResultCache.make_key(hash_file(context["video_path"]), fingerprint)
+    cached = result_cache.get(cache_key, analysis_json_path)
+    if cached:
+        context["landmark_cache_hit"] = True
+        task.report_progress(100, "使用缓存的检测结果")
+        player_paths = (split_player_timelines(analysis_json_path, context["output_dir"], context["video_path"])
+                        if num_poses > 1 else {})
+        return dict(cached, analysis_json_path=analysis_json_path, player_timeline_paths=player_paths)
+
+    pose_detector = PoseDetector(model_type=config.get("model_type", "mediapipe"),
+                                 min_detection_confidence=config.get("min_detection_confidence", 0.2),
+                                 device=config.get("device", "cpu"),
+                                 num_poses=num_poses)
+    if pose_detector.initialization_error:
+        raise Exception(pose_detector.initialization_error)
+
+    cap = cv2.VideoCapture(context["video_path"])
+    if not cap.isOpened():
+        raise Exception("无法打开视频文件")
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frame_callback = context.get("frame_callback")
+    frame_stride = max(1, int(config.get("frame_stride", 1)))
+
+    writer = TimelineWriter(analysis_json_path)
+    context["partial_timeline_path"] = analysis_json_path
+    tracker = PlayerTracker() if num_poses > 1 else None
+
+    checkpoint = AnalysisCheckpoint(context["video_path"], fingerprint)
+    frame_count = checkpoint.load()
+    if frame_count:
+        # 把检查点中已有的帧逐块写入新的时间线文件
+        last_entry = None
+        for entry in checkpoint.iter_entries():
+            writer.append(entry)
+            last_entry = entry
+        writer.flush()
+        if tracker and last_entry:
+            # 用断点前最后一帧的球员位置恢复跟踪，保持编号连续
+            tracker.seed(last_entry.get("players", {}))
+        # 按时间定位到断点，再逐帧补齐定位误差（关键帧对齐可能落在断点之前）
+        cap.set(cv2.CAP_PROP_POS_MSEC, frame_count * 1000.0 / fps)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position <= 0 or position > frame_count:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            position = 0
+        while position < frame_count and cap.grab():
+            position += 1
+        context["resumed_from_frame"] = frame_count
+        print(f"从检查点继续分析: 第 {frame_count} 帧，已有 {writer.frames} 帧姿态数据")
+
+    tracer = get_tracer()
+    last_reported = -1
+    completed = False
+    try:
+        while cap.isOpened():
+            task.raise_if_cancelled()
+            decode_start = time.perf_counter_ns()
+            if not cap.grab():
+                break
+
+            frame_count += 1
+            # 按采样间隔跳过的帧只解码头部，不解码图像
+            if (frame_count - 1) % frame_stride:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            tracer.record("decode", decode_start)
+            timestamp_ms = int(frame_count * (1000 / fps))
+
+            # 姿态检测
+            if tracker:
+                processed_frame, poses = pose_detector.detect_poses(frame, timestamp_ms=timestamp_ms)
+                players = tracker.update(poses)
+                draw_player_ids(processed_frame, players, tracker.primary_id)
+                landmarks = players.get(tracker.primary_id, {})
+            else:
+                processed_frame, landmarks = pose_detector.detect_pose(frame, timestamp_ms=timestamp_ms)
+            entry = {'time_ms': timestamp_ms, 'landmarks': landmarks} if landmarks else None
+            if entry and tracker:
+                entry['players'] = {str(player_id): lm for player_id, lm in players.items()}
+            if entry:
+                writer.append(entry)
+            checkpoint.record(frame_count, entry)
+
+            # 第一帧和之后每3帧回调一次预览
+            if frame_callback and (frame_count == 1 or frame_count % 3 == 0):
+                frame_callback(processed_frame, frame_count)
+
+            # 进度按整数百分比变化上报，避免事件过多
+            if total_frames > 0:
+                percent = int(frame_count * 100 / total_frames)
+                if percent != last_reported:
+                    last_reported = percent
+                    task.report_progress(percent, f"{frame_count}/{total_frames} 帧")
+        completed = True
+    finally:
+        cap.release()
+        checkpoint.flush()
+        if completed:
+            writer.close()
+        else:
+            writer.abort()
+
+    # 完整分析结束后检查点不再需要
+    checkpoint.discard()
+    if not writer.frames:
+        raise Exception("视频中未检测到任何姿态数据")
+
+    meta = {
+        "fps": fps,
+        "total_frames": total_frames,
+        "processed_frames": frame_count,
+        "detected_frames": writer.frames,
+    }
+    result_cache.put(cache_key, analysis_json_path, meta)
+    player_paths = (split_player_timelines(analysis_json_path, context["output_dir"], context["video_path"])
+                    if tracker else {})
+    return dict(meta, analysis_json_path=analysis_json_path, player_timeline_paths=player_paths)
+
+
+def segment_stages(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：调用大模型将时间线划分为动作阶段"""
+    converter = JsonConverter(
+        output_dir=context["output_dir"],
+        staged_dir=context["staged_dir"],
+        template_path=context["template_path"]
+    )
+    converter.api_key = context["api_key"]
+    staged_path = converter.convert_to_staged_format(context["analysis_json_path"])
+    if not staged_path:
+        raise Exception("阶段化转换失败")
+    return {"staged_path": staged_path}
+
+
+_stroke_classifier = None
+_stroke_classifier_lock = threading.Lock()
+
+
+def get_stroke_classifier() -> StrokeClassifier:
+    """进程内共享的动作类型识别器（进程池和模板特征在多个视频之间复用）"""
+    global _stroke_classifier
+    with _stroke_classifier_lock:
+        if _stroke_classifier is None:
+            _stroke_classifier = StrokeClassifier()
+        return _stroke_classifier
+
+
+def classify_stroke(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：与全部模板比较，识别最匹配的动作类型"""
+    return {"stroke_classification": get_stroke_classifier().classify(context["analysis_json_path"])}
+
+
+def compare_with_template(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：与标准模板逐阶段对比（有标准动作时间线时按各阶段内全部帧的角度分布对比）"""
+    advisor = ActionAdvisor(staged_dir=context["staged_dir"], response_cache=False)
+    user_data = advisor.load_json_data(context["staged_path"])
+    template = advisor.load_template(context["template_path"])
+    template_data = template.stages
+    reference_path = context.get("reference_timeline_path")
+    if reference_path and os.path.exists(reference_path):
+        # 标准动作的角度分布随编译模板缓存，多个视频只计算一次
+        comparison = advisor.compare_stages_by_frames(
+            load_timeline(context["analysis_json_path"]), user_data,
+            None, template_data, template_distributions=template.frame_distributions(reference_path)
+        )
+    else:
+        comparison = advisor.compare_stages(user_data, template)
+    if context.get("stroke_classification"):
+        comparison["stroke_classification"] = context["stroke_classification"]
+    return {
+        "comparison": comparison,
+        "user_data": user_data,
+        "template_data": template_data,
+    }
+
+
+def generate_advice(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：流式生成AI建议并构建综合报告"""
+    advisor = ActionAdvisor(
+        staged_dir=context["staged_dir"],
+        status_callback=context.get("status_callback"),
+        streaming_callback=context.get("streaming_callback")
+    )
+    if context["api_key"]:
+        advisor.api_key = context["api_key"]
+    task.add_cancel_callback(advisor.cancel_streaming)
+
+    llm_response = advisor._generate_llm_advice_streaming(
+        context["comparison"], context["user_data"], context["template_data"]
+    )
+    task.raise_if_cancelled()
+    # 有问题的阶段再并发各生成一段针对性建议
+    stage_advice = advisor.generate_stage_advice_concurrently(context["comparison"])
+    task.raise_if_cancelled()
+    report = advisor.build_report(context["comparison"], llm_response,
+                                  context["staged_path"], context["template_path"])
+    report["stage_llm_advice"] = stage_advice
+    return {"report": report}
+
+
+def write_report_text(report: Dict[str, Any], video_filename: str, report_filepath: str) -> None:
+    """
+    将综合报告写为文本文件
+
+    Args:
+        report: 综合建议报告
+        video_filename: 视频文件名
+        report_filepath: 输出文件路径
+    """
+    with open(report_filepath, 'w', encoding='utf-8') as f:
+        f.write("羽毛球动作智能分析报告\n")
+        f.write("=" * 50 + "\n")
+        f.write(f"视频文件: {video_filename}\n")
+        f.write(f"分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+        # 详细建议
+        detailed_suggestions = report.get('detailed_suggestions', [])
+        if detailed_suggestions:
+            f.write("具体改进建议:\n")
+            f.write("-" * 30 + "\n")
+            for i, suggestion in enumerate(detailed_suggestions, 1):
+                f.write(f"{i}. {suggestion}\n\n")
+
+        # LLM增强建议
+        llm_advice = report.get('llm_enhanced_advice', '')
+        if llm_advice:
+            f.write("AI智能建议:\n")
+            f.write("-" * 20 + "\n")
+            f.write(f"{llm_advice}\n\n")
+
+        # 分阶段建议
+        stage_advice = report.get('stage_llm_advice') or {}
+        if stage_advice:
+            f.write("分阶段建议:\n")
+            f.write("-" * 20 + "\n")
+            for stage_name, advice in stage_advice.items():
+                f.write(f"【{stage_name}】\n{advice}\n\n")
+
+
+def render_report(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：生成文本报告"""
+    output_dir = context["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    video_filename = os.path.basename(context["video_path"])
+    report_path = os.path.join(output_dir, f"{video_filename}.analysis_report.txt")
+    with get_tracer().span("report_save"):
+        write_report_text(context["report"], video_filename, report_path)
+    return {"report_path": report_path}
+
+
+def record_metrics(context: Dict[str, Any], task) -> Dict[str, Any]:
+    """阶段：将逐阶段指标写入历史指标库，并增量更新球员进步统计"""
+    created_at = datetime.now()
+    store = ReportStore(context.get("report_store_path"))
+    try:
+        session_id = store.record_report(context["report"], context["player"], context["stroke_type"],
+                                         created_at=created_at, report_path=context["report_path"])
+    finally:
+        store.close()
+    tracker = ProgressTracker(context.get("report_store_path"))
+    try:
+        progress = tracker.update(context["report"], context["player"], context["stroke_type"],
+                                  created_at=created_at)
+    finally:
+        tracker.close()
+    return {"metrics_session_id": session_id, "progress": progress}
+
+
+def build_video_pipeline(include_advice: bool = True) -> List[PipelineTask]:
+    """
+    构建视频分析流水线
+
+    Args:
+        include_advice: 是否包含对比、AI建议和报告阶段（False时只做到阶段化）
+
+    Returns:
+        阶段列表
+    """
+    tasks = [
+        # 姿态检测占用CPU/GPU，同一时间只运行一个；其余阶段可与其他视频的检测并发
+        PipelineTask("detect", detect_landmarks,
+                     inputs=["video_path", "detector_config", "output_dir"],
+                     outputs=["analysis_json_path", "fps", "total_frames", "processed_frames",
+                              "detected_frames", "player_timeline_paths"],
+                     weight=60.0, max_concurrency=1),
+        PipelineTask("segment", segment_stages,
+                     inputs=["analysis_json_path", "api_key", "output_dir", "staged_dir", "template_path"],
+                     outputs=["staged_path"], weight=20.0),
+    ]
+    if include_advice:
+        tasks += [
+            # 动作类型识别与阶段化并行，在详细对比之前完成
+            PipelineTask("classify", classify_stroke,
+                         inputs=["analysis_json_path"],
+                         outputs=["stroke_classification"], weight=1.0),
+            PipelineTask("compare", compare_with_template,
+                         inputs=["staged_path", "analysis_json_path", "template_path", "staged_dir",
+                                 "stroke_classification"],
+                         outputs=["comparison", "user_data", "template_data"], weight=0.5),
+            # 流式建议共用同一个显示区域，同一时间只生成一份
+            PipelineTask("advice", generate_advice,
+                         inputs=["comparison", "user_data", "template_data", "api_key",
+                                 "staged_path", "template_path", "staged_dir"],
+                         outputs=["report"], weight=30.0, max_concurrency=1),
+            PipelineTask("render_report", render_report,
+                         inputs=["report", "video_path", "output_dir"],
+                         outputs=["report_path"], weight=0.5),
+            PipelineTask("record_metrics", record_metrics,
+                         inputs=["report", "report_path", "player", "stroke_type"],
+                         outputs=["metrics_session_id", "progress"], weight=0.5),
+        ]
+    return tasks
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线回放测试工具
+在进程内启动本地大模型替身服务器，端到端运行 JsonConverter 阶段化 和 ActionAdvisor 流式建议，
+统计耗时、首token时间和吞吐，可选并发压测或直接启动Tk界面
+
+用法:
+    python offline_replay.py                       # 单次端到端回放
+    python offline_replay.py --concurrency 8       # 8路并发生成建议
+    python offline_replay.py --ui                  # 使用替身服务器启动主界面
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_stub_server import StubLLMServer, PROJECT_DIR
+from modules.llm_settings import API_URL_ENV_VAR
+from modules.json_converter import JsonConverter
+from modules.action_advisor import ActionAdvisor
+
+
+def run_staging(api_url, raw_json_path, staged_dir):
+    """运行阶段化转换并返回 (输出路径, 耗时秒)"""
+    converter = JsonConverter(
+        output_dir=os.path.dirname(raw_json_path),
+        staged_dir=staged_dir,
+        template_path=os.path.join(PROJECT_DIR, "staged_templates", "击球动作模板.json"),
+        response_cache=False,
+        api_url=api_url
+    )
+    start = time.perf_counter()
+    output_path = converter.convert_to_staged_format(raw_json_path)
+    return output_path, time.perf_counter() - start
+
+
+def run_advice(api_url, staged_path, template_path):
+    """运行一次流式建议生成并返回统计信息"""
+    stats = {"chunks": 0, "chars": 0, "first_token_s": None}
+    start = time.perf_counter()
+
+    def on_chunk(content):
+        # 忽略ActionAdvisor在请求前发送的占位提示
+        if content.startswith("🤖 AI教练正在思考中"):
+            return
+        if stats["first_token_s"] is None:
+            stats["first_token_s"] = time.perf_counter() - start
+        stats["chunks"] += 1
+        stats["chars"] += len(content)
+
+    advisor = ActionAdvisor(
+        staged_dir=os.path.dirname(staged_path),
+        streaming_callback=on_chunk,
+        response_cache=False,
+        api_url=api_url
+    )
+    advisor.api_key = advisor.api_key or "offline-stub"
+    report = advisor.generate_comprehensive_advice(staged_path, template_path)
+    stats["total_s"] = time.perf_counter() - start
+    stats["error"] = report.get("error")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放测试（本地替身大模型）")
+    parser.add_argument("--input", default=os.path.join(PROJECT_DIR, "templates", "击球动作连续.mp4.analysis_data.json"),
+                        help="原始landmarks时间线JSON")
+    parser.add_argument("--recordings", default=None, help="录制响应目录（默认使用内置响应）")
+    parser.add_argument("--latency-ms", type=float, default=200, help="替身服务器首token延迟（毫秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=50, help="替身服务器生成速率（token/秒）")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发建议生成数")
+    parser.add_argument("--ui", action="store_true", help="使用替身服务器启动Tk主界面")
+    args = parser.parse_args()
+
+    server = StubLLMServer(port=0, recordings_dir=args.recordings,
+                           latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec).start()
+    print(f"替身服务器: {server.url}")
+
+    try:
+        if args.ui:
+            os.environ[API_URL_ENV_VAR] = server.url
+            from main import main as run_ui
+            run_ui()
+            return
+
+        staged_dir = tempfile.mkdtemp(prefix="offline_replay_")
+        staged_path, staging_s = run_staging(server.url, args.input, staged_dir)
+        print(f"阶段化转换: {staging_s:.2f}s -> {os.path.basename(staged_path)}")
+
+        template_path = os.path.join(PROJECT_DIR, "staged_templates", "击球动作模板.json")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(run_advice, server.url, staged_path, template_path)
+                       for _ in range(args.concurrency)]
+            results = [f.result() for f in futures]
+        wall_s = time.perf_counter() - start
+
+        for i, stats in enumerate(results, 1):
+            first = f"{stats['first_token_s']:.2f}s" if stats["first_token_s"] is not None else "-"
+            rate = stats["chars"] / stats["total_s"] if stats["total_s"] else 0
+            status = f"错误: {stats['error']}" if stats["error"] else "成功"
+            print(f"建议生成 #{i}: 总耗时 {stats['total_s']:.2f}s, 首token {first}, "
+                  f"{stats['chunks']} 个分片, {rate:.0f} 字符/秒, {status}")
+        print(f"并发 {args.concurrency} 路总耗时: {wall_s:.2f}s，服务器共收到 {server.request_count} 个请求")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无界面批量处理工具
+使用与Tk界面相同的流水线调度器处理一个或多个视频，输出各阶段耗时
+
+用法:
+    python pipeline_cli.py video1.mp4 video2.mp4
+    python pipeline_cli.py videos/*.mp4 --device gpu --workers 3
+    python pipeline_cli.py video.mp4 --no-advice      # 只做检测和阶段化
+    python pipeline_cli.py doubles.mp4 --players 4    # 双打视频：跟踪4名球员，每人输出一个时间线
+    python pipeline_cli.py video.mp4 --player 张三     # 指标按球员写入 output/reports.db
+    python pipeline_cli.py video.mp4 --trace trace.json  # 导出Chrome追踪文件并打印各环节耗时
+    python pipeline_cli.py videos/*.mp4 --metrics-port 9464  # 处理期间在 /metrics 导出Prometheus指标
+"""
+
+import os
+import sys
+import time
+import argparse
+import configparser
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.pipeline_scheduler import PipelineScheduler
+from modules.video_pipeline import build_video_pipeline, build_context, DEFAULT_OUTPUT_DIR
+from modules.perf_trace import get_tracer, SPAN_LABELS
+from modules.metrics_exporter import MetricsExporter
+
+
+def load_api_key() -> str:
+    """读取API密钥：环境变量 VOLCENGINE_API_KEY 优先，其次 config.ini"""
+    api_key = os.environ.get('VOLCENGINE_API_KEY', '').strip()
+    if api_key:
+        return api_key
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini'), encoding='utf-8')
+    return config.get('API', 'key', fallback='').strip()
+
+
+def print_perf_stats(stats) -> None:
+    """打印各环节耗时统计"""
+    print(f"{'环节':<16} {'次数':>7} {'平均(ms)':>10} {'P95(ms)':>10} {'合计(s)':>9}")
+    for name, item in sorted(stats.items()):
+        if "mean_ms" in item:
+            print(f"{SPAN_LABELS.get(name, name):<16} {item['count']:>7} {item['mean_ms']:>10.2f} "
+                  f"{item['p95_ms']:>10.2f} {item['total_ms'] / 1000:>9.2f}")
+        else:
+            print(f"{SPAN_LABELS.get(name, name):<16} {item['count']:>7} {item['mean']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="羽毛球视频批量分析（无界面）")
+    parser.add_argument("videos", nargs="+", help="视频文件路径")
+    parser.add_argument("--device", default="cpu", choices=["cpu", "gpu"], help="推理设备")
+    parser.add_argument("--workers", type=int, default=2, help="工作线程数")
+    parser.add_argument("--players", type=int, default=1, help="单帧最多检测的人数（大于1时按球员输出时间线）")
+    parser.add_argument("--player", default="默认球员", help="球员名（写入历史指标库，用于趋势查询）")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="输出目录")
+    parser.add_argument("--no-advice", action="store_true", help="跳过对比、AI建议和报告阶段")
+    parser.add_argument("--trace", help="导出Chrome追踪文件（chrome://tracing / ui.perfetto.dev）")
+    parser.add_argument("--metrics-port", type=int, help="在该端口导出Prometheus指标（/metrics）")
+    parser.add_argument("--metrics-file", help="定期把Prometheus指标写入该文件（端口不可用时默认写入 output/metrics.prom）")
+    args = parser.parse_args()
+
+    api_key = load_api_key()
+    if not api_key:
+        print("警告: 未配置API密钥，阶段化和AI建议将失败")
+
+    def on_event(run, event, task_name):
+        if event == "task_started":
+            print(f"[{run.name}] {task_name} 开始")
+        elif event == "task_done":
+            print(f"[{run.name}] {task_name} 完成 {run.timings[task_name]:.2f}s (总进度 {run.progress:.0f}%)")
+        elif event == "run_failed":
+            print(f"[{run.name}] 失败: {run.error}")
+
+    scheduler = PipelineScheduler(build_video_pipeline(include_advice=not args.no_advice),
+                                  max_workers=args.workers, on_event=on_event)
+    exporter = None
+    if args.metrics_port or args.metrics_file:
+        exporter = MetricsExporter(port=args.metrics_port, file_path=args.metrics_file).start()
+
+    start = time.perf_counter()
+    runs = []
+    for video_path in args.videos:
+        context = build_context(os.path.abspath(video_path), device=args.device,
+                                api_key=api_key, output_dir=args.output_dir, num_poses=args.players,
+                                player=args.player)
+        runs.append(scheduler.submit(os.path.basename(video_path), context))
+
+    failed = 0
+    try:
+        for run in runs:
+            try:
+                context = run.wait()
+                outputs = [context.get(key) for key in ("analysis_json_path", "staged_path", "report_path")]
+                print(f"[{run.name}] 完成: {run.summary()}")
+                classification = context.get("stroke_classification")
+                if classification:
+                    print(f"    最接近的动作模板: {classification['stroke_type']}（置信度 {classification['confidence']:.0%}），"
+                          f"历史记录归类: {context['stroke_type']}")
+                outputs.extend(context.get("player_timeline_paths", {}).values())
+                for path in outputs:
+                    if path:
+                        print(f"    {path}")
+            except Exception:
+                failed += 1
+    except KeyboardInterrupt:
+        print("用户中断，正在取消...")
+        scheduler.cancel_all()
+        failed = len(runs)
+    finally:
+        scheduler.shutdown()
+        if exporter:
+            exporter.stop()
+
+    print(f"共 {len(runs)} 个视频，失败 {failed} 个，总耗时 {time.perf_counter() - start:.2f}s")
+    if args.trace:
+        print_perf_stats(get_tracer().stats())
+        print(f"追踪文件: {get_tracer().export_chrome_trace(args.trace)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
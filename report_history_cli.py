@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史指标查询工具
+查询 output/reports.db 中按球员、阶段记录的角度/时长指标，或把已有的报告JSON导入指标库
+
+用法:
+    python report_history_cli.py trend 张三 elbow_angle --stage 击球/前挥 --days 90 --mode frames
+    python report_history_cli.py squad elbow_angle 击球/前挥 --days 30
+    python report_history_cli.py progress 张三
+    python report_history_cli.py progress 张三 --rebuild
+    python report_history_cli.py import staged_templates/advice_report_*.json --player 张三
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from modules.report_store import ReportStore, COMPARISON_MODE_LABELS
+from modules.progress_tracker import ProgressTracker
+from modules.pose_features import ANGLE_DISPLAY_NAMES
+
+
+def _fmt(value, digits=1):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def _mode(value):
+    return COMPARISON_MODE_LABELS.get(value, "未知")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询历史动作指标")
+    parser.add_argument("--db", help="指标库路径（默认为 output/reports.db）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    trend_parser = subparsers.add_parser("trend", help="某个球员某项指标随时间的变化")
+    trend_parser.add_argument("player", help="球员名")
+    trend_parser.add_argument("metric", help="指标名（如 elbow_angle、duration_ms）")
+    trend_parser.add_argument("--stage", help="阶段名（默认所有阶段）")
+    trend_parser.add_argument("--days", type=int, default=90, help="最近多少天")
+    trend_parser.add_argument("--mode", choices=sorted(COMPARISON_MODE_LABELS),
+                              help="只看该对比方式（frames: 逐帧中位数，scalar: 阶段 ideal 值；默认全部）")
+
+    squad_parser = subparsers.add_parser("squad", help="全队某阶段某项指标的汇总")
+    squad_parser.add_argument("metric", help="指标名")
+    squad_parser.add_argument("stage", help="阶段名")
+    squad_parser.add_argument("--days", type=int, default=90, help="最近多少天")
+    squad_parser.add_argument("--mode", choices=sorted(COMPARISON_MODE_LABELS),
+                              help="只看该对比方式（默认按方式分别汇总）")
+
+    progress_parser = subparsers.add_parser("progress", help="球员各阶段各指标的累计进步统计")
+    progress_parser.add_argument("player", help="球员名")
+    progress_parser.add_argument("--stroke-type", help="动作类型（默认全部）")
+    progress_parser.add_argument("--rebuild", action="store_true", help="先按历史记录重新计算该球员的累计统计")
+
+    import_parser = subparsers.add_parser("import", help="导入已有的 advice_report_*.json")
+    import_parser.add_argument("reports", nargs="+", help="报告JSON文件")
+    import_parser.add_argument("--player", default="默认球员", help="球员名")
+    import_parser.add_argument("--stroke-type", default="击球动作模板", help="动作类型")
+    args = parser.parse_args()
+
+    store = ReportStore(args.db)
+    tracker = ProgressTracker(args.db)
+    try:
+        if args.command == "trend":
+            rows = store.trend(args.player, args.metric, args.stage,
+                               since=datetime.now() - timedelta(days=args.days), comparison_mode=args.mode)
+            print(f"{args.player} - {ANGLE_DISPLAY_NAMES.get(args.metric, args.metric)}（最近 {args.days} 天）")
+            print(f"{'时间':<20} {'阶段':<10} {'方式':<6} {'学员':>8} {'模板':>8} {'差异':>8}  严重程度")
+            for row in rows:
+                print(f"{row['created_at']:<20} {row['stage']:<10} {_mode(row['comparison_mode']):<6} "
+                      f"{_fmt(row['user_value']):>8} {_fmt(row['template_value']):>8} {_fmt(row['difference']):>8}  "
+                      f"{row['severity'] or '-'}")
+            print(f"共 {len(rows)} 条记录")
+        elif args.command == "squad":
+            rows = store.squad_summary(args.metric, args.stage, since=datetime.now() - timedelta(days=args.days),
+                                       comparison_mode=args.mode)
+            print(f"{args.stage} - {ANGLE_DISPLAY_NAMES.get(args.metric, args.metric)}（最近 {args.days} 天）")
+            print(f"{'球员':<12} {'方式':<6} {'次数':>6} {'平均值':>8} {'平均差异':>8} {'平均绝对差':>10}  最近一次")
+            for row in rows:
+                print(f"{row['player']:<12} {_mode(row['comparison_mode']):<6} {row['sessions']:>6} "
+                      f"{_fmt(row['avg_value']):>8} {_fmt(row['avg_difference']):>8} "
+                      f"{_fmt(row['avg_abs_difference']):>10}  {row['last_at']}")
+        elif args.command == "progress":
+            if args.rebuild:
+                tracker.rebuild(store, args.player)
+            trend_labels = {"improving": "进步", "declining": "退步", "stable": "平稳"}
+            print(f"{'阶段':<10} {'方式':<6} {'指标':<12} {'次数':>4} {'最近值':>8} {'滑动均值':>8} {'加权均值':>8} "
+                  f"{'近期偏差':>8} {'平均偏差':>8}  趋势")
+            for row in tracker.dashboard(args.player, args.stroke_type):
+                print(f"{row['stage']:<10} {_mode(row['comparison_mode']):<6} "
+                      f"{ANGLE_DISPLAY_NAMES.get(row['metric'], row['metric']):<12} "
+                      f"{row['count']:>4} {_fmt(row['last_value']):>8} {_fmt(row['rolling_mean']):>8} "
+                      f"{_fmt(row['ewma']):>8} {_fmt(row['abs_deviation_ewma']):>8} "
+                      f"{_fmt(row['abs_deviation_mean']):>8}  {trend_labels[row['trend']]}")
+        else:
+            imported = store.import_report_files(args.reports, args.player, args.stroke_type)
+            # 导入的报告时间可能早于已有记录，按时间顺序重建该球员的累计统计
+            tracker.rebuild(store, args.player)
+            print(f"已导入 {imported}/{len(args.reports)} 份报告到 {store.db_path}")
+    finally:
+        store.close()
+        tracker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,88 +2,44 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import cv2
 from PIL import Image, ImageTk
-import threading
 import os
-import json
 import numpy as np
 import sys
 from datetime import datetime
 import configparser
-from html.parser import HTMLParser
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from modules.pose_detector import PoseDetector
-from modules.pose_analyzer import PoseAnalyzer
-from modules.json_converter import JsonConverter
-from modules.action_advisor import ActionAdvisor
-
-class MarkdownHTMLParser(HTMLParser):
-    """HTML解析器，用于将HTML渲染到tkinter Text组件"""
-    
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-        self.tag_stack = []
-        self.in_list = False
-        self.list_level = 0
-        
-    def handle_starttag(self, tag, attrs):
-        if tag in ['h1', 'h2', 'h3']:
-            self.tag_stack.append(tag)
-        elif tag == 'strong' or tag == 'b':
-            self.tag_stack.append('bold')
-        elif tag == 'em' or tag == 'i':
-            self.tag_stack.append('italic')
-        elif tag == 'code':
-            self.tag_stack.append('code')
-        elif tag in ['ul', 'ol']:
-            self.in_list = True
-            self.list_level += 1
-            if self.text_widget.get("end-2c", "end-1c") != "\n":
-                self.text_widget.insert(tk.END, "\n")
-        elif tag == 'li':
-            if self.in_list:
-                # 添加适当的缩进
-                indent = "  " * (self.list_level - 1)
-                self.text_widget.insert(tk.END, f"{indent}• ", "list_bullet")
-            self.tag_stack.append('list_item')
-        elif tag == 'br':
-            self.text_widget.insert(tk.END, "\n")
-        elif tag in ['p', 'div']:
-            if self.text_widget.get("end-2c", "end-1c") != "\n":
-                self.text_widget.insert(tk.END, "\n")
-    
-    def handle_endtag(self, tag):
-        if tag in ['h1', 'h2', 'h3', 'strong', 'b', 'em', 'i', 'code', 'li']:
-            if self.tag_stack:
-                self.tag_stack.pop()
-        elif tag in ['ul', 'ol']:
-            self.in_list = False if self.list_level == 1 else True
-            self.list_level = max(0, self.list_level - 1)
-            self.text_widget.insert(tk.END, "\n")
-        if tag in ['p', 'div', 'li', 'h1', 'h2', 'h3']:
-            self.text_widget.insert(tk.END, "\n")
-    
-    def handle_data(self, data):
-        if self.tag_stack:
-            current_tag = self.tag_stack[-1]
-            self.text_widget.insert(tk.END, data, current_tag)
-        else:
-            self.text_widget.insert(tk.END, data, "content")
+from modules.pipeline_scheduler import PipelineScheduler
+from modules.video_pipeline import build_video_pipeline, build_context
+from modules.live_capture import LiveSession
+from modules.realtime_feedback import RealtimeFeedbackEngine
+from modules.online_dtw import LiveTemplateAligner
+from modules.pose_features import ANGLE_DISPLAY_NAMES
+from modules.perf_trace import get_tracer, SPAN_LABELS
+from modules.metrics_exporter import exporter_from_config
+from ui.streaming_sink import StreamingTextSink
+from ui.markdown_renderer import IncrementalMarkdownRenderer
 
 class MainWindow:
+    # 流水线阶段的显示名
+    STAGE_LABELS = {
+        "detect": "姿态检测",
+        "segment": "阶段化转换",
+        "classify": "动作类型识别",
+        "compare": "模板对比",
+        "advice": "AI智能建议",
+        "render_report": "生成报告",
+        "record_metrics": "写入历史指标",
+    }
+
     def __init__(self, root):
         """初始化主窗口"""
         self.root = root
         self.root.title("羽毛球接球姿态分析与教练系统")
         self.root.geometry("1200x800")
         
-        # 将检测器和分析器的初始化推迟到 start_detection
-        self.pose_detector = None
-        self.pose_analyzer = None
-        
         # 视频相关变量
         self.cap = None
         self.is_camera = True
@@ -95,18 +51,47 @@ class MainWindow:
         # 线程相关
         self.thread = None
         
-        # 初始化UI
-        self.init_ui()
+        # 实时摄像头会话（采集线程 + 推理线程，界面按固定间隔轮询最新结果）
+        self.live_session = None
+        self.live_poll_interval_ms = 15
+        
+        # 性能统计面板的刷新间隔
+        self.tracer = get_tracer()
+        self.perf_refresh_interval_ms = 1000
         
-        # 新增变量用于视频文件分析
-        self.all_landmarks_timeline = []
-        self.processed_frames = 0
-        self.total_frames = 0
-        self.fps = 30  # 默认 FPS
+        # 视频处理流水线（检测 → 保存 → 阶段化 → 对比 → AI建议 → 报告）在后台调度，
+        # 多个视频可排队，事件通过root.after回到Tk主线程
+        self.pipeline_scheduler = PipelineScheduler(
+            build_video_pipeline(), max_workers=2,
+            on_event=self._on_pipeline_event,
+            dispatcher=lambda callback: self.root.after(0, callback)
+        )
         
-        # 新增变量用于保存最近分析的JSON文件路径
-        self.last_json_path = None
+        # 运行指标导出（config.ini 的 [metrics] 中配置了端口或文件时开启）
+        try:
+            self.metrics_exporter = exporter_from_config()
+        except Exception as e:
+            self.metrics_exporter = None
+            print(f"指标导出配置无效，已忽略: {e}")
         
+        # 初始化UI
+        self.init_ui()
+
+        # 关闭窗口时停止摄像头、流水线和指标导出线程
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        """关闭窗口：释放后台资源后销毁主窗口"""
+        try:
+            self.stop_live_camera()
+            self.pipeline_scheduler.shutdown()
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+        except Exception as e:
+            print(f"关闭后台任务失败: {e}")
+        finally:
+            self.root.destroy()
+
     def init_ui(self):
         """初始化用户界面"""
         # 主框架
@@ -149,6 +134,13 @@ class MainWindow:
                                    values=["CPU", "GPU"], width=8, state="readonly")
         self.device_combo.pack(side=tk.LEFT, padx=5)
         
+        # 检测人数（双打/多人训练时大于1，每个球员单独输出时间线）
+        ttk.Label(video_inner_frame, text="检测人数:").pack(side=tk.LEFT, padx=(10, 5))
+        self.num_poses_var = tk.StringVar(value="1")
+        self.num_poses_combo = ttk.Combobox(video_inner_frame, textvariable=self.num_poses_var,
+                                            values=["1", "2", "3", "4"], width=4, state="readonly")
+        self.num_poses_combo.pack(side=tk.LEFT, padx=5)
+        
         # 分隔符
         ttk.Separator(video_inner_frame, orient=tk.VERTICAL).pack(side=tk.LEFT, fill='y', padx=15)
         
@@ -188,6 +180,21 @@ class MainWindow:
         self.feedback_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # 性能统计区域：各环节最近样本的平均/P95耗时，可导出Chrome追踪文件
+        perf_frame = ttk.LabelFrame(right_panel, text="⏱️ 性能统计")
+        perf_frame.pack(fill=tk.X, pady=5)
+        
+        self.perf_tree = ttk.Treeview(perf_frame, columns=("count", "mean", "p95", "last"), height=6)
+        self.perf_tree.heading("#0", text="环节")
+        self.perf_tree.column("#0", width=130)
+        for column, title in (("count", "次数"), ("mean", "平均(ms)"), ("p95", "P95(ms)"), ("last", "最近")):
+            self.perf_tree.heading(column, text=title)
+            self.perf_tree.column(column, width=65, anchor=tk.E)
+        self.perf_tree.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Button(perf_frame, text="💾 导出性能追踪", command=self.export_perf_trace).pack(anchor=tk.E, padx=5, pady=5)
+        self.root.after(self.perf_refresh_interval_ms, self._refresh_perf_stats)
+        
         # AI流式生成区域
         streaming_frame = ttk.LabelFrame(right_panel, text="🤖 AI教练实时生成")
         streaming_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
@@ -200,9 +207,11 @@ class MainWindow:
         self.streaming_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         streaming_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 初始化流式显示区域
+        # 初始化流式显示区域：token先缓冲，每50ms批量刷新一次
         self.streaming_text.insert(tk.END, "等待AI教练开始分析...\n")
         self.streaming_text.config(state=tk.DISABLED)
+        self.streaming_sink = StreamingTextSink(self.root, self.streaming_text, flush_interval_ms=50)
+        self.streaming_sink.start()
         
         self.feedback_text.insert(tk.END, "🚀 欢迎使用羽毛球姿态分析系统！\n\n")
         self.feedback_text.insert(tk.END, "📋 使用步骤：\n")
@@ -227,6 +236,15 @@ class MainWindow:
         self.start_button = ttk.Button(button_frame, text="⏸️ 停止处理", command=self.stop_detection, state="disabled")
         self.start_button.pack(side=tk.LEFT, padx=5)
         
+        self.live_button = ttk.Button(button_frame, text="📷 实时摄像头", command=self.toggle_live_camera)
+        self.live_button.pack(side=tk.LEFT, padx=5)
+        
+        self.live_stats_label = ttk.Label(button_frame, text="", foreground="gray")
+        self.live_stats_label.pack(side=tk.LEFT, padx=10)
+        
+        self.live_alignment_label = ttk.Label(self.control_frame, text="", foreground="blue")
+        self.live_alignment_label.pack(fill=tk.X, pady=(5, 0))
+        
         # 初始化变量
         self.api_key_saved = False
         self.auto_process_enabled = True
@@ -266,10 +284,6 @@ class MainWindow:
             messagebox.showwarning("提示", "请先保存API密钥")
             return
         
-        if self.is_running:
-            messagebox.showwarning("提示", "当前正在处理视频，请等待完成或停止当前处理")
-            return
-        
         file_path = filedialog.askopenfilename(
             title="选择要分析的视频文件",
             filetypes=[("视频文件", "*.mp4 *.avi *.mov *.mkv")]
@@ -285,272 +299,220 @@ class MainWindow:
             self.auto_process_video()
     
     def auto_process_video(self):
-        """自动处理视频：分析 + 转换为staged格式"""
+        """自动处理视频：提交分析流水线（正在处理其他视频时排队执行）"""
         if not hasattr(self, 'video_path'):
             return
         
-        self.update_feedback_box("\n🚀 开始自动处理视频...")
-        self.update_feedback_box("第1步: 初始化姿态检测模型")
+        api_key = self.api_key_entry.get().strip()
+        if not api_key:
+            self.update_feedback_box("❌ 请先设置API密钥")
+            return
+        
+        context = build_context(
+            self.video_path,
+            device=self.device_var.get().lower(),
+            api_key=api_key,
+            num_poses=int(self.num_poses_var.get()),
+            frame_callback=self._on_pipeline_frame,
+            status_callback=self.update_llm_status,
+            streaming_callback=self.update_streaming_content
+        )
+        queued = len(self.pipeline_scheduler.active_runs())
+        self.pipeline_scheduler.submit(os.path.basename(self.video_path), context)
         
-        # 在新线程中执行处理
-        thread = threading.Thread(target=self._auto_process_thread)
-        thread.daemon = True
-        thread.start()
+        self.is_running = True
+        self.start_button.config(state="normal")  # 启用停止按钮
+        if queued:
+            self.update_feedback_box(f"\n⏳ 已加入处理队列（前方还有 {queued} 个视频）")
+        else:
+            self.update_feedback_box("\n🚀 开始自动处理视频...")
     
-    def _auto_process_thread(self):
-        """自动处理线程"""
-        try:
-            # 第1步：初始化模型
-            self.root.after(0, lambda: self.update_progress(10, "初始化模型中..."))
-            self._initialize_models()
-            
-            # 第2步：分析视频
-            self.root.after(0, lambda: self.update_progress(20, "开始分析视频..."))
-            self._analyze_video()
-            
-            # 第3步：转换为staged格式
-            self.root.after(0, lambda: self.update_progress(80, "转换为阶段化格式..."))
-            self._convert_to_staged()
-            
-            # 完成
-            self.root.after(0, lambda: self.update_progress(100, "处理完成！"))
-            self.root.after(0, self._on_process_complete)
-            
-        except Exception as e:
-            error_msg = f"处理失败: {str(e)}"
-            self.root.after(0, lambda: self.update_feedback_box(f"❌ {error_msg}"))
-            self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
-            self.root.after(0, self._reset_ui_state)
+    def _on_pipeline_frame(self, processed_frame, frame_count):
+        """检测阶段的预览帧回调（工作线程），缩放后交给Tk主线程显示"""
+        with self.tracer.span("preview_convert"):
+            preview_frame = cv2.resize(processed_frame, (640, 480))
+            frame_rgb = cv2.cvtColor(preview_frame, cv2.COLOR_BGR2RGB)
+            img = Image.fromarray(frame_rgb)
+        self.root.after(0, lambda: self._update_video_display(ImageTk.PhotoImage(image=img)))
     
-    def _initialize_models(self):
-        """初始化检测和分析模型"""
-        selected_device = self.device_var.get().lower()
-        self.root.after(0, lambda: self.update_feedback_box(f"正在使用 {selected_device.upper()} 初始化模型..."))
-        
-        self.pose_detector = PoseDetector(device=selected_device)
-        self.pose_analyzer = PoseAnalyzer()
-        
-        if self.pose_detector.initialization_error:
-            raise Exception(self.pose_detector.initialization_error)
-        
-        self.root.after(0, lambda: self.update_feedback_box("✅ 模型初始化完成"))
+    def toggle_live_camera(self):
+        """开启/关闭实时摄像头模式"""
+        if self.live_session:
+            self.stop_live_camera()
+        else:
+            self.start_live_camera()
     
-    def _analyze_video(self):
-        """分析视频文件"""
-        self.root.after(0, lambda: self.start_button.config(state="normal"))  # 启用停止按钮
-        self.is_running = True
-        
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            raise Exception("无法打开视频文件")
+    def start_live_camera(self):
+        """启动实时摄像头：采集和推理在后台线程进行，界面只显示最新的标注帧"""
+        if self.pipeline_scheduler.active_runs():
+            messagebox.showwarning("提示", "请等待当前视频处理完成后再开启实时模式")
+            return
         
-        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        self.all_landmarks_timeline = []
-        self.processed_frames = 0
+        try:
+            # 规则引擎在推理线程中逐帧运行，结果随标注帧一起交给界面
+            feedback_engine = RealtimeFeedbackEngine()
+            try:
+                aligner = LiveTemplateAligner()
+            except Exception as e:
+                aligner = None
+                self.update_feedback_box(f"⚠️ 在线模板对齐不可用: {e}")
+            session = LiveSession(camera_id=self.camera_id, device=self.device_var.get().lower(),
+                                  on_result=lambda r: self._analyze_live_frame(r, feedback_engine, aligner))
+            session.start()
+        except Exception as e:
+            messagebox.showerror("错误", str(e))
+            return
         
-        self.root.after(0, lambda: self.update_feedback_box(f"📊 视频信息: {self.total_frames}帧, {self.fps:.1f}FPS"))
-        self.root.after(0, lambda: self.update_feedback_box("🎬 开始视频预览..."))
+        self.live_session = session
+        self.live_feedback_text = None
+        self.is_camera = True
+        self.live_button.config(text="⏹️ 关闭摄像头")
+        self.file_button.config(state="disabled")
+        self.device_combo.config(state="disabled")
+        self.update_feedback_box("\n📷 实时摄像头已开启")
+        self.root.after(self.live_poll_interval_ms, self._poll_live_result)
+    
+    def _analyze_live_frame(self, result, feedback_engine, aligner):
+        """实时帧分析（推理线程）：规则反馈 + 与标准动作的在线DTW对齐"""
+        feedback = feedback_engine.update(result["landmarks"], result["time_ms"])
+        feedback["alignment"] = aligner.update(result["landmarks"]) if aligner and result["landmarks"] else None
+        return feedback
+    
+    def _poll_live_result(self):
+        """轮询实时会话的最新结果并显示（Tk主线程）"""
+        session = self.live_session
+        if session is None:
+            return
         
-        frame_count = 0
-        first_frame_displayed = False
+        if not session.running:
+            error = session.error
+            self.stop_live_camera()
+            if error:
+                self.update_feedback_box(f"❌ 实时模式已停止: {error}")
+            return
         
-        while cap.isOpened() and self.is_running:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            timestamp_ms = int(frame_count * (1000 / self.fps))
-            
-            # 姿态检测
-            processed_frame, landmarks = self.pose_detector.detect_pose(frame, timestamp_ms=timestamp_ms)
-            
-            # 显示第一帧作为初始预览
-            if not first_frame_displayed:
-                preview_frame = processed_frame.copy()
-                preview_frame = cv2.resize(preview_frame, (640, 480))
-                frame_rgb = cv2.cvtColor(preview_frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
+        result = session.latest_result()
+        if result is not None:
+            frame = result["frame"]
+            label_w = max(self.video_label.winfo_width(), 320)
+            label_h = max(self.video_label.winfo_height(), 240)
+            h, w = frame.shape[:2]
+            scale = min(label_w / w, label_h / h)
+            with self.tracer.span("preview_convert"):
+                preview_frame = cv2.resize(frame, (max(int(w * scale), 1), max(int(h * scale), 1)))
+                img = Image.fromarray(cv2.cvtColor(preview_frame, cv2.COLOR_BGR2RGB))
                 img_tk = ImageTk.PhotoImage(image=img)
-                self.root.after(0, lambda img=img_tk: self._update_video_display(img))
-                first_frame_displayed = True
-            
-            if landmarks:
-                self.all_landmarks_timeline.append({'time_ms': timestamp_ms, 'landmarks': landmarks})
-            
-            # 更新进度
-            progress = 20 + (frame_count / self.total_frames) * 60  # 20-80%的进度用于视频分析
-            self.root.after(0, lambda p=progress: self.update_progress(p, f"分析进度: {frame_count}/{self.total_frames}"))
-            
-            # 每3帧更新一次显示，提供更高帧率的预览
-            if frame_count % 3 == 0:
-                # 创建预览帧的副本
-                preview_frame = processed_frame.copy()
-                preview_frame = cv2.resize(preview_frame, (640, 480))
-                frame_rgb = cv2.cvtColor(preview_frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
-                img_tk = ImageTk.PhotoImage(image=img)
-                self.root.after(0, lambda img=img_tk: self._update_video_display(img))
-        
-        cap.release()
-        self.processed_frames = frame_count
+            self._update_video_display(img_tk)
+            
+            # 反馈内容变化时才写入状态框，避免每帧刷新文本
+            feedback = result.get("feedback")
+            if feedback:
+                feedback_text = f"[{feedback['stage']}] " + "；".join(feedback["messages"])
+                if feedback_text != self.live_feedback_text:
+                    self.live_feedback_text = feedback_text
+                    self.update_feedback_box(feedback_text)
+                alignment = feedback.get("alignment")
+                if alignment:
+                    self.live_alignment_label.config(
+                        text=f"📐 {alignment['message']}（标准动作进度 {alignment['progress'] * 100:.0f}%）"
+                    )
+            
+            stats = session.stats()
+            self.live_stats_label.config(
+                text=f"延迟 {stats['latency_ms']:.0f}ms (P95 {stats['latency_p95_ms']:.0f}ms) | "
+                     f"推理 {stats['inference_ms']:.0f}ms | {stats['fps']:.1f}FPS | 丢帧 {stats['dropped']}",
+                foreground="green" if stats['latency_p95_ms'] < 100 else "orange"
+            )
         
-        # 保存分析数据
-        self._save_analysis_data()
-        self.root.after(0, lambda: self.update_feedback_box(f"✅ 视频分析完成，共处理 {frame_count} 帧"))
-        self.root.after(0, lambda: self.update_feedback_box("🎬 视频预览已结束"))
+        self.root.after(self.live_poll_interval_ms, self._poll_live_result)
     
-    def _save_analysis_data(self):
-        """保存分析数据"""
-        if not self.all_landmarks_timeline:
+    def stop_live_camera(self):
+        """关闭实时摄像头"""
+        session = self.live_session
+        if session is None:
             return
+        self.live_session = None
+        session.stop()
         
-        output_dir = "output"
-        os.makedirs(output_dir, exist_ok=True)
-        video_filename = os.path.basename(self.video_path)
-        report_filename = f"{video_filename}.analysis_data.json"
-        report_filepath = os.path.join(output_dir, report_filename)
-        
-        with open(report_filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.all_landmarks_timeline, f, ensure_ascii=False, indent=4)
-        
-        self.last_json_path = report_filepath
-        self.root.after(0, lambda: self.update_feedback_box(f"💾 分析数据已保存: {report_filename}"))
+        stats = session.stats()
+        self.live_button.config(text="📷 实时摄像头")
+        self.live_stats_label.config(text="")
+        self.live_alignment_label.config(text="")
+        self.enable_controls()
+        self.update_feedback_box(
+            f"📷 实时摄像头已关闭（平均延迟 {stats['latency_ms']:.0f}ms，丢弃旧帧 {stats['dropped']} 帧）"
+        )
     
-    def _convert_to_staged(self):
-        """转换为阶段化格式"""
-        if not self.last_json_path:
-            raise Exception("没有找到分析数据文件")
-        
-        api_key = self.api_key_entry.get().strip()
-        os.environ['VOLCENGINE_API_KEY'] = api_key
-        
-        try:
-            converter = JsonConverter()
-            output_path = converter.convert_to_staged_format(self.last_json_path)
-            
-            self.root.after(0, lambda: self.update_feedback_box(f"✅ 阶段化转换完成: {os.path.basename(output_path)}"))
-            return output_path
-            
-        finally:
-            if 'VOLCENGINE_API_KEY' in os.environ:
-                del os.environ['VOLCENGINE_API_KEY']
+    def _on_pipeline_event(self, run, event, task_name):
+        """流水线事件处理（Tk主线程）"""
+        label = self.STAGE_LABELS.get(task_name, task_name)
+        
+        if event == "task_started":
+            self.update_feedback_box(f"▶️ [{run.name}] {label}...")
+            if task_name == "advice":
+                # 清空流式显示区域
+                self.streaming_sink.reset("🤖 AI教练开始分析...\n\n")
+        elif event == "task_progress":
+            self.progress_var.set(run.progress)
+        elif event == "task_done":
+            self.progress_var.set(run.progress)
+            self.update_feedback_box(f"✅ [{run.name}] {label}完成 ({run.timings[task_name]:.1f}s)")
+            if task_name == "detect":
+                self.update_feedback_box(
+                    f"📊 视频信息: {run.context['total_frames']}帧, {run.context['fps']:.1f}FPS，"
+                    f"共处理 {run.context['processed_frames']} 帧"
+                )
+                if run.context.get("landmark_cache_hit"):
+                    self.update_feedback_box("♻️ 该视频已检测过，直接使用缓存的检测结果")
+                elif run.context.get("resumed_from_frame"):
+                    self.update_feedback_box(f"♻️ 从检查点第 {run.context['resumed_from_frame']} 帧继续分析")
+                player_paths = run.context.get("player_timeline_paths")
+                if player_paths:
+                    self.update_feedback_box(f"👥 跟踪到 {len(player_paths)} 名球员，分别保存时间线:")
+                    for path in player_paths.values():
+                        self.update_feedback_box(f"  - {os.path.basename(path)}")
+            if task_name == "classify":
+                result = run.context["stroke_classification"]
+                self.update_feedback_box(
+                    f"🏸 最接近的动作模板「{result['stroke_type']}」（置信度 {result['confidence']:.0%}）；"
+                    f"对比和历史记录使用: {os.path.basename(run.context['template_path'])}"
+                )
+            if task_name == "record_metrics":
+                changes = [p for p in run.context.get("progress", []) if p["trend"] != "stable"]
+                for item in changes[:5]:
+                    name = "阶段时长(ms)" if item["metric"] == "duration_ms" else \
+                        ANGLE_DISPLAY_NAMES.get(item["metric"], item["metric"])
+                    arrow = "📈 进步" if item["trend"] == "improving" else "📉 退步"
+                    self.update_feedback_box(
+                        f"{arrow} {item['stage']} {name}: 近期偏差 {item['abs_deviation_ewma']:.1f}，"
+                        f"历史平均 {item['abs_deviation_mean']:.1f}（共 {item['count']} 次）"
+                    )
+            if task_name in ("detect", "segment", "render_report"):
+                output_key = {"detect": "analysis_json_path", "segment": "staged_path",
+                              "render_report": "report_path"}[task_name]
+                self.update_feedback_box(f"💾 {os.path.basename(run.context[output_key])}")
+        elif event == "run_done":
+            self._on_process_complete(run)
+        elif event == "run_cancelled":
+            self._save_partial_timeline(run)
+            self.update_feedback_box(f"⏹️ [{run.name}] 已取消")
+            self._finish_pipeline_run()
+        elif event == "run_failed":
+            error_msg = f"处理失败: {str(run.error)}"
+            self.update_feedback_box(f"❌ [{run.name}] {error_msg}")
+            messagebox.showerror("错误", error_msg)
+            self._finish_pipeline_run()
     
-    def _auto_analyze_with_ai(self):
-        """自动进行AI智能分析"""
-        try:
-            # 设置API密钥
-            api_key = self.api_key_entry.get().strip()
-            if not api_key:
-                self.update_feedback_box("❌ 请先设置API密钥")
-                return
-            
-            os.environ['VOLCENGINE_API_KEY'] = api_key
-            
-            # 查找标准模板文件
-            template_path = "staged_templates/击球动作模板.json"
-            if not os.path.exists(template_path):
-                self.update_feedback_box("❌ 未找到标准模板文件")
-                return
-            
-            # 查找staged用户数据文件
-            staged_user_file = None
-            if os.path.exists("staged_templates"):
-                # 查找最新的staged用户数据文件
-                staged_files = [f for f in os.listdir("staged_templates") 
-                              if f.startswith("staged_") and f.endswith(".json") 
-                              and "模板" not in f and "template" not in f.lower()]
-                if staged_files:
-                    # 按修改时间排序，获取最新的
-                    staged_files.sort(key=lambda x: os.path.getmtime(os.path.join("staged_templates", x)), reverse=True)
-                    staged_user_file = os.path.join("staged_templates", staged_files[0])
-            
-            if not staged_user_file or not os.path.exists(staged_user_file):
-                self.update_feedback_box("❌ 未找到阶段化用户数据文件，请先完成视频分析和转换")
-                return
-            
-            self.update_feedback_box(f"📊 正在对比分析: {os.path.basename(staged_user_file)}")
-            
-            # 清空流式显示区域
-            self.streaming_text.config(state=tk.NORMAL)
-            self.streaming_text.delete(1.0, tk.END)
-            self.streaming_text.insert(tk.END, "🤖 AI教练开始分析...\n\n")
-            self.streaming_text.config(state=tk.DISABLED)
-            
-            # 使用新的ActionAdvisor进行智能分析（传入状态回调和流式回调函数）
-            action_advisor = ActionAdvisor(
-                status_callback=self.update_llm_status,
-                streaming_callback=self.update_streaming_content
-            )
-            # 设置API密钥
-            action_advisor.api_key = api_key
-            comprehensive_report = action_advisor.generate_comprehensive_advice(
-                staged_user_file, template_path
-            )
-            
-            # 显示分析结果
-            self.update_feedback_box("\n🎯 智能分析结果:")
-            self.update_feedback_box("=" * 50)
-            
-            # 保存分析报告
-            self._save_analysis_report(comprehensive_report)
-            
-            # 显示分析报告窗口
-            self._show_analysis_report_window(comprehensive_report)
-            
-            self.update_feedback_box("\n✅ 智能分析完成！")
-            
-            # 调用分析完成后的操作
-            self._on_analysis_complete()
-            
-        except Exception as e:
-            error_msg = f"智能分析失败: {str(e)}"
-            self.update_feedback_box(f"❌ {error_msg}")
-            # 即使出错也要重置UI状态
-            self._reset_ui_state()
-        
-        finally:
-            if 'VOLCENGINE_API_KEY' in os.environ:
-                del os.environ['VOLCENGINE_API_KEY']
+    def _save_partial_timeline(self, run):
+        """流水线在检测阶段被取消时，提示已写入磁盘的部分数据"""
+        partial_path = run.context.get("partial_timeline_path")
+        if partial_path and "analysis_json_path" not in run.context and os.path.exists(partial_path):
+            self.update_feedback_box(f"💾 部分分析数据已保存: {os.path.basename(partial_path)}")
     
-    def _save_analysis_report(self, comprehensive_report):
-        """保存分析报告"""
-        try:
-            output_dir = "output"
-            os.makedirs(output_dir, exist_ok=True)
-            
-            video_filename = os.path.basename(self.video_path)
-            report_filename = f"{video_filename}.analysis_report.txt"
-            report_filepath = os.path.join(output_dir, report_filename)
-            
-            with open(report_filepath, 'w', encoding='utf-8') as f:
-                f.write("羽毛球动作智能分析报告\n")
-                f.write("=" * 50 + "\n")
-                f.write(f"视频文件: {video_filename}\n")
-                f.write(f"分析时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-
-                
-                # 详细建议
-                detailed_suggestions = comprehensive_report.get('detailed_suggestions', [])
-                if detailed_suggestions:
-                    f.write("具体改进建议:\n")
-                    f.write("-" * 30 + "\n")
-                    for i, suggestion in enumerate(detailed_suggestions, 1):
-                        f.write(f"{i}. {suggestion}\n\n")
-                
-                # LLM增强建议
-                llm_advice = comprehensive_report.get('llm_enhanced_advice', '')
-                if llm_advice:
-                    f.write("AI智能建议:\n")
-                    f.write("-" * 20 + "\n")
-                    f.write(f"{llm_advice}\n\n")
-            
-            self.update_feedback_box(f"💾 分析报告已保存: {report_filename}")
-            
-        except Exception as e:
-            self.update_feedback_box(f"❌ 保存报告失败: {str(e)}")
+    def _finish_pipeline_run(self):
+        """一个流水线结束后，如果没有其他排队的视频则重置界面"""
+        if not self.pipeline_scheduler.active_runs():
+            self._reset_ui_state()
     
     def _show_analysis_report_window(self, comprehensive_report):
         """显示分析报告窗口"""
@@ -775,136 +737,12 @@ class MainWindow:
             window.attributes('-alpha', 1.0)
     
     def _render_markdown_content(self, text_widget, content):
-        """渲染Markdown内容到Text组件（改进版）"""
-        import re
-        
-        # 清空文本组件
-        text_widget.delete(1.0, tk.END)
-        
-        # 配置文本样式
-        self._configure_text_styles(text_widget)
-        
-        # 使用markdown库将markdown转换为HTML
-        try:
-            import markdown
-            html_content = markdown.markdown(content, extensions=['extra', 'codehilite'])
-        except:
-            # 如果markdown库不可用，使用简化版本
-            html_content = self._simple_markdown_to_html(content)
-        
-        # 解析HTML并渲染到Text组件
-        parser = MarkdownHTMLParser(text_widget)
-        parser.feed(html_content)
+        """渲染Markdown内容到Text组件（按块增量渲染，未变化的块不重新插入）"""
+        IncrementalMarkdownRenderer.for_widget(text_widget).render(content)
     
     def _append_markdown_content(self, text_widget, content):
         """追加Markdown内容到Text组件（不清空现有内容）"""
-        import re
-        
-        # 配置文本样式（如果还没有配置）
-        self._configure_text_styles(text_widget)
-        
-        # 使用markdown库将markdown转换为HTML
-        try:
-            import markdown
-            html_content = markdown.markdown(content, extensions=['extra', 'codehilite'])
-        except:
-            # 如果markdown库不可用，使用简化版本
-            html_content = self._simple_markdown_to_html(content)
-        
-        # 解析HTML并渲染到Text组件
-        parser = MarkdownHTMLParser(text_widget)
-        parser.feed(html_content)
-    
-    def _configure_text_styles(self, text_widget):
-        """配置文本组件的样式"""
-        text_widget.tag_configure("h1", font=("Arial", 16, "bold"), foreground="#2c3e50")
-        text_widget.tag_configure("h2", font=("Arial", 14, "bold"), foreground="#34495e")
-        text_widget.tag_configure("h3", font=("Arial", 12, "bold"), foreground="#7f8c8d")
-        text_widget.tag_configure("bold", font=("Arial", 10, "bold"))
-        text_widget.tag_configure("italic", font=("Arial", 10, "italic"))
-        text_widget.tag_configure("code", font=("Courier", 9), background="#f8f9fa", foreground="#e74c3c")
-        text_widget.tag_configure("list_bullet", foreground="#3498db")
-        text_widget.tag_configure("content", font=("Arial", 10))
-    
-    def _simple_markdown_to_html(self, content):
-        """简化的markdown到HTML转换"""
-        import re
-        
-        lines = content.split('\n')
-        html_lines = []
-        in_list = False
-        
-        for i, line in enumerate(lines):
-            original_line = line
-            line = line.strip()
-            
-            if not line:
-                if in_list:
-                    # 空行可能结束列表
-                    next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
-                    if not (next_line.startswith('- ') or next_line.startswith('* ') or re.match(r'^\d+\. ', next_line)):
-                        html_lines.append('</ul>')
-                        in_list = False
-                html_lines.append('<br>')
-                continue
-            
-            # 处理标题
-            if line.startswith('### '):
-                if in_list:
-                    html_lines.append('</ul>')
-                    in_list = False
-                html_lines.append(f'<h3>{line[4:]}</h3>')
-            elif line.startswith('## '):
-                if in_list:
-                    html_lines.append('</ul>')
-                    in_list = False
-                html_lines.append(f'<h2>{line[3:]}</h2>')
-            elif line.startswith('# '):
-                if in_list:
-                    html_lines.append('</ul>')
-                    in_list = False
-                html_lines.append(f'<h1>{line[2:]}</h1>')
-            # 处理列表项
-            elif line.startswith('- ') or line.startswith('* '):
-                if not in_list:
-                    html_lines.append('<ul>')
-                    in_list = True
-                formatted_content = self._format_inline_html(line[2:])
-                html_lines.append(f'<li>{formatted_content}</li>')
-            elif re.match(r'^\d+\. ', line):
-                if not in_list:
-                    html_lines.append('<ol>')
-                    in_list = True
-                match = re.match(r'^\d+\. (.+)', line)
-                if match:
-                    formatted_content = self._format_inline_html(match.group(1))
-                    html_lines.append(f'<li>{formatted_content}</li>')
-            else:
-                if in_list:
-                    html_lines.append('</ul>')
-                    in_list = False
-                # 处理行内格式
-                formatted_line = self._format_inline_html(line)
-                html_lines.append(f'<p>{formatted_line}</p>')
-        
-        # 确保列表正确关闭
-        if in_list:
-            html_lines.append('</ul>')
-        
-        return '\n'.join(html_lines)
-    
-    def _format_inline_html(self, text):
-        """格式化行内HTML"""
-        import re
-        
-        # 处理粗体
-        text = re.sub(r'\*\*([^*]+)\*\*', r'<strong>\1</strong>', text)
-        # 处理斜体
-        text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
-        # 处理代码
-        text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
-        
-        return text
+        IncrementalMarkdownRenderer.for_widget(text_widget).append(content)
     
     def _copy_report_content(self, comprehensive_report):
         """复制报告内容到剪贴板"""
@@ -973,6 +811,39 @@ class MainWindow:
             except Exception as e:
                 messagebox.showerror("导出失败", f"保存文件时发生错误: {str(e)}")
     
+    def _refresh_perf_stats(self):
+        """按固定间隔刷新性能统计面板（Tk主线程）"""
+        for name, stats in sorted(self.tracer.stats().items()):
+            if name.startswith("task:"):
+                label = f"[阶段] {self.STAGE_LABELS.get(name[5:], name[5:])}"
+            else:
+                label = SPAN_LABELS.get(name, name)
+            if "mean_ms" in stats:
+                values = (stats["count"], f"{stats['mean_ms']:.1f}", f"{stats['p95_ms']:.1f}", f"{stats['last_ms']:.1f}")
+            else:
+                values = (stats["count"], f"{stats['mean']:.1f}", "", f"{stats['last']:.1f}")
+            if self.perf_tree.exists(name):
+                self.perf_tree.item(name, values=values)
+            else:
+                self.perf_tree.insert("", tk.END, iid=name, text=label, values=values)
+        self.root.after(self.perf_refresh_interval_ms, self._refresh_perf_stats)
+    
+    def export_perf_trace(self):
+        """导出Chrome追踪格式文件（可在 chrome://tracing 或 ui.perfetto.dev 中打开）"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出性能追踪",
+            defaultextension=".json",
+            initialfile=f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("Chrome追踪文件", "*.json"), ("所有文件", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            self.tracer.export_chrome_trace(file_path)
+            self.update_feedback_box(f"💾 性能追踪已导出: {file_path}")
+        except Exception as e:
+            messagebox.showerror("导出失败", f"保存追踪文件时发生错误: {str(e)}")
+    
     def _update_video_display(self, img_tk):
         """更新视频显示"""
         self.video_label.configure(image=img_tk)
@@ -984,39 +855,31 @@ class MainWindow:
         if hasattr(self, 'feedback_text'):
             self.update_feedback_box(f"📊 {status_text} ({value:.1f}%)")
     
-    def _on_process_complete(self):
-        """处理完成后的操作"""
-        self.update_feedback_box("\n🎉 自动处理完成！")
+    def _on_process_complete(self, run):
+        """流水线完成后的操作"""
+        self.update_feedback_box(f"\n🎉 [{run.name}] 自动处理完成！ 各阶段耗时: {run.summary()}")
         self.update_feedback_box("📁 生成的文件:")
-        self.update_feedback_box(f"  - 原始分析数据: {os.path.basename(self.last_json_path)}")
+        self.update_feedback_box(f"  - 原始分析数据: {os.path.basename(run.context['analysis_json_path'])}")
+        self.update_feedback_box(f"  - 阶段化数据: {os.path.basename(run.context['staged_path'])}")
+        self.update_feedback_box(f"  - 分析报告: {os.path.basename(run.context['report_path'])}")
         
-        # 查找staged文件
-        staged_files = [f for f in os.listdir("staged_templates") if f.endswith(".json") and "staged_" in f]
-        if staged_files:
-            latest_staged = max(staged_files, key=lambda x: os.path.getmtime(os.path.join("staged_templates", x)))
-            self.update_feedback_box(f"  - 阶段化数据: {latest_staged}")
+        # 报告窗口和导出使用该流水线对应的视频
+        self.video_path = run.context["video_path"]
+        self._show_analysis_report_window(run.context["report"])
         
-        # 自动进行智能分析
-        self.update_feedback_box("\n🤖 开始智能分析...")
-        self._auto_analyze_with_ai()
+        self.update_feedback_box("\n✅ 智能分析完成！")
+        
+        if not self.pipeline_scheduler.active_runs():
+            # 调用分析完成后的操作
+            self._on_analysis_complete()
         
     def update_llm_status(self, status_message):
         """更新LLM连接状态信息"""
         self.root.after(0, lambda: self.update_feedback_box(f"🔗 {status_message}"))
     
     def update_streaming_content(self, content):
-        """更新流式内容显示"""
-        def _update():
-            self.streaming_text.config(state=tk.NORMAL)
-            self.streaming_text.insert(tk.END, content)
-            self.streaming_text.see(tk.END)  # 自动滚动到底部
-            self.streaming_text.config(state=tk.DISABLED)
-        
-        # 确保在主线程中更新UI
-        if threading.current_thread() == threading.main_thread():
-            _update()
-        else:
-            self.root.after(0, _update)
+        """更新流式内容显示（可从任意线程调用，由缓冲输出按帧率合并刷新）"""
+        self.streaming_sink.write(content)
     
     def _on_analysis_complete(self):
         """分析完成后的操作"""
@@ -1029,6 +892,7 @@ class MainWindow:
         """禁用控制控件"""
         self.file_button.config(state="disabled")
         self.device_combo.config(state="disabled")
+        self.num_poses_combo.config(state="disabled")
         self.save_api_button.config(state="disabled")
 
     def enable_controls(self):
@@ -1036,6 +900,7 @@ class MainWindow:
         if self.api_key_saved:
             self.file_button.config(state="normal")
         self.device_combo.config(state="normal")
+        self.num_poses_combo.config(state="readonly")
         self.save_api_button.config(state="normal")
     
     def _reset_ui_state(self):
@@ -1051,19 +916,20 @@ class MainWindow:
 
     def stop_detection(self):
         """停止当前处理"""
+        self.stop_live_camera()
         if not self.is_running:
             return
         
         self.update_feedback_box("\n⏸️ 用户请求停止处理...")
-        self.is_running = False
         
-        # 如果有分析数据，保存它
-        if hasattr(self, 'all_landmarks_timeline') and self.all_landmarks_timeline:
-            self._save_analysis_data()
+        # 取消排队中和正在进行的流水线（包括AI流式请求），检测中的部分数据在取消事件中保存
+        cancelled = self.pipeline_scheduler.cancel_all()
+        if cancelled:
+            self.update_feedback_box(f"⏹️ 已请求取消 {cancelled} 个处理任务")
         
         self._reset_ui_state()
         self.update_feedback_box("✅ 处理已停止")
-        messagebox.showinfo("提示", "处理已停止。如有分析数据已自动保存。")
+        messagebox.showinfo("提示", "处理已停止。如有分析数据已自动保存，再次分析同一视频时将从中断处继续。")
 
     def update_feedback_box(self, message):
         """安全地从任何线程更新反馈文本框的内容"""
@@ -1090,9 +956,14 @@ class MainWindow:
     def save_config(self, api_key):
         """保存配置到文件"""
         try:
+            # 保留配置文件中已有的其他配置项（如接口地址url）
             config = configparser.ConfigParser()
-            config['API'] = {'key': api_key}
-            
+            if os.path.exists(self.config_file):
+                config.read(self.config_file, encoding='utf-8')
+            if 'API' not in config:
+                config['API'] = {}
+            config['API']['key'] = api_key
+
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 config.write(f)
         except Exception as e:
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量Markdown渲染器
+按块解析Markdown，渲染结果以内容哈希为键在进程内缓存；重新渲染时只替换发生变化的块，
+报告窗口再次打开时无需重新解析
+"""
+
+import re
+import hashlib
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import List, Tuple, Optional
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+
+class MarkdownHTMLParser(HTMLParser):
+    """HTML解析器，用于将HTML渲染到tkinter Text组件"""
+
+    def __init__(self, text_widget):
+        super().__init__()
+        self.text_widget = text_widget
+        self.tag_stack = []
+        self.in_list = False
+        self.list_level = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ['h1', 'h2', 'h3']:
+            self.tag_stack.append(tag)
+        elif tag == 'strong' or tag == 'b':
+            self.tag_stack.append('bold')
+        elif tag == 'em' or tag == 'i':
+            self.tag_stack.append('italic')
+        elif tag == 'code':
+            self.tag_stack.append('code')
+        elif tag in ['ul', 'ol']:
+            self.in_list = True
+            self.list_level += 1
+            if self.text_widget.get("end-2c", "end-1c") != "\n":
+                self.text_widget.insert(tk.END, "\n")
+        elif tag == 'li':
+            if self.in_list:
+                # 添加适当的缩进
+                indent = "  " * (self.list_level - 1)
+                self.text_widget.insert(tk.END, f"{indent}• ", "list_bullet")
+            self.tag_stack.append('list_item')
+        elif tag == 'br':
+            self.text_widget.insert(tk.END, "\n")
+        elif tag in ['p', 'div']:
+            if self.text_widget.get("end-2c", "end-1c") != "\n":
+                self.text_widget.insert(tk.END, "\n")
+
+    def handle_endtag(self, tag):
+        if tag in ['h1', 'h2', 'h3', 'strong', 'b', 'em', 'i', 'code', 'li']:
+            if self.tag_stack:
+                self.tag_stack.pop()
+        elif tag in ['ul', 'ol']:
+            self.in_list = False if self.list_level == 1 else True
+            self.list_level = max(0, self.list_level - 1)
+            self.text_widget.insert(tk.END, "\n")
+        if tag in ['p', 'div', 'li', 'h1', 'h2', 'h3']:
+            self.text_widget.insert(tk.END, "\n")
+
+    def handle_data(self, data):
+        if self.tag_stack:
+            current_tag = self.tag_stack[-1]
+            self.text_widget.insert(tk.END, data, current_tag)
+        else:
+            self.text_widget.insert(tk.END, data, "content")
+
+
+class _SegmentRecorder:
+    """
+    模拟Text组件的insert/get接口，记录 (文本, 标签) 片段而不直接操作界面
+    """
+
+    def __init__(self):
+        self.segments = []
+        self._last_char = "\n"  # 每个块都视为从新行开始
+
+    def insert(self, index, text, tag=None):
+        if not text:
+            return
+        self.segments.append((text, tag))
+        self._last_char = text[-1]
+
+    def get(self, start, end):
+        return self._last_char
+
+
+def simple_markdown_to_html(content: str) -> str:
+    """简化的markdown到HTML转换（markdown库不可用时使用）"""
+    lines = content.split('\n')
+    html_lines = []
+    in_list = False
+
+    for i, line in enumerate(lines):
+        line = line.strip()
+
+        if not line:
+            if in_list:
+                # 空行可能结束列表
+                next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
+                if not (next_line.startswith('- ') or next_line.startswith('* ') or re.match(r'^\d+\. ', next_line)):
+                    html_lines.append('</ul>')
+                    in_list = False
+            html_lines.append('<br>')
+            continue
+
+        # 处理标题
+        if line.startswith('### '):
+            if in_list:
+                html_lines.append('</ul>')
+                in_list = False
+            html_lines.append(f'<h3>{line[4:]}</h3>')
+        elif line.startswith('## '):
+            if in_list:
+                html_lines.append('</ul>')
+                in_list = False
+            html_lines.append(f'<h2>{line[3:]}</h2>')
+        elif line.startswith('# '):
+            if in_list:
+                html_lines.append('</ul>')
+                in_list = False
+            html_lines.append(f'<h1>{line[2:]}</h1>')
+        # 处理列表项
+        elif line.startswith('- ') or line.startswith('* '):
+            if not in_list:
+                html_lines.append('<ul>')
+                in_list = True
+            formatted_content = format_inline_html(line[2:])
+            html_lines.append(f'<li>{formatted_content}</li>')
+        elif re.match(r'^\d+\. ', line):
+            if not in_list:
+                html_lines.append('<ol>')
+                in_list = True
+            match = re.match(r'^\d+\. (.+)', line)
+            if match:
+                formatted_content = format_inline_html(match.group(1))
+                html_lines.append(f'<li>{formatted_content}</li>')
+        else:
+            if in_list:
+                html_lines.append('</ul>')
+                in_list = False
+            # 处理行内格式
+            formatted_line = format_inline_html(line)
+            html_lines.append(f'<p>{formatted_line}</p>')
+
+    # 确保列表正确关闭
+    if in_list:
+        html_lines.append('</ul>')
+
+    return '\n'.join(html_lines)
+
+
+def format_inline_html(text: str) -> str:
+    """格式化行内HTML"""
+    # 处理粗体
+    text = re.sub(r'\*\*([^*]+)\*\*', r'<strong>\1</strong>', text)
+    # 处理斜体
+    text = re.sub(r'\*([^*]+)\*', r'<em>\1</em>', text)
+    # 处理代码
+    text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
+
+    return text
+
+
+def split_markdown_blocks(content: str) -> List[str]:
+    """
+    按空行将Markdown拆分为块，围栏代码块（```）保持完整
+
+    Args:
+        content: Markdown文本
+
+    Returns:
+        块文本列表
+    """
+    blocks = []
+    current = []
+    in_fence = False
+    for line in content.split('\n'):
+        if line.strip().startswith('```'):
+            in_fence = not in_fence
+        if not in_fence and not line.strip():
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+# 进程内共享的块渲染缓存：内容哈希 -> (文本, 标签) 片段
+_BLOCK_CACHE = OrderedDict()
+_BLOCK_CACHE_LOCK = threading.Lock()
+_BLOCK_CACHE_MAX = 4096
+
+
+def _block_key(block: str) -> str:
+    return hashlib.sha1(block.encode('utf-8')).hexdigest()
+
+
+def render_block_segments(block: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """
+    渲染单个Markdown块为 (文本, 标签) 片段（带缓存）
+
+    Args:
+        block: Markdown块文本
+
+    Returns:
+        片段元组
+    """
+    key = _block_key(block)
+    with _BLOCK_CACHE_LOCK:
+        cached = _BLOCK_CACHE.get(key)
+        if cached is not None:
+            _BLOCK_CACHE.move_to_end(key)
+            return cached
+
+    if markdown is not None:
+        # codehilite生成的高亮span不会被Tk解析器使用，因此只启用extra扩展
+        html_content = markdown.markdown(block, extensions=['extra'])
+    else:
+        html_content = simple_markdown_to_html(block)
+
+    recorder = _SegmentRecorder()
+    parser = MarkdownHTMLParser(recorder)
+    parser.feed(html_content)
+    parser.close()
+    segments = tuple(recorder.segments)
+
+    with _BLOCK_CACHE_LOCK:
+        _BLOCK_CACHE[key] = segments
+        while len(_BLOCK_CACHE) > _BLOCK_CACHE_MAX:
+            _BLOCK_CACHE.popitem(last=False)
+    return segments
+
+
+class IncrementalMarkdownRenderer:
+    """
+    绑定到单个Text组件的增量渲染器：记录每个块的位置，重新渲染时只替换变化的块
+    """
+
+    def __init__(self, text_widget: tk.Text):
+        """
+        初始化渲染器
+
+        Args:
+            text_widget: 目标Text组件
+        """
+        self.text_widget = text_widget
+        self._block_keys = []
+        self._configure_text_styles()
+
+    @classmethod
+    def for_widget(cls, text_widget: tk.Text) -> "IncrementalMarkdownRenderer":
+        """获取（或创建）与Text组件绑定的渲染器"""
+        renderer = getattr(text_widget, '_markdown_renderer', None)
+        if renderer is None:
+            renderer = cls(text_widget)
+            text_widget._markdown_renderer = renderer
+        return renderer
+
+    def _configure_text_styles(self):
+        """配置文本组件的样式（每个组件只配置一次）"""
+        text_widget = self.text_widget
+        text_widget.tag_configure("h1", font=("Arial", 16, "bold"), foreground="#2c3e50")
+        text_widget.tag_configure("h2", font=("Arial", 14, "bold"), foreground="#34495e")
+        text_widget.tag_configure("h3", font=("Arial", 12, "bold"), foreground="#7f8c8d")
+        text_widget.tag_configure("bold", font=("Arial", 10, "bold"))
+        text_widget.tag_configure("italic", font=("Arial", 10, "italic"))
+        text_widget.tag_configure("code", font=("Courier", 9), background="#f8f9fa", foreground="#e74c3c")
+        text_widget.tag_configure("list_bullet", foreground="#3498db")
+        text_widget.tag_configure("content", font=("Arial", 10))
+
+    def _block_mark(self, index: int) -> str:
+        return f"md_block_{index}"
+
+    def _insert_block(self, position: int, block: str):
+        mark = self._block_mark(position)
+        self.text_widget.mark_set(mark, "end-1c")
+        self.text_widget.mark_gravity(mark, tk.LEFT)
+        for text, tag in render_block_segments(block):
+            if tag:
+                self.text_widget.insert(tk.END, text, tag)
+            else:
+                self.text_widget.insert(tk.END, text)
+
+    def render(self, content: str) -> None:
+        """
+        渲染整段Markdown，替换组件中由本渲染器管理的内容；与上次相同的前缀块保持不动
+
+        Args:
+            content: Markdown文本
+        """
+        blocks = split_markdown_blocks(content)
+        keys = [_block_key(block) for block in blocks]
+
+        # 找到第一个发生变化的块
+        unchanged = 0
+        for old_key, new_key in zip(self._block_keys, keys):
+            if old_key != new_key:
+                break
+            unchanged += 1
+
+        if unchanged < len(self._block_keys):
+            self.text_widget.delete(self._block_mark(unchanged), tk.END)
+            for i in range(unchanged, len(self._block_keys)):
+                self.text_widget.mark_unset(self._block_mark(i))
+        elif not self._block_keys:
+            self.text_widget.delete(1.0, tk.END)
+
+        for i in range(unchanged, len(blocks)):
+            self._insert_block(i, blocks[i])
+        self._block_keys = keys
+
+    def append(self, content: str) -> None:
+        """
+        在组件末尾追加Markdown内容（不清空现有内容）
+
+        Args:
+            content: Markdown文本
+        """
+        for block in split_markdown_blocks(content):
+            for text, tag in render_block_segments(block):
+                if tag:
+                    self.text_widget.insert(tk.END, text, tag)
+                else:
+                    self.text_widget.insert(tk.END, text)
+        # 追加内容之后的位置不再由块索引管理
+        self._block_keys = []
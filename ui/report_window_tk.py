@@ -199,7 +199,7 @@ class ReportWindowTk:
         file_path = filedialog.askopenfilename(
             title="选择用户动作数据",
             initialdir="output/",
-            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+            filetypes=[("JSON文件", "*.json *.jsonl"), ("所有文件", "*.*")]
         )
         
         if file_path:
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式文本缓冲输出
+任意线程写入的token先进入缓冲区，由Tk主线程按固定帧率批量写入Text组件，
+并只对新增的完整行增量应用Markdown样式
+"""
+
+import re
+import threading
+import tkinter as tk
+
+
+class StreamingTextSink:
+    """
+    流式文本缓冲输出：合并token，按固定间隔刷新到Tk Text组件
+    """
+
+    _HEADING_PATTERN = re.compile(r'^(#{1,3})\s+')
+    _LIST_PATTERN = re.compile(r'^(\s*)([-*]|\d+\.)\s+')
+    _INLINE_PATTERNS = [
+        (re.compile(r'\*\*([^*\n]+)\*\*'), "stream_bold", 2),
+        (re.compile(r'`([^`\n]+)`'), "stream_code", 1),
+    ]
+
+    def __init__(self, root, text_widget: tk.Text, flush_interval_ms: int = 50):
+        """
+        初始化缓冲输出
+
+        Args:
+            root: Tk根窗口（用于在主线程上调度刷新）
+            text_widget: 目标Text组件（平时保持DISABLED状态）
+            flush_interval_ms: 刷新间隔（毫秒）
+        """
+        self.root = root
+        self.text_widget = text_widget
+        self.flush_interval_ms = flush_interval_ms
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._reset_text = None
+        self._running = False
+        self._configure_tags()
+        self._mark_styled_start()
+
+    def _configure_tags(self):
+        """只在创建时配置一次样式标签"""
+        widget = self.text_widget
+        widget.tag_configure("stream_h1", font=('Consolas', 12, 'bold'), foreground='#2c3e50')
+        widget.tag_configure("stream_h2", font=('Consolas', 11, 'bold'), foreground='#2980b9')
+        widget.tag_configure("stream_h3", font=('Consolas', 10, 'bold'), foreground='#34495e')
+        widget.tag_configure("stream_bold", font=('Consolas', 9, 'bold'))
+        widget.tag_configure("stream_code", background='#ecf0f1', foreground='#e74c3c')
+        widget.tag_configure("stream_bullet", foreground='#3498db')
+        # 隐藏Markdown标记符号（#、**、`），只显示渲染后的效果
+        widget.tag_configure("stream_marker", elide=True)
+
+    def _mark_styled_start(self):
+        # 标记第一个尚未应用样式的行的起点
+        self.text_widget.mark_set("stream_unstyled", "end-1c")
+        self.text_widget.mark_gravity("stream_unstyled", tk.LEFT)
+
+    def start(self) -> None:
+        """在Tk主线程上开始定时刷新"""
+        if not self._running:
+            self._running = True
+            self.root.after(self.flush_interval_ms, self._tick)
+
+    def stop(self) -> None:
+        """停止定时刷新（缓冲区中的剩余内容会先写入）"""
+        self._running = False
+        self.flush()
+
+    def write(self, content: str) -> None:
+        """
+        写入流式内容（可从任意线程调用）
+
+        Args:
+            content: 文本片段
+        """
+        if not content:
+            return
+        with self._lock:
+            self._buffer.append(content)
+
+    def reset(self, initial_text: str = "") -> None:
+        """
+        清空显示区域（可从任意线程调用，下一次刷新时生效）
+
+        Args:
+            initial_text: 清空后显示的初始文本
+        """
+        with self._lock:
+            self._buffer = []
+            self._reset_text = initial_text
+
+    def _tick(self):
+        if not self._running:
+            return
+        self.flush()
+        self.root.after(self.flush_interval_ms, self._tick)
+
+    def flush(self) -> None:
+        """将缓冲区内容写入Text组件（必须在Tk主线程调用）"""
+        with self._lock:
+            pending = "".join(self._buffer)
+            self._buffer = []
+            reset_text, self._reset_text = self._reset_text, None
+
+        if reset_text is None and not pending:
+            return
+
+        widget = self.text_widget
+        widget.config(state=tk.NORMAL)
+        if reset_text is not None:
+            widget.delete(1.0, tk.END)
+            self._mark_styled_start()
+            pending = reset_text + pending
+        widget.insert(tk.END, pending)
+        self._style_completed_lines()
+        widget.see(tk.END)
+        widget.config(state=tk.DISABLED)
+
+    def _style_completed_lines(self):
+        """只对上次处理之后新出现的完整行应用Markdown样式"""
+        widget = self.text_widget
+        first_line = int(widget.index("stream_unstyled").split('.')[0])
+        # "end-1c" 之前的最后一个换行所在行是最后一个完整行
+        last_complete_line = int(widget.index("end-1c").split('.')[0]) - 1
+        if last_complete_line < first_line:
+            return
+
+        for line_no in range(first_line, last_complete_line + 1):
+            self._style_line(line_no, widget.get(f"{line_no}.0", f"{line_no}.end"))
+
+        widget.mark_set("stream_unstyled", f"{last_complete_line + 1}.0")
+
+    def _style_line(self, line_no: int, line: str):
+        widget = self.text_widget
+        heading = self._HEADING_PATTERN.match(line)
+        if heading:
+            level = len(heading.group(1))
+            widget.tag_add("stream_marker", f"{line_no}.0", f"{line_no}.{heading.end()}")
+            widget.tag_add(f"stream_h{level}", f"{line_no}.{heading.end()}", f"{line_no}.end")
+        else:
+            bullet = self._LIST_PATTERN.match(line)
+            if bullet:
+                widget.tag_add("stream_bullet", f"{line_no}.{bullet.start(2)}", f"{line_no}.{bullet.end(2)}")
+
+        for pattern, tag, marker_len in self._INLINE_PATTERNS:
+            for match in pattern.finditer(line):
+                start, end = match.start(), match.end()
+                widget.tag_add("stream_marker", f"{line_no}.{start}", f"{line_no}.{start + marker_len}")
+                widget.tag_add(tag, f"{line_no}.{start + marker_len}", f"{line_no}.{end - marker_len}")
+                widget.tag_add("stream_marker", f"{line_no}.{end - marker_len}", f"{line_no}.{end}")